@@ -0,0 +1,136 @@
+"""
+Approximate nearest-neighbour index (IVF, inverted file) for the fastText text search.
+
+The embedding rows are clustered offline with k-means. At query time only the rows in the clusters
+closest to the query are scored. Filters are applied while traversing the clusters: more clusters are
+probed until enough rows matching the filter mask have been found, so that restrictive filters such
+as a single municipality still return full result lists.
+
+Build the index next to the embeddings file with:
+    python -m recommender_api.ann_index <fasttext directory>
+"""
+import argparse
+import hashlib
+import warnings
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from recommender_api.embeddings import PtvEmbeddings, load_embeddings, normalize_rows, select_top_k
+from recommender_api.tools.config import config
+from recommender_api.tools.logger import log
+
+
+def ids_digest(ids: List[str]) -> str:
+    """Fingerprint of the embedding row order, used to check that an index matches the embeddings."""
+    return hashlib.sha1('\n'.join(ids).encode('utf-8')).hexdigest()
+
+
+class IvfIndex:
+    def __init__(
+            self,
+            centroids: np.ndarray,
+            list_offsets: np.ndarray,
+            list_rows: np.ndarray,
+            digest: str,
+            nprobe: int = 16
+    ):
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.list_offsets = list_offsets
+        self.list_rows = list_rows
+        self.digest = digest
+        self.nprobe = max(1, min(nprobe, len(self.centroids)))
+
+    @classmethod
+    def build(cls, embeddings: PtvEmbeddings, n_lists: Optional[int] = None, seed: int = 0) -> 'IvfIndex':
+        # Imported here as k-means is needed only when building the index offline
+        from sklearn.cluster import KMeans  # pylint: disable=C0415
+
+        n_lists = n_lists or max(1, int(4 * np.sqrt(len(embeddings))))
+        kmeans = KMeans(n_clusters=n_lists, n_init=1, random_state=seed).fit(embeddings.values)
+        centroids = normalize_rows(kmeans.cluster_centers_.astype(np.float32))
+
+        # Assign rows by cosine similarity, which is what the search uses
+        assignments = np.argmax(embeddings.values @ centroids.T, axis=1)
+        list_rows = np.argsort(assignments, kind='stable').astype(np.int32)
+        list_offsets = np.concatenate(([0], np.cumsum(np.bincount(assignments, minlength=n_lists))))
+
+        return cls(centroids, list_offsets, list_rows, ids_digest(embeddings.ids))
+
+    def save(self, file_path: str):
+        np.savez(
+            file_path,
+            centroids=self.centroids,
+            list_offsets=self.list_offsets,
+            list_rows=self.list_rows,
+            digest=np.array(self.digest)
+        )
+
+    @classmethod
+    def load(cls, file_path: str, nprobe: int) -> 'IvfIndex':
+        with np.load(file_path) as data:
+            return cls(data['centroids'], data['list_offsets'], data['list_rows'], str(data['digest']), nprobe)
+
+    def top_k(
+            self,
+            values: np.ndarray,
+            query: np.ndarray,
+            k: int,
+            mask: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Approximate top k rows of the normalized embedding matrix among the rows selected by the mask.
+        Same contract as PtvEmbeddings.exact_top_k.
+        """
+        query = np.asarray(query, dtype=np.float32)
+        query_norm = np.linalg.norm(query)
+        if query_norm > 0:
+            query = query / query_norm
+
+        list_order = np.argsort(-(self.centroids @ query))
+        nprobe = self.nprobe
+        while True:
+            rows = np.concatenate([
+                self.list_rows[self.list_offsets[i]:self.list_offsets[i + 1]] for i in list_order[:nprobe]
+            ])
+            rows = rows[mask[rows]]
+            if len(rows) >= k or nprobe >= len(list_order):
+                break
+            nprobe *= 2
+
+        return select_top_k(rows, values[rows] @ query, k)
+
+
+def load_ivf_index(file_path: str, embeddings: PtvEmbeddings) -> Optional[IvfIndex]:
+    """
+    Load the IVF index. Returns None, i.e. exact search is used, with a warning if the index cannot be read or
+    does not match the embeddings.
+    """
+    try:
+        index = IvfIndex.load(file_path, int(config['ann_nprobe']))
+    except (OSError, KeyError, ValueError) as error:
+        warnings.warn(f'Cannot read ANN index {file_path}, using exact search: {error}')
+        return None
+
+    if index.digest != ids_digest(embeddings.ids):
+        warnings.warn(f'ANN index {file_path} does not match the embeddings, using exact search.')
+        return None
+
+    log.technical.info('annIndexPath', file_path)
+    return index
+
+
+def run():
+    parser = argparse.ArgumentParser(description='Build the IVF index for the fastText text search.')
+    parser.add_argument('fasttext_path', help='Directory of the fastText model and embeddings')
+    parser.add_argument('--lists', type=int, default=None, help='Number of clusters, defaults to 4*sqrt(rows)')
+    args = parser.parse_args()
+
+    embeddings = load_embeddings(f'{args.fasttext_path}/{config["fasttext_embeddings_file"]}')
+    index = IvfIndex.build(embeddings, args.lists)
+    index.save(f'{args.fasttext_path}/{config["fasttext_ann_index_file"]}')
+    log.debug(f'Built IVF index with {len(index.centroids)} lists for {len(embeddings)} rows.')
+
+
+if __name__ == '__main__':
+    run()
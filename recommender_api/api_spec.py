@@ -13,7 +13,7 @@ from .service_classes import valid_service_classes
 from .municipality_data import municipality_data
 from .target_groups import valid_target_groups
 from .funding_type import valid_funding_types
-from .ptv import get_service_collections_from_ptv
+from .service_collections import get_valid_service_collection_ids
 from .wellbeing_service_county_codes import wellbeing_service_county_codes
 
 PTV_SERVICE_LIST_URL = config['ptv_url_prefix'] + \
@@ -104,11 +104,11 @@ class ServiceFiltersSchema(Schema):
     def validate_service_collections(self, data, **_):
         """
         We want to make sure that only valid service collections will be passed. Given service collection IDs
-        are validated against PTV API.
+        are validated against the PTV service collections stored by the PTV data loader.
         """
         service_collections = data.get('service_collections')
         if service_collections is not None:
-            valid_collection_ids = get_service_collections_from_ptv()
+            valid_collection_ids = get_valid_service_collection_ids()
             if not all(item in valid_collection_ids for item in service_collections):
                 raise ValidationError(
                     "Invalid service collection IDs provided.")
@@ -0,0 +1,96 @@
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, List, Optional
+
+from recommender_api.tools.logger import log
+
+
+class BatchWriter:
+    """
+    Queue of items written in batches by a background thread, a greenlet under the gevent worker. A batch is
+    written when it has batch_size items or flush_interval seconds after its first item. When the queue is full,
+    the item is written right away instead, so the queue bounds memory use without dropping items.
+    """
+
+    def __init__(self, name: str, write_batch: Callable[[List[Any]], None], queue_size: int, batch_size: int,
+                 flush_interval: float):
+        self.name = name
+        self.write_batch = write_batch
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_pid: Optional[int] = None
+
+    def put(self, item: Any):
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            log.technical.error(f'The {self.name} write queue is full, writing synchronously')
+            self.write_batch([item])
+        self._start_writer()
+
+    def flush(self):
+        """
+        Write all queued items and the batch the writer is collecting, e.g. before the worker exits. Returns once
+        they are written.
+        """
+        if self._writer_running():
+            # The writer writes the items before the marker, then sets it
+            written = threading.Event()
+            self._queue.put(written)
+            written.wait()
+            return
+
+        items = []
+        while True:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        for start in range(0, len(items), self.batch_size):
+            self.write_batch(items[start:start + self.batch_size])
+
+    def _writer_running(self) -> bool:
+        with self._lock:
+            return self._writer is not None and self._writer.is_alive() and self._writer_pid == os.getpid()
+
+    def _start_writer(self):
+        with self._lock:
+            # Threads do not survive forking, so each worker starts its own writer on first use
+            if self._writer is None or not self._writer.is_alive() or self._writer_pid != os.getpid():
+                self._writer = threading.Thread(target=self._run, name=f'{self.name}-writer', daemon=True)
+                self._writer_pid = os.getpid()
+                self._writer.start()
+
+    def _run(self):
+        while True:
+            items = []
+            flushed = None
+            item = self._queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if isinstance(item, threading.Event):
+                    # Flush marker: write the batch without waiting for more items
+                    flushed = item
+                    break
+                items.append(item)
+                if len(items) == self.batch_size:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+
+            if items:
+                # One log row per batch, as the writer runs outside of requests
+                with log.open():
+                    try:
+                        self.write_batch(items)
+                    except Exception as error:  # pylint: disable=W0703
+                        log.technical.error(f'Writing {len(items)} {self.name} items failed: {error}')
+            if flushed is not None:
+                flushed.set()
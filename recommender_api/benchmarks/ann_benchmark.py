@@ -0,0 +1,80 @@
+"""
+Recall and latency of the IVF text search index against the exact search.
+
+Run with the production embeddings:
+    python -m recommender_api.benchmarks.ann_benchmark --fasttext-path <fasttext directory>
+or with random embeddings of a given size:
+    python -m recommender_api.benchmarks.ann_benchmark --rows 200000
+"""
+import argparse
+import time
+from typing import Callable, List, Tuple
+
+import numpy as np
+
+from recommender_api.ann_index import IvfIndex
+from recommender_api.embeddings import PtvEmbeddings, load_embeddings
+from recommender_api.tools.config import config
+
+
+def _latencies_ms(search: Callable, queries: np.ndarray, masks: List[np.ndarray]) -> Tuple[list, np.ndarray]:
+    results = []
+    latencies = []
+    for query, mask in zip(queries, masks):
+        start = time.perf_counter()
+        results.append(search(query, mask)[0])
+        latencies.append((time.perf_counter() - start) * 1000)
+    return results, np.array(latencies)
+
+
+def _random_embeddings(rows: int, dim: int = 300) -> PtvEmbeddings:
+    """Clustered random embeddings, as sentence embeddings of services on the same topic are close together."""
+    rng = np.random.default_rng(1)
+    topics = rng.normal(size=(max(1, rows // 100), dim))
+    values = topics[rng.integers(len(topics), size=rows)] + rng.normal(scale=0.5, size=(rows, dim))
+    return PtvEmbeddings([str(i) for i in range(rows)], values)
+
+
+def benchmark(embeddings: PtvEmbeddings, n_queries: int, k: int, nprobe: int, mask_fraction: float):
+    rng = np.random.default_rng(0)
+    index = IvfIndex.build(embeddings)
+    index.nprobe = nprobe
+
+    # Queries near existing rows, like real searches are near some service descriptions
+    queries = embeddings.values[rng.integers(len(embeddings), size=n_queries)]
+    queries = queries + rng.normal(scale=0.05, size=queries.shape).astype(np.float32)
+    masks = [rng.random(len(embeddings)) < mask_fraction for _ in range(n_queries)]
+
+    exact, exact_latencies = _latencies_ms(lambda q, m: embeddings.exact_top_k(q, k, m), queries, masks)
+    approximate, ivf_latencies = _latencies_ms(lambda q, m: index.top_k(embeddings.values, q, k, m), queries, masks)
+
+    recall = np.mean([
+        len(set(a.tolist()) & set(e.tolist())) / max(1, len(e)) for a, e in zip(approximate, exact)
+    ])
+    print(f'rows={len(embeddings)} lists={len(index.centroids)} nprobe={nprobe} k={k} mask_fraction={mask_fraction}')
+    print(f'recall@{k}: {recall:.3f}')
+    for name, latencies in (('exact', exact_latencies), ('ivf', ivf_latencies)):
+        print(f'{name:5} p50={np.percentile(latencies, 50):.2f}ms p99={np.percentile(latencies, 99):.2f}ms')
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fasttext-path', help='Directory of the fastText embeddings, random embeddings if not given')
+    parser.add_argument('--rows', type=int, default=50000, help='Number of random embeddings')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=11)
+    parser.add_argument('--nprobe', type=int, default=int(config['ann_nprobe']))
+    parser.add_argument('--mask-fraction', type=float, default=1.0,
+                        help='Fraction of rows matching the filters, e.g. 0.01 for a small municipality')
+    args = parser.parse_args()
+
+    if args.fasttext_path:
+        embeddings = load_embeddings(f'{args.fasttext_path}/{config["fasttext_embeddings_file"]}')
+    else:
+        embeddings = _random_embeddings(args.rows)
+
+    benchmark(embeddings, args.queries, args.k, args.nprobe, args.mask_fraction)
+
+
+if __name__ == '__main__':
+    run()
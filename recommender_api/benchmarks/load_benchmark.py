@@ -0,0 +1,420 @@
+"""
+Load benchmark of /recommend_service, /text_search, /redirect and /recommendation_feedback.
+
+Seeds the local database with a synthetic PTV catalogue (seed_benchmark_db), starts the profile management stub,
+and starts the API from main.create_app with Gunicorn, the gevent worker class, a tiny fastText model and the
+XGBoost reranker. Then sends requests to each endpoint in turn from concurrent clients and reports the throughput
+and the p50/p95/p99 latencies of each endpoint. Redirects and feedback refer to the recommendations made earlier
+in the run.
+
+Run from the repository root with the benchmark configuration:
+    make -f recommender_api/Makefile service_recommender_db_up
+    ENVIRONMENT=benchmark PYTHONPATH=.:recommender_api python -m recommender_api.benchmarks.load_benchmark
+or run it with the database started and torn down by make:
+    make -f recommender_api/Makefile service_recommender_benchmark BENCHMARK_ARGS="..."
+
+A run given a baseline with --baseline prints the change of each metric. It exits with status 1 if a gated
+metric, by default the throughput or the p50 latency, is more than --regression-threshold percent worse. The tail
+latencies vary more between runs than the default threshold, so they are only gated with --gated-metrics. The
+results depend on the machine, so a baseline recorded on another machine or with other settings is only reported,
+not gated. Record a baseline on the machine that compares against it:
+    ENVIRONMENT=benchmark PYTHONPATH=.:recommender_api python -m recommender_api.benchmarks.load_benchmark \\
+        --save-baseline benchmark-baseline.json
+load_benchmark_baseline.json next to this module holds the results of the default settings on a 1-CPU machine,
+for reference.
+"""
+# pylint: disable=wrong-import-position
+from gevent import monkey
+monkey.patch_all()
+
+import argparse
+import base64
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import numpy as np
+import requests
+from gevent.pool import Pool
+from requests.adapters import HTTPAdapter
+
+from recommender_api.benchmarks.synthetic_ptv import SERVICE_CLASS_URI_PREFIX, TARGET_GROUPS, TOPICS, \
+    municipalities, municipality_weights, service_collection_ids
+from recommender_api.tools.config import config
+
+REPOSITORY_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+API_PATH = '/service-recommender/v1'
+HEALTHCHECK_PATH = '/service-recommender/healthcheck/'
+ENDPOINTS = ['recommend_service', 'text_search', 'redirect', 'recommendation_feedback']
+# Endpoints whose responses give the recommendations that redirects and feedback refer to
+RECOMMENDATION_ENDPOINTS = ['recommend_service', 'text_search']
+EXPECTED_STATUS = {'redirect': 302}
+METRICS = ['throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms']
+# Metrics that fail the run when worse than the baseline. The tail latencies of repeated runs on the same machine
+# differ by more than the default regression threshold.
+GATED_METRICS = ['throughput_rps', 'p50_ms']
+HIGHER_IS_BETTER = ['throughput_rps']
+AUTHORIZATION = 'Basic ' + base64.b64encode(b'benchmark:benchmark').decode('ascii')
+STARTUP_TIMEOUT_SECONDS = 300
+REQUEST_TIMEOUT_SECONDS = 60
+HARVEST_LIMIT = 20000
+
+
+class Workload:
+    """
+    Requests to the benchmarked endpoints. Recommendation requests are drawn from fixed pools of distinct
+    requests, so that repeated requests hit the response cache like popular searches do.
+    """
+
+    def __init__(self, distinct_requests: int, seed: int, catalogue_seed: int):
+        self._rng = random.Random(seed)
+        self._municipality_codes = [code for code, _ in municipalities()]
+        self._municipality_weights = municipality_weights(len(self._municipality_codes))
+        self._service_collection_ids = service_collection_ids(catalogue_seed)
+        self._bodies = {
+            'recommend_service': [self._recommend_service_body(i) for i in range(distinct_requests)],
+            'text_search': [self._text_search_body() for _ in range(distinct_requests)],
+        }
+        self.redirect_paths: List[str] = []
+        self.recommendations: List[Tuple[int, List[str]]] = []
+
+    def request(self, endpoint: str) -> Tuple[str, str, Optional[Dict[str, Any]]]:
+        """Method, path and JSON body of a request to the endpoint."""
+        if endpoint in RECOMMENDATION_ENDPOINTS:
+            return 'POST', f'{API_PATH}/{endpoint}', self._rng.choice(self._bodies[endpoint])
+        if endpoint == 'redirect':
+            return 'GET', self._rng.choice(self.redirect_paths), None
+        return 'POST', f'{API_PATH}/recommendation_feedback', self._feedback_body()
+
+    def record(self, endpoint: str, response: requests.Response):
+        """Keep the redirect links and the recommended services of a recommendation response."""
+        if endpoint not in RECOMMENDATION_ENDPOINTS or len(self.recommendations) >= HARVEST_LIMIT:
+            return
+
+        output = response.json()
+        services = output['recommended_services']
+        self.recommendations.append(
+            (output['auroraai_recommendation_id'], [service['service_id'] for service in services])
+        )
+        for service in services:
+            for service_channel in service['service_channels']:
+                for link in service_channel['web_pages']:
+                    parts = urlsplit(link)
+                    self.redirect_paths.append(f'{parts.path}?{parts.query}')
+
+    def _service_filters(self) -> Dict[str, Any]:
+        filters: Dict[str, Any] = {}
+        if self._rng.random() < 0.7:
+            filters['municipality_codes'] = self._rng.choices(self._municipality_codes, self._municipality_weights)
+            filters['include_national_services'] = self._rng.random() < 0.7
+        if self._rng.random() < 0.2:
+            filters['service_classes'] = [f'{SERVICE_CLASS_URI_PREFIX}{self._rng.choice(list(TOPICS.values()))[0]}']
+        if self._rng.random() < 0.1:
+            filters['target_groups'] = [self._rng.choice(TARGET_GROUPS)]
+        if self._rng.random() < 0.05:
+            filters['service_collections'] = [self._rng.choice(self._service_collection_ids)]
+        return filters
+
+    def _recommend_service_body(self, index: int) -> Dict[str, Any]:
+        meters = self._rng.sample(list(TOPICS), self._rng.randint(3, len(TOPICS)))
+        return {
+            'session_id': f'benchmark-{index}',
+            'life_situation_meters': {meter: [self._rng.randint(0, 10)] for meter in meters},
+            'service_filters': self._service_filters(),
+            'rerank': self._rng.random() < 0.5,
+        }
+
+    def _text_search_body(self) -> Dict[str, Any]:
+        _, words = self._rng.choice(list(TOPICS.values()))
+        return {
+            'search_text': ' '.join(self._rng.sample(words, self._rng.randint(1, 3))),
+            'service_filters': self._service_filters(),
+            'rerank': self._rng.random() < 0.5,
+        }
+
+    def _feedback_body(self) -> Dict[str, Any]:
+        recommendation_id, service_ids = self._rng.choice(self.recommendations)
+        return {
+            'auroraai_recommendation_id': recommendation_id,
+            'feedback_score': self._rng.choice([1, -1]),
+            'service_feedbacks': [
+                {'service_id': service_id, 'feedback_score': self._rng.choice([1, -1])}
+                for service_id in self._rng.sample(service_ids, min(2, len(service_ids)))
+            ],
+        }
+
+
+@dataclass
+class EndpointResult:
+    requests: int
+    errors: int
+    seconds: float
+    latencies_ms: List[float]
+
+    def summary(self) -> Dict[str, Any]:
+        """Throughput and latency percentiles, of the successful requests only."""
+        summary: Dict[str, Any] = {
+            'requests': self.requests,
+            'errors': self.errors,
+            'throughput_rps': len(self.latencies_ms) / self.seconds if self.seconds > 0 else None,
+        }
+        for percentile in (50, 95, 99):
+            summary[f'p{percentile}_ms'] = float(np.percentile(self.latencies_ms, percentile)) \
+                if self.latencies_ms else None
+        return summary
+
+
+def run_requests(session: requests.Session, base_url: str, workload: Workload, endpoint: str, count: int,
+                 concurrency: int) -> EndpointResult:
+    """Send count requests to the endpoint from concurrency greenlets, each sending its next request when done."""
+    expected_status = EXPECTED_STATUS.get(endpoint, 200)
+    counter = itertools.count()
+    latencies_ms: List[float] = []
+    errors: List[str] = []
+
+    def client():
+        while next(counter) < count:
+            method, path, body = workload.request(endpoint)
+            start = time.perf_counter()
+            try:
+                response = session.request(
+                    method, f'{base_url}{path}', json=body, headers={'Authorization': AUTHORIZATION},
+                    allow_redirects=False, timeout=REQUEST_TIMEOUT_SECONDS
+                )
+            except requests.RequestException as error:
+                errors.append(str(error))
+                continue
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+            if response.status_code != expected_status:
+                errors.append(f'{response.status_code} {response.text[:200]}')
+                continue
+            latencies_ms.append(elapsed_ms)
+            workload.record(endpoint, response)
+
+    pool = Pool(concurrency)
+    start = time.perf_counter()
+    for _ in range(concurrency):
+        pool.spawn(client)
+    pool.join()
+    seconds = time.perf_counter() - start
+
+    if errors:
+        print(f'{endpoint}: {len(errors)} failed requests, e.g. {errors[0]}', file=sys.stderr)
+    return EndpointResult(count, len(errors), seconds, latencies_ms)
+
+
+def benchmark(base_url: str, endpoints: List[str], workload: Workload, count: int, warmup: int,
+              concurrency: int) -> Dict[str, Dict[str, Any]]:
+    session = requests.Session()
+    session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=concurrency))
+
+    results = {}
+    for endpoint in endpoints:
+        if endpoint not in RECOMMENDATION_ENDPOINTS and not workload.recommendations:
+            run_requests(session, base_url, workload, RECOMMENDATION_ENDPOINTS[0], max(warmup, concurrency),
+                         concurrency)
+        if endpoint == 'redirect' and not workload.redirect_paths:
+            print('redirect: no redirect links in the recommendations, skipped', file=sys.stderr)
+            continue
+
+        run_requests(session, base_url, workload, endpoint, warmup, concurrency)
+        results[endpoint] = run_requests(session, base_url, workload, endpoint, count, concurrency).summary()
+    return results
+
+
+def _format(value: Optional[float]) -> str:
+    return '-' if value is None else f'{value:.1f}'
+
+
+def report(results: Dict[str, Dict[str, Any]]):
+    print(f'{"endpoint":25} {"requests":>9} {"errors":>7} {"req/s":>9} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9}')
+    for endpoint, summary in results.items():
+        print(f'{endpoint:25} {summary["requests"]:9} {summary["errors"]:7} '
+              + ' '.join(f'{_format(summary[metric]):>9}' for metric in METRICS))
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold_percent: float,
+            gated_metrics: List[str]) -> List[str]:
+    """
+    Print the change of each metric from the baseline, and return the gated metrics worse than the threshold.
+    Nothing is gated if the baseline was recorded on another machine or with other settings.
+    """
+    differing_settings = [
+        name for name, value in results['settings'].items() if baseline['settings'].get(name) != value
+    ]
+    if differing_settings:
+        print(f'Settings differ from the baseline, not gating: {", ".join(differing_settings)}')
+        gated_metrics = []
+    if results['machine'] != baseline.get('machine'):
+        print(f'Machine differs from the baseline, not gating: {baseline.get("machine")}')
+        gated_metrics = []
+
+    regressions = []
+    print(f'{"endpoint":25} {"metric":15} {"baseline":>10} {"current":>10} {"change %":>9}')
+    for endpoint, summary in results['endpoints'].items():
+        baseline_summary = baseline['endpoints'].get(endpoint)
+        if baseline_summary is None:
+            continue
+
+        for metric in METRICS:
+            before, after = baseline_summary[metric], summary[metric]
+            if not before or after is None:
+                continue
+
+            change = (after - before) / before * 100
+            worsening = -change if metric in HIGHER_IS_BETTER else change
+            regressed = metric in gated_metrics and worsening > threshold_percent
+            if regressed:
+                regressions.append(f'{endpoint} {metric}')
+            print(f'{endpoint:25} {metric:15} {_format(before):>10} {_format(after):>10} {change:+9.1f}'
+                  + (' REGRESSION' if regressed else ''))
+    return regressions
+
+
+def _subprocess_environment(config_file: Optional[str] = None) -> Dict[str, str]:
+    environment = dict(os.environ)
+    environment['PYTHONPATH'] = os.pathsep.join([REPOSITORY_DIR, os.path.join(REPOSITORY_DIR, 'recommender_api')])
+    environment.pop('AAI_RECOMMENDER_CONFIG_FILE', None)
+    if config_file:
+        environment['AAI_RECOMMENDER_CONFIG_FILE'] = config_file
+    return environment
+
+
+@contextmanager
+def _process(name: str, args: List[str], log_dir: str) -> Iterator[subprocess.Popen]:
+    """Run the process with its output in <log_dir>/<name>.log, and stop it gracefully on exit."""
+    with open(os.path.join(log_dir, f'{name}.log'), 'w', encoding='utf-8') as log_file:
+        process = subprocess.Popen(  # pylint: disable=consider-using-with
+            args, cwd=REPOSITORY_DIR, env=_subprocess_environment(), stdout=log_file, stderr=subprocess.STDOUT
+        )
+        try:
+            yield process
+        finally:
+            # Gunicorn stores the queued recommendations and events of its workers when terminated
+            process.terminate()
+            try:
+                process.wait(timeout=60)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def _wait_until_up(name: str, url: str, process: subprocess.Popen, log_dir: str):
+    deadline = time.monotonic() + STARTUP_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'{name} exited with status {process.returncode}, see {log_dir}/{name}.log')
+        try:
+            if requests.get(url, timeout=5).status_code == 200:
+                return
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f'{name} did not start in {STARTUP_TIMEOUT_SECONDS} seconds, see {log_dir}/{name}.log')
+
+
+def start_servers(stack: ExitStack, args: argparse.Namespace) -> str:
+    """Seed the database, start the profile management stub and the API, and return the base URL of the API."""
+    if not args.skip_seed:
+        subprocess.run(
+            [sys.executable, '-m', 'recommender_api.benchmarks.seed_benchmark_db', '--services', str(args.services),
+             '--seed', str(args.catalogue_seed), '--fasttext-dir', args.work_dir],
+            cwd=REPOSITORY_DIR, check=True,
+            env=_subprocess_environment('recommender_api/ptv_data_loader/config.yml')
+        )
+
+    stub_port = urlsplit(config['profile_management_api_url']).port
+    stub = stack.enter_context(_process(
+        'profile_management_stub',
+        [sys.executable, '-m', 'recommender_api.benchmarks.profile_management_stub', '--port', str(stub_port),
+         '--latency-ms', str(args.profile_management_latency_ms)],
+        args.work_dir
+    ))
+    _wait_until_up('profile_management_stub', f'http://localhost:{stub_port}/healthcheck', stub, args.work_dir)
+
+    api = stack.enter_context(_process(
+        'api',
+        [sys.executable, 'recommender_api/start_gunicorn.py', '--config', 'recommender_api/gunicorn_conf.py',
+         '--workers', str(args.workers), f'recommender_api.main:create_app({args.work_dir!r})'],
+        args.work_dir
+    ))
+    base_url = f'http://localhost:{config["service_recommender_api_port"]}'
+    _wait_until_up('api', f'{base_url}{HEALTHCHECK_PATH}', api, args.work_dir)
+    return base_url
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS, default=ENDPOINTS)
+    parser.add_argument('--concurrency', type=int, default=16, help='Number of concurrent clients')
+    parser.add_argument('--requests', type=int, default=1000, help='Measured requests per endpoint')
+    parser.add_argument('--warmup', type=int, default=100, help='Unmeasured requests per endpoint before measuring')
+    parser.add_argument('--distinct-requests', type=int, default=500,
+                        help='Size of the pools of distinct recommendation requests')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the requests')
+    parser.add_argument('--services', type=int, default=5000, help='Number of services in the synthetic catalogue')
+    parser.add_argument('--catalogue-seed', type=int, default=0, help='Seed of the synthetic catalogue')
+    parser.add_argument('--workers', type=int, default=int(config['service_recommender_api_workers']),
+                        help='Number of Gunicorn workers')
+    parser.add_argument('--profile-management-latency-ms', type=float, default=5,
+                        help='Added latency of the profile management stub')
+    parser.add_argument('--work-dir', default='/tmp/aai-benchmark',
+                        help='Directory of the fastText model and the server logs')
+    parser.add_argument('--skip-seed', action='store_true',
+                        help='Use the catalogue and the fastText model of the previous run')
+    parser.add_argument('--url', help='Benchmark the API running at this URL instead of starting one')
+    parser.add_argument('--save-baseline', help='Write the results to this JSON file')
+    parser.add_argument('--baseline', help='Compare the results to the baseline in this JSON file')
+    parser.add_argument('--regression-threshold', type=float, default=10,
+                        help='Percentage by which a gated metric may be worse than in the baseline')
+    parser.add_argument('--gated-metrics', nargs='+', choices=METRICS, default=GATED_METRICS,
+                        help='Metrics that fail the run when worse than in the baseline')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            baseline = json.load(file)
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    workload = Workload(args.distinct_requests, args.seed, args.catalogue_seed)
+    with ExitStack() as stack:
+        base_url = args.url or start_servers(stack, args)
+        endpoint_results = benchmark(base_url, args.endpoints, workload, args.requests, args.warmup,
+                                     args.concurrency)
+
+    results = {
+        'created': datetime.now(timezone.utc).isoformat(),
+        'settings': {
+            name: getattr(args, name)
+            for name in ('concurrency', 'requests', 'warmup', 'distinct_requests', 'seed', 'services',
+                         'catalogue_seed', 'workers', 'profile_management_latency_ms')
+        },
+        'machine': {'cpus': os.cpu_count(), 'platform': platform.platform()},
+        'endpoints': endpoint_results,
+    }
+    report(endpoint_results)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.regression_threshold, args.gated_metrics)
+        if regressions:
+            print(f'Regressed: {", ".join(regressions)}')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,63 @@
+"""
+Stub of the profile management API endpoints called by the recommender, for the load benchmark. Every
+authorization header is accepted, and about half of the service channels support session transfer.
+
+    python -m recommender_api.benchmarks.profile_management_stub --port 7070 --latency-ms 5
+"""
+# pylint: disable=wrong-import-position
+from gevent import monkey
+monkey.patch_all()
+
+import argparse
+import hashlib
+import time
+
+from flask import Flask, jsonify, request
+from gevent.pywsgi import WSGIServer
+
+CLIENT_INFO = {'provider': {'fi': 'Kuormitustesti Oy'}, 'name': {'fi': 'Kuormitustesti'}}
+
+
+def _supports_session_transfer(service_channel_id: str) -> bool:
+    return hashlib.sha256(service_channel_id.encode('utf-8')).digest()[0] % 2 == 0
+
+
+def create_app(latency_ms: float = 0) -> Flask:
+    app = Flask(__name__)
+
+    @app.before_request
+    def simulate_latency():
+        if latency_ms:
+            time.sleep(latency_ms / 1000)
+
+    @app.route('/healthcheck')
+    def healthcheck():
+        return 'Healthcheck OK'
+
+    @app.route('/oauth/client_info')
+    def client_info():
+        if not request.headers.get('Authorization'):
+            return 'Unauthorized', 401
+        return jsonify(CLIENT_INFO)
+
+    @app.route('/v1/aurora_ai_services/session_transfer_supports', methods=['POST'])
+    def session_transfer_supports():
+        return jsonify({
+            service_channel_id: _supports_session_transfer(service_channel_id)
+            for service_channel_id in request.get_json()['ptv_service_channel_ids']
+        })
+
+    return app
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=7070)
+    parser.add_argument('--latency-ms', type=float, default=0, help='Added latency of each response')
+    args = parser.parse_args()
+
+    WSGIServer(('127.0.0.1', args.port), create_app(args.latency_ms), log=None).serve_forever()
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,55 @@
+"""
+Microbenchmarks of the 3X10D service vector scoring of /recommend_service.
+
+    python -m recommender_api.benchmarks.scoring_benchmark --services 5000
+"""
+import argparse
+import timeit
+
+import numpy as np
+
+from recommender_api.service_recommender import top_services_by_life_situation
+from recommender_api.service_vectors import SERVICE_VECTOR_COLUMNS, ServiceVectors
+
+LIFE_SITUATION_METERS = {'family': [3, 4], 'health': [8], 'housing': [2], 'finance': [6], 'friends': [9]}
+
+
+def _random_service_vectors(services: int) -> ServiceVectors:
+    rng = np.random.default_rng(0)
+    values = rng.integers(0, 2, size=(services, len(SERVICE_VECTOR_COLUMNS)))
+    return ServiceVectors([
+        {'service_id': f'{i:08}', **dict(zip(SERVICE_VECTOR_COLUMNS, row))} for i, row in enumerate(values)
+    ])
+
+
+def _report(name: str, statement, number: int):
+    seconds = min(timeit.repeat(statement, number=number, repeat=5)) / number
+    print(f'{name:45} {seconds * 1e6:10.1f} us')
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--services', type=int, default=5000)
+    parser.add_argument('--limit', type=int, default=5)
+    parser.add_argument('--number', type=int, default=200)
+    args = parser.parse_args()
+
+    vectors = _random_service_vectors(args.services)
+    mask = np.random.default_rng(1).random(len(vectors)) < 0.5
+
+    print(f'services={args.services} selected={int(mask.sum())} limit={args.limit}')
+    _report(
+        'top_services_by_life_situation',
+        lambda: top_services_by_life_situation(vectors, mask, LIFE_SITUATION_METERS, args.limit),
+        args.number
+    )
+    _report(
+        'top_services_by_life_situation, cold norms',
+        lambda: (vectors._subset_norms.clear(),  # pylint: disable=W0212
+                 top_services_by_life_situation(vectors, mask, LIFE_SITUATION_METERS, args.limit)),
+        args.number
+    )
+
+
+if __name__ == '__main__':
+    run()
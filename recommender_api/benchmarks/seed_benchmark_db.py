@@ -0,0 +1,82 @@
+"""
+Replace the PTV data of the local database with a synthetic catalogue, stored with the PTV data loader, and write
+the matching fastText model and embeddings for text search. Runs with the data loader configuration:
+
+    ENVIRONMENT=benchmark AAI_RECOMMENDER_CONFIG_FILE=recommender_api/ptv_data_loader/config.yml \\
+        python -m recommender_api.benchmarks.seed_benchmark_db --services 5000 --fasttext-dir /tmp/aai-benchmark
+
+The load benchmark runs this before starting the API. It deletes all services and service channels of the
+database, so it refuses to run in any other environment than benchmark.
+"""
+import argparse
+import sys
+
+from recommender_api.benchmarks.synthetic_ptv import build_text_search_model, generate_catalogue
+from recommender_api.ptv_data_loader.data_loader import format_ptv_data
+from recommender_api.ptv_data_loader.db import (
+    DB_HOST_ROUTING, DB_NAME, DB_PORT, DB_USER, REGION,
+    add_ptv_fetch_timestamp_to_db,
+    load_formatted_services_to_db,
+    load_service_channels_to_db,
+    load_service_collections_to_db,
+    load_service_vectors_to_db,
+    load_services_to_db,
+    refresh_service_feedback_counts
+)
+from recommender_api.tools.config import env
+from recommender_api.tools.db import db_connection
+from recommender_api.tools.logger import log
+
+
+def delete_ptv_data():
+    """
+    Delete the services and service channels, which the loader only upserts, and the recommendations of earlier
+    runs, which refer to them and would add to the feedback counts.
+    """
+    with db_connection(
+        db_endpoint_address=DB_HOST_ROUTING,
+        db_auth_endpoint=DB_HOST_ROUTING,
+        db_name=DB_NAME,
+        port=DB_PORT,
+        user=DB_USER,
+        region=REGION,
+    ) as conn:
+        with conn.cursor() as cur:
+            # Cascades to the recommended services, feedback and redirects
+            cur.execute('TRUNCATE service_recommender.recommendation CASCADE')
+            cur.execute('DELETE FROM service_recommender.service')
+            cur.execute('DELETE FROM service_recommender.service_channel')
+        conn.commit()
+
+
+def seed(services: int, seed_value: int, fasttext_dir: str):
+    catalogue = generate_catalogue(services, seed_value)
+
+    with log.open():
+        delete_ptv_data()
+        load_services_to_db(catalogue.services)
+        load_service_channels_to_db(list(catalogue.service_channels.values()))
+        load_formatted_services_to_db(*format_ptv_data(catalogue.services, catalogue.service_channels))
+        load_service_vectors_to_db(catalogue.service_vectors)
+        load_service_collections_to_db(catalogue.service_collection_ids)
+        refresh_service_feedback_counts()
+        # The API reloads its worker-resident data when it sees the new fetch timestamp
+        add_ptv_fetch_timestamp_to_db()
+
+    build_text_search_model(catalogue, fasttext_dir)
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--services', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic catalogue')
+    parser.add_argument('--fasttext-dir', required=True, help='Directory of the fastText model and embeddings')
+    args = parser.parse_args()
+
+    if env != 'benchmark':
+        sys.exit(f'Refusing to replace the PTV data of the {env!r} environment, run with ENVIRONMENT=benchmark')
+    seed(args.services, args.seed, args.fasttext_dir)
+
+
+if __name__ == '__main__':
+    run()
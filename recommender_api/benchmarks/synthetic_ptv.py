@@ -0,0 +1,252 @@
+"""
+Synthetic PTV catalogue for the load benchmark: services, service channels, 3X10D service vectors and service
+collections in the formats of the PTV data loader, and a tiny fastText model with the sentence embeddings of the
+services for text search. The catalogue is generated deterministically from the seed, so that separate processes
+generate the same ids.
+"""
+import json
+import os
+import random
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import fasttext  # type: ignore
+import pandas as pd
+
+from recommender_api import ft
+from recommender_api.embeddings import PtvEmbeddings, save_npy
+
+RESOURCES_DIR = Path(__file__).parent.parent.parent / 'resources'
+FASTTEXT_MODEL_FILE = 'ptv.bin'
+FASTTEXT_EMBEDDINGS_FILE = 'ptv-embeddings.npy'
+SERVICE_CLASS_URI_PREFIX = 'http://uri.suomi.fi/codelist/ptv/ptvserclass2/code/'
+
+# Words of the services of each 3X10D life situation, with the main service class of the topic.
+# In the order of the service vector columns.
+TOPICS: Dict[str, Tuple[str, List[str]]] = {
+    'health': ('P4', ['terveys', 'lääkäri', 'terveyskeskus', 'hammashoito', 'neuvola', 'rokotus', 'kuntoutus',
+                      'mielenterveys', 'sairaanhoito', 'fysioterapia']),
+    'resilience': ('P3', ['kriisiapu', 'vertaistuki', 'keskusteluapu', 'päihdepalvelu', 'turvakoti', 'sosiaalityö',
+                          'perheväkivalta', 'tukipuhelin']),
+    'housing': ('P5', ['asuminen', 'asunto', 'vuokra-asunto', 'asumistuki', 'kotihoito', 'asumisneuvonta',
+                       'korjausavustus', 'palvelutalo']),
+    'working_studying': ('P6', ['työnhaku', 'koulutus', 'opiskelu', 'ammattikoulu', 'lukio', 'työllisyys',
+                                'yrittäjyys', 'oppisopimus']),
+    'family': ('P2', ['perhe', 'lapsi', 'päivähoito', 'varhaiskasvatus', 'perheneuvola', 'lapsiperhe',
+                      'vanhemmuus', 'kouluterveydenhuolto']),
+    'friends': ('P7', ['harrastus', 'kerho', 'yhdistys', 'vapaaehtoistyö', 'kohtaamispaikka', 'nuorisotila',
+                       'seurakunta', 'ystävätoiminta']),
+    'finance': ('P1', ['toimeentulotuki', 'talousneuvonta', 'velkaneuvonta', 'etuus', 'avustus', 'eläke',
+                       'verotus', 'työttömyysturva']),
+    'improvement_of_strengths': ('P8', ['kurssi', 'kansalaisopisto', 'taideopetus', 'musiikkiopisto',
+                                        'kielikurssi', 'valmennus', 'osaaminen', 'ohjaus']),
+    'self_esteem': ('P9', ['itsetunto', 'ryhmätoiminta', 'mentorointi', 'nuorisotyö', 'tukihenkilö',
+                           'terapia', 'etsivä nuorisotyö', 'vertaisryhmä']),
+    'life_satisfaction': ('P10', ['hyvinvointi', 'liikunta', 'ulkoilu', 'kirjasto', 'uimahalli', 'museo',
+                                  'kulttuuri', 'luontoliikunta']),
+}
+COMMON_WORDS = ['palvelu', 'asiakas', 'kunta', 'hakemus', 'ajanvaraus', 'maksuton', 'sähköinen', 'neuvonta',
+                'tietoa', 'yhteystiedot', 'asukkaat', 'tarvittaessa', 'lisäksi', 'voit', 'hakea', 'saat']
+TARGET_GROUPS = ['KR1', 'KR2', 'KR3']
+FUNDING_TYPES = ['PubliclyFunded', 'MarketFunded']
+CHANNEL_TYPES = ['EChannel', 'WebPage', 'Phone', 'ServiceLocation', 'PrintableForm']
+CHANNEL_TYPE_WEIGHTS = [3, 3, 2, 3, 1]
+SERVICE_COLLECTIONS = 20
+NATIONWIDE_SHARE = 0.2
+LANGUAGES = ['fi', 'sv', 'en']
+
+
+@dataclass
+class SyntheticCatalogue:
+    services: Dict[str, Dict[str, Any]]
+    service_channels: Dict[str, Dict[str, Any]]
+    service_vectors: pd.DataFrame
+    service_collection_ids: Set[str]
+
+
+def _uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def _values(value: str, type_: Optional[str] = None, languages: Optional[List[str]] = None) -> List[Dict[str, str]]:
+    return [
+        {'language': language, 'value': value, **({'type': type_} if type_ else {})}
+        for language in languages or ['fi']
+    ]
+
+
+def municipalities() -> List[Tuple[str, str]]:
+    """Codes and names of the municipalities accepted by the API."""
+    with (RESOURCES_DIR / 'municipality_codes.json').open(encoding='utf-8') as file:
+        return sorted(json.load(file).items())
+
+
+def municipality_weights(count: int) -> List[float]:
+    """Skewed weights of the municipalities, as services and users concentrate on a few large cities."""
+    return [1 / (rank + 1) for rank in range(count)]
+
+
+def service_class_codes() -> List[str]:
+    with (RESOURCES_DIR / 'service_classes.json').open(encoding='utf-8') as file:
+        return json.load(file)
+
+
+def service_collection_ids(seed: int = 0) -> List[str]:
+    rng = random.Random(f'{seed}-collections')
+    return [_uuid(rng) for _ in range(SERVICE_COLLECTIONS)]
+
+
+def _sentence(rng: random.Random, topic_words: List[str], length: int) -> str:
+    words = [rng.choice(topic_words) if rng.random() < 0.5 else rng.choice(COMMON_WORDS) for _ in range(length)]
+    return ' '.join(words).capitalize() + '.'
+
+
+def _service_channel(rng: random.Random, channel_id: str, name: str, municipality: Tuple[str, str],
+                     topic_words: List[str]) -> Dict[str, Any]:
+    channel_type = rng.choices(CHANNEL_TYPES, CHANNEL_TYPE_WEIGHTS)[0]
+    slug = rng.choice(topic_words).replace(' ', '-')
+    channel = {
+        'id': channel_id,
+        'serviceChannelType': channel_type,
+        'publishingStatus': 'Published',
+        'serviceChannelNames': _values(f'{name} ({channel_type})', 'Name'),
+        'serviceChannelDescriptions': _values(_sentence(rng, topic_words, 8), 'Summary'),
+        'webPages': [
+            {'language': 'fi', 'url': f'https://{slug}.example.fi/{channel_id[:8]}/{page}'}
+            for page in range(rng.randint(0 if channel_type == 'Phone' else 1, 2))
+        ],
+        'emails': _values(f'{slug}@example.fi'),
+        'phoneNumbers': [],
+        'addresses': [],
+        'serviceHours': [{
+            'serviceHourType': 'DaysOfTheWeek',
+            'openingHour': [{'dayFrom': 'Monday', 'dayTo': 'Friday', 'from': '08:00', 'to': '16:00'}]
+        }],
+    }
+    if channel_type == 'Phone':
+        channel['phoneNumbers'] = [{
+            'type': 'Phone', 'prefixNumber': '+358', 'number': str(rng.randint(100000000, 999999999)),
+            'language': 'fi'
+        }]
+    if channel_type == 'ServiceLocation':
+        channel['addresses'] = [{
+            'type': 'Location',
+            'streetAddress': {
+                'street': _values(f'{rng.choice(["Koulu", "Kirkko", "Asema", "Puisto"])}katu'),
+                'streetNumber': str(rng.randint(1, 60)),
+                'postalCode': f'{rng.randint(0, 99999):05}',
+                'municipality': {'code': municipality[0], 'name': _values(municipality[1])},
+                'latitude': f'{rng.uniform(60, 69):.5f}',
+                'longitude': f'{rng.uniform(21, 30):.5f}',
+            }
+        }]
+    return channel
+
+
+def generate_catalogue(services: int, seed: int = 0) -> SyntheticCatalogue:
+    """
+    The given number of published services with 1-4 service channels each. Municipal services are spread over the
+    municipalities with municipality_weights.
+    """
+    rng = random.Random(seed)
+    municipality_list = municipalities()
+    weights = municipality_weights(len(municipality_list))
+    class_codes = service_class_codes()
+    collection_ids = service_collection_ids(seed)
+
+    service_datas: Dict[str, Dict[str, Any]] = {}
+    channel_datas: Dict[str, Dict[str, Any]] = {}
+    vectors: List[Dict[str, Any]] = []
+    for _ in range(services):
+        service_id = _uuid(rng)
+        topic = rng.choice(list(TOPICS))
+        main_class, topic_words = TOPICS[topic]
+        sub_classes = [code for code in class_codes if code.startswith(f'{main_class}.')] or [main_class]
+        municipality = rng.choices(municipality_list, weights)[0]
+        nationwide = rng.random() < NATIONWIDE_SHARE
+        name = f'{rng.choice(topic_words).capitalize()} {rng.choice(topic_words)}'
+        if not nationwide:
+            name = f'{name}, {municipality[1]}'
+
+        channel_references = []
+        for _ in range(rng.randint(1, 4)):
+            channel = _service_channel(rng, _uuid(rng), name, municipality, topic_words)
+            channel_datas[channel['id']] = channel
+            channel_references.append(
+                {'serviceChannel': {'id': channel['id'], 'name': channel['serviceChannelNames'][0]['value']}}
+            )
+
+        service_datas[service_id] = {
+            'id': service_id,
+            'type': 'Service',
+            'publishingStatus': 'Published',
+            'serviceNames': _values(name, 'Name', LANGUAGES),
+            'serviceDescriptions': [
+                *_values(_sentence(rng, topic_words, 10), 'Summary'),
+                *_values(' '.join(_sentence(rng, topic_words, 12) for _ in range(rng.randint(2, 6))), 'Description'),
+                *_values(_sentence(rng, topic_words, 8), 'UserInstruction'),
+            ],
+            'areaType': 'Nationwide' if nationwide else 'LimitedType',
+            'areas': [] if nationwide else [{
+                'type': 'Municipality',
+                'municipalities': [{'code': municipality[0], 'name': _values(municipality[1])}]
+            }],
+            'fundingType': rng.choices(FUNDING_TYPES, [4, 1])[0],
+            'serviceChargeType': rng.choice(['Free', 'Chargeable']),
+            'targetGroups': [
+                {'code': code, 'name': _values(code)}
+                for code in rng.sample(TARGET_GROUPS, rng.randint(1, 2))
+            ],
+            'serviceClasses': [{
+                'name': _values(topic),
+                'newUri': f'{SERVICE_CLASS_URI_PREFIX}{rng.choice(sub_classes)}',
+                'newParentUri': f'{SERVICE_CLASS_URI_PREFIX}{main_class}',
+            }],
+            'serviceCollections': [
+                {'id': rng.choice(collection_ids), 'name': _values('Kokoelma')}
+            ] if rng.random() < 0.1 else [],
+            'organizations': [{
+                'organization': {'id': _uuid(rng), 'name': f'{municipality[1]} kunta'},
+                'roleType': 'Responsible'
+            }],
+            'requirements': [],
+            'serviceChannels': channel_references,
+        }
+
+        vector = {column: int(rng.random() < 0.15) for column in TOPICS}
+        vector[topic] = 1
+        vectors.append({'service_id': service_id, 'municipality_code': None if nationwide else municipality[0],
+                        **vector})
+
+    return SyntheticCatalogue(
+        service_datas,
+        channel_datas,
+        pd.DataFrame(vectors, columns=['service_id', 'municipality_code', *TOPICS]),
+        set(collection_ids)
+    )
+
+
+def build_text_search_model(catalogue: SyntheticCatalogue, directory: str, dim: int = 16):
+    """
+    Train a fastText model on the service descriptions like the production model, but with small vectors and
+    few epochs, and store it with the sentence embeddings of the services in the directory. Trained in one
+    thread, so that the model is the same on each run.
+    """
+    Path(directory).mkdir(parents=True, exist_ok=True)
+    corpus = [
+        {'key': service_id, 'text': ft.make_document(service)}
+        for service_id, service in catalogue.services.items()
+    ]
+    preprocessed = ft.preprocess(corpus)
+    corpus_file = os.path.join(directory, 'corpus.txt')
+    ft.save_preprocessed(preprocessed, corpus_file)
+
+    model = fasttext.train_unsupervised(
+        corpus_file, minn=2, maxn=5, dim=dim, epoch=5, minCount=1, bucket=50000, thread=1, verbose=0
+    )
+    model.save_model(os.path.join(directory, FASTTEXT_MODEL_FILE))
+
+    embeddings = PtvEmbeddings([item['key'] for item in corpus], ft.make_embeddings(preprocessed, model))
+    save_npy(embeddings, os.path.join(directory, FASTTEXT_EMBEDDINGS_FILE))
@@ -10,12 +10,14 @@ from werkzeug.exceptions import Unauthorized, InternalServerError
 from xgboost.sklearn import XGBRanker
 
 from recommender_api import db
-from recommender_api import profile_management, service_recommender
+from recommender_api import profile_management, recommendation_events, service_recommender
 from recommender_api.api_spec import \
     AuroraApiOutput, LifeSituationMeterInput, PostSessionAttributesInput, \
     RecommendationFeedback, TextSearchInput, RedirectInput, SearchTextTranslation, PtvServiceTranslation
 from recommender_api.profile_management import ProfileManagementApiError
 from recommender_api.ptv import get_service_channel_web_pages, get_format_service_data
+from recommender_api.recommendation_writer import store_recommendation
+from recommender_api.response_cache import cache_response, get_cached_response, response_cache_key
 from recommender_api.recommender_task_limiter import recommender_task_limit, RecommenderTaskLimiterCapacityError
 from recommender_api.service_recommender import text_search_in_ptv, set_redirect_urls, create_redirect_link
 from recommender_api.translation import translate_service_information, translate_text, localised_fields_present
@@ -27,8 +29,6 @@ from recommender_api.tools.logger import log
 recommendation_blueprint = Blueprint(
     name="recommendation_blueprint", import_name=__name__)
 
-profile_management_url = config['profile_management_api_url']
-
 no_authorization_endpoints = [
     "recommendation_blueprint.get_session_attributes",
     "recommendation_blueprint.service_redirect"
@@ -76,7 +76,7 @@ def _authorize():
         authorization_header = request.headers.get('Authorization')
         client_id = _parse_client_id(authorization_header)
         client_info = profile_management.get_client_info(authorization_header)
-    except (requests.exceptions.ConnectionError, requests.exceptions.ConnectTimeout) as err:
+    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as err:
         raise InternalServerError('Internal server error') from err
     except (requests.exceptions.RequestException, ValidationError) as err:
         raise Unauthorized('Not authorized') from err
@@ -125,20 +125,24 @@ def recommend_service():
         log.technical.error(error_message)
         return error_message, 500
 
-    try:
-        with recommender_task_limit(current_app):
-            recommended_services = service_recommender.recommend(
-                body_object,
-                current_app.xgboost_model,
-                request.calling_service,
-                request.path
-            )
-    except RecommenderTaskLimiterCapacityError:
-        return "Server busy.", 503
+    cache_key = response_cache_key(body_object, request.calling_service, request.path)
+    recommended_services = get_cached_response(cache_key)
+    if recommended_services is None:
+        try:
+            with recommender_task_limit(current_app):
+                recommended_services = service_recommender.recommend(
+                    body_object,
+                    current_app.xgboost_model,
+                    request.calling_service,
+                    request.path
+                )
+        except RecommenderTaskLimiterCapacityError:
+            return "Server busy.", 503
+        cache_response(cache_key, recommended_services)
 
     session_id = body_object.session_id
 
-    recommendation_id = db.store_recommendations_db(
+    recommendation_id = store_recommendation(
         [service['service_id'] for service in recommended_services],
         request
     )
@@ -185,7 +189,7 @@ def service_redirect():
 
     # store in db
     try:
-        db.store_redirect(recommendation_id, service_id, service_channel_id, auroraai_access_token)
+        recommendation_events.store_redirect(recommendation_id, service_id, service_channel_id, auroraai_access_token)
     except db.InvalidRedirectException:
         return "Invalid redirect link", 404
 
@@ -214,20 +218,24 @@ def text_search():
         log.technical.error(error_message)
         return error_message, 500
 
-    try:
-        with recommender_task_limit(current_app):
-            recommended_services = text_search_in_ptv(
-                body_object,
-                current_app.fasttext_embeddings,
-                current_app.fasttext_model,
-                current_app.xgboost_model,
-                request.calling_service,
-                request.path
-            )
-    except RecommenderTaskLimiterCapacityError:
-        return "Server busy.", 503
-
-    recommendation_id = db.store_recommendations_db(
+    cache_key = response_cache_key(body_object, request.calling_service, request.path)
+    recommended_services = get_cached_response(cache_key)
+    if recommended_services is None:
+        try:
+            with recommender_task_limit(current_app):
+                recommended_services = text_search_in_ptv(
+                    body_object,
+                    current_app.fasttext_embeddings,
+                    current_app.fasttext_model,
+                    current_app.xgboost_model,
+                    request.calling_service,
+                    request.path
+                )
+        except RecommenderTaskLimiterCapacityError:
+            return "Server busy.", 503
+        cache_response(cache_key, recommended_services)
+
+    recommendation_id = store_recommendation(
         [service['service_id'] for service in recommended_services],
         request
     )
@@ -320,7 +328,7 @@ def recommendation_feedback():
     feedback_score = req_data.get('feedback_score')
     service_feedbacks = req_data.get('service_feedbacks')
     try:
-        db.store_feedback(recommendation_id, feedback_score, service_feedbacks)
+        recommendation_events.store_feedback(recommendation_id, feedback_score, service_feedbacks)
     except db.InvalidRecommendationIdException as ex:
         return str(ex), 404
     except db.InvalidServiceIdException as ex:
@@ -352,11 +360,8 @@ def get_session_attributes():
     if not access_token:
         error_message = f'access_token is a required parameter'
         return _cross_origin(error_message, 400)
-    url = f'{profile_management_url}/v1/session_attributes?access_token={access_token}'
-    headers = {
-        'authorization': f'Key {profile_management.get_profile_management_api_key()}'}
     try:
-        response = requests.get(url, headers=headers)
+        response = profile_management.get_session_attributes(access_token)
     except IOError as error:
         log.audit.error(f'{error}')
         return _cross_origin("Server side error", 500)
@@ -0,0 +1,132 @@
+import math
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from recommender_api.db import get_all_service_descriptions
+from recommender_api.index_alignment import index_positions
+from recommender_api.search_text_filter import filter_special_chars
+
+
+class Bm25Index:
+    """
+    Okapi BM25 over the descriptions of all services, scored like rank_bm25.BM25Okapi but with the document
+    frequencies of the whole corpus. The postings of a term are the sorted document positions containing it and the
+    term frequencies in them, so scoring a few candidates takes a binary search per query term.
+    The optional service names are indexed for exact name lookups.
+    """
+
+    def __init__(self, documents: Dict[str, List[str]], names: Optional[Dict[str, Optional[str]]] = None,
+                 k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25):
+        self.k1 = k1
+        self.b = b
+        self.service_ids: List[str] = list(documents)
+        self._positions = {service_id: i for i, service_id in enumerate(documents)}
+        self.doc_len = np.array([len(tokens) for tokens in documents.values()], dtype=np.float64)
+        self.avgdl = self.doc_len.mean() if len(self.doc_len) else 0.0
+
+        postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        for position, tokens in enumerate(documents.values()):
+            for term, term_frequency in Counter(tokens).items():
+                term_positions, term_frequencies = postings.setdefault(term, ([], []))
+                term_positions.append(position)
+                term_frequencies.append(term_frequency)
+        self._postings = {
+            term: (np.array(term_positions, dtype=np.int32), np.array(term_frequencies, dtype=np.float64))
+            for term, (term_positions, term_frequencies) in postings.items()
+        }
+        self.idf = self._idf(epsilon)
+
+        self._names: Dict[str, List[int]] = {}
+        for service_id, name in (names or {}).items():
+            if name and service_id in self._positions:
+                self._names.setdefault(normalize_name(name), []).append(self._positions[service_id])
+
+    def _idf(self, epsilon: float) -> Dict[str, float]:
+        """Same as BM25Okapi: terms in more than half of the documents get epsilon times the average idf."""
+        corpus_size = len(self.doc_len)
+        idf = {
+            term: math.log(corpus_size - len(term_positions) + 0.5) - math.log(len(term_positions) + 0.5)
+            for term, (term_positions, _) in self._postings.items()
+        }
+        if idf:
+            floor = epsilon * sum(idf.values()) / len(idf)
+            idf = {term: value if value >= 0 else floor for term, value in idf.items()}
+        return idf
+
+    def __len__(self):
+        return len(self.doc_len)
+
+    def corpus_scores(self, tokenized_query: List[str]) -> np.ndarray:
+        """BM25 scores of all documents for the query, accumulated over the postings of the query terms."""
+        scores = np.zeros(len(self))
+        for term in tokenized_query:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            term_positions, term_frequencies = postings
+            length_norm = self.k1 * (1 - self.b + self.b * self.doc_len[term_positions] / self.avgdl)
+            scores[term_positions] += self.idf[term] * (
+                term_frequencies * (self.k1 + 1) / (term_frequencies + length_norm)
+            )
+        return scores
+
+    def positions(self, service_ids: Sequence[str]) -> np.ndarray:
+        """Index positions of the given service ids, -1 for services not in the index."""
+        return index_positions(self._positions, service_ids)
+
+    def aligned_scores(self, positions: np.ndarray, tokenized_query: List[str]) -> np.ndarray:
+        """
+        BM25 scores over rows (e.g. of the embedding matrix) given the index positions of the rows, e.g. from an
+        IndexAlignment. Zero for services not in the index.
+        """
+        # Position -1 points to the appended zero
+        return np.append(self.corpus_scores(tokenized_query), 0.0)[positions]
+
+    def aligned_name_mask(self, positions: np.ndarray, text: str) -> np.ndarray:
+        """
+        Boolean mask over rows given by their index positions of the services named exactly as the text,
+        ignoring case.
+        """
+        named = self._names.get(normalize_name(text))
+        if not named:
+            return np.zeros(len(positions), dtype=bool)
+        return np.isin(positions, named)
+
+    def scores(self, service_ids: List[str], tokenized_query: List[str]) -> np.ndarray:
+        """BM25 scores of the services for the query. Services outside the corpus score zero."""
+        known = np.array([service_id in self._positions for service_id in service_ids], dtype=bool)
+        positions = np.array([self._positions.get(service_id, 0) for service_id in service_ids], dtype=np.int32)
+        scores = np.zeros(len(service_ids))
+        if not len(self.doc_len):
+            return scores
+
+        length_norm = self.k1 * (1 - self.b + self.b * self.doc_len[positions] / self.avgdl)
+        for term in tokenized_query:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            term_positions, term_frequencies = postings
+            found = np.minimum(np.searchsorted(term_positions, positions), len(term_positions) - 1)
+            term_frequency = np.where(term_positions[found] == positions, term_frequencies[found], 0.0)
+            scores += self.idf[term] * (term_frequency * (self.k1 + 1) / (term_frequency + length_norm))
+        scores[~known] = 0.0
+        return scores
+
+
+def normalize_name(name: str) -> str:
+    """Filter the name like search texts, so that names with punctuation match the search text of the name."""
+    return ' '.join(filter_special_chars(name).lower().split())
+
+
+def build_bm25_index(tokenize: Callable[[Dict[str, Any]], List[str]]) -> Bm25Index:
+    """
+    Build the BM25 index of the descriptions of all services. The tokenize function turns a row of
+    db.get_all_service_descriptions into the terms of the document.
+    """
+    services = get_all_service_descriptions()
+    return Bm25Index(
+        {service['service_id']: tokenize(service) for service in services},
+        names={service['service_id']: service['service_name'] for service in services}
+    )
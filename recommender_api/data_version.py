@@ -0,0 +1,56 @@
+import time
+from threading import Lock
+from typing import Callable, Generic, Optional, TypeVar
+
+from recommender_api.db import get_latest_ptv_fetch_timestamp
+from recommender_api.tools.config import config
+from recommender_api.tools.logger import log
+
+DATA_VERSION_CHECK_INTERVAL_SECONDS = float(config['data_version_check_interval_seconds'])
+
+_data_version: Optional[str] = None
+_checked_at: Optional[float] = None
+_lock = Lock()
+
+T = TypeVar('T')
+
+
+def current_data_version() -> Optional[str]:
+    """
+    Return the version of the PTV data in the database. The PTV data loader stores a fetch timestamp after
+    every run, so the latest timestamp identifies the data version. The database is queried at most once per
+    check interval and the previously seen version is returned in between.
+    """
+    global _data_version, _checked_at  # pylint: disable=W0603
+
+    with _lock:
+        now = time.monotonic()
+        if _checked_at is None or now - _checked_at >= DATA_VERSION_CHECK_INTERVAL_SECONDS:
+            _data_version = get_latest_ptv_fetch_timestamp()
+            _checked_at = now
+
+        return _data_version
+
+
+class DataVersioned(Generic[T]):
+    """
+    Worker-resident value built from the PTV data, e.g. an in-memory copy of a table. get() builds the value on
+    first use and again whenever the PTV data version has changed since it was built.
+    """
+
+    def __init__(self, name: str, build: Callable[[], T]):
+        self.name = name
+        self._build = build
+        self._value: Optional[T] = None
+        self._data_version: Optional[str] = None
+        self._lock = Lock()
+
+    def get(self) -> T:
+        data_version = current_data_version()
+        with self._lock:
+            if self._value is None or self._data_version != data_version:
+                self._value = self._build()
+                self._data_version = data_version
+                log.debug(f'Built {self.name}, data version {data_version}')
+
+            return self._value
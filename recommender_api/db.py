@@ -1,17 +1,15 @@
 import re
-from typing import List, Set, Dict, Optional, Any, Union
+from datetime import datetime
+from typing import List, Set, Dict, Optional, Any, Tuple, Union
 from contextlib import contextmanager
 
 import flask
 from psycopg2 import sql  # type: ignore
 from psycopg2.extras import execute_values, Json, DictCursor  # type: ignore
 from psycopg2.errors import ForeignKeyViolation, OperationalError  # pylint: disable=E0611
-from psycopg2.pool import SimpleConnectionPool
-
-import pandas as pd
 
 from recommender_api.tools.config import config, env
-from recommender_api.tools.db import db_connection_pool_aws, db_connection_pool_classic
+from recommender_api.tools.db import BlockingConnectionPool, db_connection_pool_aws, db_connection_pool_classic
 from recommender_api.tools.logger import log
 
 from recommender_api.search_text_filter import filter_social_security_numbers
@@ -20,7 +18,15 @@ DB_HOST_ROUTING, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME, REGION = \
     config['db_host_routing'], config['db_port'], config['db_api_user'], \
     config.get('db_password'), config['db_name'], config['region']
 
-CONN_POOL: Optional[SimpleConnectionPool] = None
+POOL_OPTIONS = {
+    'min_conn': int(config['db_pool_min_connections']),
+    'max_conn': int(config['db_pool_max_connections']),
+    'timeout': float(config['db_pool_timeout_seconds']),
+    'validate_after': float(config['db_pool_validate_after_seconds']),
+    'max_connection_age': float(config['db_pool_max_connection_age_seconds'])
+}
+
+CONN_POOL: Optional[BlockingConnectionPool] = None
 
 
 class InvalidRecommendationIdException(Exception):
@@ -48,8 +54,11 @@ def database(cursor_factory=LoggingDictCursor):
     def create_pool():
         use_local_db = DB_HOST_ROUTING and DB_PASSWORD
 
-        pool, hostname = db_connection_pool_aws(DB_NAME, DB_PORT, DB_USER, REGION) if not use_local_db \
-            else db_connection_pool_classic(DB_HOST_ROUTING, DB_NAME, DB_PORT, DB_USER, DB_PASSWORD)
+        pool, hostname = db_connection_pool_aws(
+            DB_NAME, DB_PORT, DB_USER, REGION,
+            auth_token_max_age=float(config['db_auth_token_refresh_seconds']), **POOL_OPTIONS
+        ) if not use_local_db \
+            else db_connection_pool_classic(DB_HOST_ROUTING, DB_NAME, DB_PORT, DB_USER, DB_PASSWORD, **POOL_OPTIONS)
 
         log.technical.database(hostname, DB_PORT, DB_NAME)
         return pool
@@ -58,22 +67,25 @@ def database(cursor_factory=LoggingDictCursor):
     if CONN_POOL is None:
         CONN_POOL = create_pool()
 
+    # The connection goes back to the pool it came from, even if the pool is reset meanwhile
+    pool = CONN_POOL
     try:
-        con = CONN_POOL.getconn()
+        con = pool.getconn()
         cur = con.cursor(cursor_factory=cursor_factory)
     except OperationalError as err:
-        # Retry creating connection pool in case access token is not valid anymore
+        # Retry with a new access token in case the database did not accept the current one.
+        # The other connections of the pool stay open.
         log.technical.error(f'Error connecting to db: {err}')
 
-        CONN_POOL = create_pool()
-        con = CONN_POOL.getconn()
+        pool.invalidate_credentials()
+        con = pool.getconn()
         cur = con.cursor(cursor_factory=cursor_factory)
 
     try:
         yield con, cur
     finally:
         cur.close()
-        CONN_POOL.putconn(con)
+        pool.putconn(con)
 
 
 def reset_db_connection_pool():
@@ -87,6 +99,11 @@ def reset_db_connection_pool():
         CONN_POOL = None
 
 
+def connection_pool_stats() -> Optional[Dict[str, Any]]:
+    """Usage and wait statistics of the worker's connection pool, None before the first connection."""
+    return CONN_POOL.stats() if CONN_POOL else None
+
+
 def get_random_services(municipality: Optional[str] = None, limit: int = 5) -> List[Dict[str, Any]]:
     if municipality:
         db_query = sql.SQL("""
@@ -116,182 +133,51 @@ def get_random_services(municipality: Optional[str] = None, limit: int = 5) -> L
     return result
 
 
-def _build_service_classes_filter_sql(skip: bool):
-    return sql.SQL("") if skip else sql.SQL(
-        """
-        INNER JOIN jsonb_array_elements(service_data->'serviceClasses') AS serviceClass ON (
-          serviceClass->>'newUri' IN %(service_classes)s
-          OR serviceClass->>'newParentUri' IN %(service_classes)s
-        )
-        """
-    )
-
-
-def _build_target_group_filter_sql(skip: bool):
-    return sql.SQL("") if skip else sql.SQL(
-        """
-        INNER JOIN jsonb_array_elements(service_data->'targetGroups') AS targetGroup ON (
-          targetGroup->>'code' IN %(target_groups)s
-        )
-        """
-    )
-
-
-def _build_funding_type_filter(skip: bool):
-    if skip:
-        return sql.SQL("TRUE")
-
-    return sql.SQL(
-        "(service_data->>'fundingType' IN %(funding_type)s)"
-    )
-
+def get_service_filter_data() -> List[Dict[str, Any]]:
+    """
+    Fetch the filterable attributes of all non-archived services. Used to build the in-memory filter index.
+    """
+    db_query = sql.SQL("""
+        SELECT service_id,
+               area_type,
+               municipality_codes,
+               service_data->>'fundingType' AS funding_type,
+               jsonb_path_query_array(service_data, '$.serviceClasses[*].newUri') AS service_class_uris,
+               jsonb_path_query_array(service_data, '$.serviceClasses[*].newParentUri') AS service_class_parent_uris,
+               jsonb_path_query_array(service_data, '$.targetGroups[*].code') AS target_groups,
+               jsonb_path_query_array(service_data, '$.serviceCollections[*].id') AS service_collections
+        FROM service_recommender.service
+        WHERE (NOT archived);
+    """)
 
-def _build_service_collection_filter(skip: bool):
-    return sql.SQL("") if skip else sql.SQL(
-        """
-        INNER JOIN jsonb_array_elements(service_data->'serviceCollections') AS serviceCollection ON (
-          serviceCollection->>'id' IN %(service_collections)s
-        )
-        """
-    )
+    with database(cursor_factory=LoggingDictCursor) as (_, cur):
+        cur.execute(db_query)
+        return [dict(row) for row in cur.fetchall()]
 
 
-def _build_municipality_filter_sql(municipality_codes: List[str], include_national: bool, only_national: bool):
-    if only_national:
-        return sql.SQL("(area_type LIKE 'Nationwide%%')")
-
-    if not municipality_codes and not include_national:
-        return sql.SQL("(area_type NOT LIKE 'Nationwide%%')")
-
-    if not municipality_codes and include_national:
-        return sql.SQL("TRUE")
-
-    return sql.SQL("""(
-        (%(include_national)s AND area_type LIKE 'Nationwide%%') OR
-        (string_to_array(municipality_codes, ' ') && %(municipality_codes)s)
-    )""")
-
-
-def build_sql_filter_queries(
-        municipality_codes: List[str],
-        include_national: bool,
-        only_national: bool,
-        service_classes: List[str],
-        target_groups: List[str],
-        service_collections: List[str],
-        funding_type: List[str],
-) -> Dict[str, str]:
-    return {
-        'municipality_filter': _build_municipality_filter_sql(municipality_codes, include_national, only_national),
-        'service_class_filter': _build_service_classes_filter_sql(skip=(service_classes == [])),
-        'target_group_filter': _build_target_group_filter_sql(skip=(target_groups == [])),
-        'service_collection_filter': _build_service_collection_filter(skip=(service_collections == [])),
-        'funding_type_filter': _build_funding_type_filter(skip=(funding_type == [] or not funding_type)),
-    }
-
-
-def get_filtered_service_ids(
-        municipality_codes: List[str],
-        include_national: bool,
-        only_national: bool,
-        service_classes: List[str],
-        target_groups: List[str],
-        service_collections: List[str],
-        funding_type: List[str],
-) -> List[str]:
-    db_query = sql.SQL("""
-        SELECT DISTINCT service_id
-        FROM service_recommender.service
-        {service_class_filter} {target_group_filter} {service_collection_filter} 
-        WHERE {municipality_filter} 
-          AND {funding_type_filter} 
-          AND (NOT archived);
-    """).format(
-        **build_sql_filter_queries(
-            municipality_codes,
-            include_national,
-            only_national,
-            service_classes,
-            target_groups,
-            service_collections,
-            funding_type
-        )
-    )
+def get_latest_ptv_fetch_timestamp() -> Optional[str]:
+    db_query = sql.SQL("SELECT max(time) FROM service_recommender.ptv_fetch_timestamp;")
 
     with database(cursor_factory=LoggingDictCursor) as (_, cur):
-        cur.execute(
-            db_query,
-            {
-                'service_classes': tuple(service_classes),
-                'municipality_codes': municipality_codes,
-                'include_national': include_national,
-                'only_national': only_national,
-                'target_groups': tuple(target_groups),
-                'service_collections': tuple(service_collections),
-                'funding_type': tuple(funding_type)
-            }
-        )
-        service_ids = [data[0] for data in cur.fetchall()]
+        cur.execute(db_query)
+        timestamp = cur.fetchone()[0]
 
-    return service_ids
+    return timestamp.isoformat() if timestamp is not None else None
 
 
-def get_service_vectors(
-        municipality_codes: List[str],
-        include_national: bool,
-        only_national: bool,
-        service_classes: List[str],
-        target_groups: List[str],
-        service_collections: List[str],
-        funding_type: List[str],
-) -> pd.DataFrame:
+def get_all_service_vectors() -> List[Dict[str, Any]]:
+    """
+    Fetch all service vectors. Used to build the in-memory service vector matrix.
+    """
     db_query = sql.SQL("""
-        SELECT DISTINCT vector.*
-        FROM service_recommender.service_vectors vector
-        INNER JOIN service_recommender.service service
-        ON service.service_id = vector.service_id 
-          AND (NOT service.archived) 
-          AND {municipality_filter} 
-          AND {funding_type_filter}
-        {service_class_filter} {target_group_filter} {service_collection_filter} 
-    """).format(
-        **build_sql_filter_queries(
-            municipality_codes,
-            include_national,
-            only_national,
-            service_classes,
-            target_groups,
-            service_collections,
-            funding_type
-        )
-    )
+        SELECT *
+        FROM service_recommender.service_vectors
+        ORDER BY service_id;
+    """)
 
     with database(cursor_factory=LoggingDictCursor) as (_, cur):
-        cur.execute(
-            db_query,
-            {
-                'service_classes': tuple(service_classes),
-                'municipality_codes': municipality_codes,
-                'include_national': include_national,
-                'only_national': only_national,
-                'target_groups': tuple(target_groups),
-                'service_collections': tuple(service_collections),
-                'funding_type': tuple(funding_type)
-            }
-        )
-        data = cur.fetchall()
-
-        # Extract the column names
-        col_names = []
-        for elt in cur.description:
-            col_names.append(elt[0])
-
-        data_frame = pd.DataFrame(data, columns=col_names)
-        data_frame.set_index('service_id', inplace=True)
-        # Remove area_type as it's not used after this
-        data_frame.drop('municipality_code', inplace=True, axis=1)
-        log.debug(f'Results ready {data_frame}')
-        return data_frame
+        cur.execute(db_query)
+        return [dict(row) for row in cur.fetchall()]
 
 
 def _select_jsonb_where_id_in_list(
@@ -322,10 +208,115 @@ def get_service_channels_ptv_data(id_list: Set[str]) -> List[Dict[str, Any]]:
     return _select_jsonb_where_id_in_list('service_channel', 'service_channel_data', 'service_channel_id', id_list)
 
 
+def get_services_and_channels_ptv_data(
+        id_list: List[str],
+        service_fields: List[str],
+        service_channel_fields: List[str],
+        service_channel_types: List[str]
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Fetch the PTV data of the services and of their non-archived service channels of the given types in one query.
+    Only the given top-level fields of the PTV documents are returned.
+    """
+    if not id_list:
+        return [], []
+
+    db_query = sql.SQL("""
+        SELECT
+            (SELECT jsonb_object_agg(field.key, field.value)
+             FROM jsonb_each(service.service_data) field
+             WHERE field.key = ANY(%(service_fields)s)) AS service,
+            (SELECT jsonb_agg((SELECT jsonb_object_agg(field.key, field.value)
+                               FROM jsonb_each(channel.service_channel_data) field
+                               WHERE field.key = ANY(%(service_channel_fields)s)))
+             FROM service_recommender.service_channel channel
+             WHERE channel.service_channel_id IN (
+                 SELECT service_channel -> 'serviceChannel' ->> 'id'
+                 FROM jsonb_array_elements(
+                     CASE WHEN jsonb_typeof(service.service_data -> 'serviceChannels') = 'array'
+                          THEN service.service_data -> 'serviceChannels' ELSE '[]' END
+                 ) service_channel
+             )
+               AND NOT channel.archived
+               AND channel.service_channel_data ->> 'serviceChannelType' = ANY(%(service_channel_types)s)
+            ) AS service_channels
+        FROM service_recommender.service service
+        WHERE service.service_id IN %(id_list)s
+          AND NOT service.archived
+          AND service.service_data IS NOT NULL;
+    """)
+
+    with database(cursor_factory=LoggingDictCursor) as (_, cur):
+        cur.execute(db_query, {
+            'id_list': tuple(id_list),
+            'service_fields': list(service_fields),
+            'service_channel_fields': list(service_channel_fields),
+            'service_channel_types': list(service_channel_types)
+        })
+        services = []
+        # A channel of several services is returned with each of them
+        service_channels: Dict[str, Dict[str, Any]] = {}
+        for row in cur:
+            services.append(row['service'] or {})
+            for channel in row['service_channels'] or []:
+                service_channels[channel['id']] = channel
+        return services, list(service_channels.values())
+
+
+def get_formatted_services(id_list: List[str], language: str) -> List[Dict[str, Any]]:
+    """
+    Fetch the services formatted by the PTV data loader in the given language, with their formatted service
+    channels by id. Archived services and channels are left out.
+    """
+    if not id_list:
+        return []
+
+    db_query = sql.SQL("""
+        SELECT formatted.service_id,
+               formatted.service_channel_ids,
+               formatted.document,
+               (SELECT coalesce(jsonb_object_agg(channel.service_channel_id, channel.document), '{}')
+                FROM service_recommender.formatted_service_channel channel
+                INNER JOIN service_recommender.service_channel
+                    ON service_channel.service_channel_id = channel.service_channel_id
+                WHERE channel.service_channel_id = ANY(formatted.service_channel_ids)
+                  AND channel.language = formatted.language
+                  AND NOT service_channel.archived) AS service_channels
+        FROM service_recommender.formatted_service formatted
+        INNER JOIN service_recommender.service service ON service.service_id = formatted.service_id
+        WHERE formatted.service_id IN %(id_list)s
+          AND formatted.language = %(language)s
+          AND NOT service.archived;
+    """)
+
+    with database(cursor_factory=LoggingDictCursor) as (_, cur):
+        cur.execute(db_query, {'id_list': tuple(id_list), 'language': language})
+        return [dict(row) for row in cur.fetchall()]
+
+
 def format_multiword_search(search: str) -> str:
     return search.replace(' ', '|')
 
 
+def recommendation_record(request) -> Tuple[Optional[str], str, str, str, Dict[str, Any]]:
+    """
+    The session id, calling organisation, calling service, request path and request attributes stored for
+    a recommendation of the request. Social security numbers are removed from the search text.
+    """
+    request_body = request.get_json()
+    if 'search_text' in request_body:
+        request_body['search_text'] = filter_social_security_numbers(
+            request_body['search_text'])
+
+    return (
+        request_body.get('session_id'),
+        request.calling_organisation,
+        request.calling_service,
+        request.path,
+        request_body
+    )
+
+
 def _store_recommendation_base(cursor, request):
     recommendation_query = \
         'insert into service_recommender.recommendation ' \
@@ -333,19 +324,16 @@ def _store_recommendation_base(cursor, request):
         'values (%s, %s, %s, %s, %s) ' \
         'returning recommendation_id'
 
-    request_body = request.get_json()
-    if 'search_text' in request_body:
-        request_body['search_text'] = filter_social_security_numbers(
-            request_body['search_text'])
-
+    session_id, calling_organisation, calling_service, request_path, request_attributes = \
+        recommendation_record(request)
     cursor.execute(
         recommendation_query,
         (
-            request_body.get('session_id'),
-            request.calling_organisation,
-            request.calling_service,
-            request.path,
-            Json(request_body)
+            session_id,
+            calling_organisation,
+            calling_service,
+            request_path,
+            Json(request_attributes)
         )
     )
     result = cursor.fetchone()
@@ -375,6 +363,108 @@ def store_recommendations_db(
     return recommendation_id
 
 
+def allocate_recommendation_ids(count: int) -> List[int]:
+    """
+    Reserve ids for recommendations stored later with store_recommendation_batch. The ids are unique but not
+    necessarily consecutive, and unused ids are skipped like those of rolled back inserts.
+    """
+    db_query = sql.SQL("""
+        SELECT nextval(pg_get_serial_sequence('service_recommender.recommendation', 'recommendation_id'))
+        FROM generate_series(1, %(count)s);
+    """)
+
+    with database() as (conn, cur):
+        cur.execute(db_query, {'count': count})
+        recommendation_ids = [row[0] for row in cur.fetchall()]
+        conn.commit()
+
+    return recommendation_ids
+
+
+def store_recommendation_batch(recommendations: List[Tuple[int, datetime, tuple, List[str]]]):
+    """
+    Store recommendations with allocated ids in one transaction. Each recommendation is the id, the time of
+    the recommendation, the recommendation_record of the request and the recommended service ids.
+    """
+    with database() as (conn, cur):
+        execute_values(
+            cur,
+            'insert into service_recommender.recommendation '
+            '(recommendation_id, recommendation_time, session_id, calling_organisation, calling_service, '
+            'request_path, request_attributes) values %s',
+            [
+                (recommendation_id, recommendation_time, *record[:4], Json(record[4]))
+                for recommendation_id, recommendation_time, record, _ in recommendations
+            ],
+            page_size=1000
+        )
+        execute_values(
+            cur,
+            'insert into service_recommender.recommendation_service (recommendation_id, service_id) values %s',
+            [
+                (recommendation_id, service_id)
+                for recommendation_id, _, _, services in recommendations
+                for service_id in services
+            ],
+            page_size=1000
+        )
+        conn.commit()
+
+
+def get_recommended_services(recommendation_id: int) -> Optional[List[str]]:
+    """
+    Fetch the recommended service ids of the recommendation, None if there is no such recommendation.
+    """
+    db_query = sql.SQL("""
+        SELECT array_remove(array_agg(recommended.service_id), NULL) AS service_ids
+        FROM service_recommender.recommendation recommendation
+        LEFT JOIN service_recommender.recommendation_service recommended
+            ON recommended.recommendation_id = recommendation.recommendation_id
+        WHERE recommendation.recommendation_id = %(recommendation_id)s
+        GROUP BY recommendation.recommendation_id;
+    """)
+
+    with database(cursor_factory=LoggingDictCursor) as (_, cur):
+        cur.execute(db_query, {'recommendation_id': recommendation_id})
+        row = cur.fetchone()
+
+    return list(row['service_ids']) if row is not None else None
+
+
+def store_recommendation_events(redirects: List[tuple], feedbacks: List[tuple], service_feedbacks: List[tuple]):
+    """
+    Store redirects (recommendation_id, service_id, service_channel_id, auroraai_access_token, redirect_time),
+    feedbacks (recommendation_id, feedback_score) and service feedbacks (recommendation_id, service_id,
+    feedback_score) in one transaction. The recommendations must have been validated.
+    """
+    with database() as (conn, cur):
+        if redirects:
+            execute_values(
+                cur,
+                'insert into service_recommender.recommendation_redirect '
+                '(recommendation_id, service_id, service_channel_id, auroraai_access_token, redirect_time) values %s',
+                redirects,
+                page_size=1000
+            )
+        if feedbacks:
+            execute_values(
+                cur,
+                'insert into service_recommender.recommendation_feedback (recommendation_id, feedback_score) '
+                'values %s',
+                feedbacks,
+                page_size=1000
+            )
+        if service_feedbacks:
+            execute_values(
+                cur,
+                'insert into service_recommender.recommendation_service_feedback '
+                '(recommendation_id, service_id, feedback_score) values %s',
+                service_feedbacks,
+                page_size=1000
+            )
+        conn.commit()
+
+
 def store_redirect(recommendation_id, service_id, service_channel_id, auroraai_access_token):
     with database() as (conn, cur):
         try:
@@ -471,36 +561,88 @@ def get_service_descriptions(service_ids: List[str]) -> Dict[str, Dict[str, str]
     return service_descriptions
 
 
-def get_redirects_and_feedback(service_ids: List[str], calling_service: str) -> pd.DataFrame:
+def get_all_service_descriptions() -> List[Dict[str, Any]]:
+    """
+    Fetch the descriptions and names of all non-archived services, in the format of get_service_descriptions.
+    """
     db_query = sql.SQL("""
-        SELECT a.recommendation_id
-            , a.service_id
-            , b.feedback_score
-            , c.calling_service
-            , d.redirect_time
-            FROM service_recommender.recommendation_service AS a
-            LEFT JOIN service_recommender.recommendation_service_feedback AS b
-                ON a.recommendation_id = b.recommendation_id AND a.service_id = b.service_id
-            INNER JOIN service_recommender.recommendation as c
-                ON a.recommendation_id = c.recommendation_id
-            LEFT JOIN service_recommender.recommendation_redirect as d
-                ON  a.recommendation_id = d.recommendation_id AND a.service_id = d.service_id
-        WHERE a.service_id IN %(service_ids)s AND c.calling_service = %(calling_service)s
-        ORDER BY a.recommendation_id, a.service_id;
-            """)
+        SELECT service_id, description, description_summary, user_instruction, service_name
+        FROM service_recommender.service
+        WHERE (NOT archived);
+    """)
 
     with database(cursor_factory=LoggingDictCursor) as (_, cur):
-        cur.execute(
-            db_query,
+        cur.execute(db_query)
+        return [
             {
-                'service_ids': tuple(service_ids),
-                'calling_service': calling_service
-            }
-        )
-        feedback_data = cur.fetchall()
+                'service_id': item[0],
+                'service_description': item[1],
+                'description_summary': item[2],
+                'user_instruction': item[3],
+                'service_name': item[4]
+            } for item in cur.fetchall()
+        ]
+
+
+def get_service_channel_ids_of_type(service_channel_type: str) -> List[str]:
+    """
+    Fetch the ids of the non-archived service channels of the given PTV type, e.g. EChannel.
+    """
+    db_query = sql.SQL("""
+        SELECT service_channel_id
+        FROM service_recommender.service_channel
+        WHERE service_channel_data->>'serviceChannelType' = %(service_channel_type)s
+          AND NOT archived;
+    """)
+
+    with database(cursor_factory=LoggingDictCursor) as (_, cur):
+        cur.execute(db_query, {'service_channel_type': service_channel_type})
+        return [row['service_channel_id'] for row in cur.fetchall()]
 
-    feedback_data = pd.DataFrame(feedback_data,
-                                 columns=['recommendation_id', 'service_id', 'feedback_score',
-                                          'calling_service', 'redirect_time'])
 
-    return feedback_data
+def get_service_channel_web_pages() -> List[Dict[str, Any]]:
+    """
+    Fetch the URLs of the Finnish web pages of all non-archived service channels, in the order of the PTV data
+    so that redirect link ids index them. Pages without a URL have an empty one.
+    """
+    db_query = sql.SQL("""
+        SELECT service_channel_id,
+               ARRAY(
+                   SELECT coalesce(page->>'url', '')
+                   FROM jsonb_array_elements(
+                       CASE WHEN jsonb_typeof(service_channel_data->'webPages') = 'array'
+                            THEN service_channel_data->'webPages' ELSE '[]'::jsonb END
+                   ) WITH ORDINALITY AS pages(page, ordinal)
+                   WHERE page->>'language' = 'fi'
+                   ORDER BY ordinal
+               ) AS web_pages
+        FROM service_recommender.service_channel
+        WHERE NOT archived;
+    """)
+
+    with database(cursor_factory=LoggingDictCursor) as (_, cur):
+        cur.execute(db_query)
+        return [dict(row) for row in cur.fetchall()]
+
+
+def get_service_feedback_counts() -> List[Dict[str, Any]]:
+    """
+    Fetch the redirect and feedback counts per calling service and service, refreshed by the PTV data loader.
+    """
+    db_query = sql.SQL("""
+        SELECT calling_service, service_id, redirects, positive_feedbacks, negative_feedbacks
+        FROM service_recommender.service_feedback_counts;
+    """)
+
+    with database(cursor_factory=LoggingDictCursor) as (_, cur):
+        cur.execute(db_query)
+        return [dict(row) for row in cur.fetchall()]
+
+
+def get_service_collection_ids() -> Set[str]:
+    """
+    Fetch the ids of the non-archived service collections, stored by the PTV data loader.
+    """
+    with database(cursor_factory=LoggingDictCursor) as (_, cur):
+        cur.execute('SELECT service_collection_id FROM service_recommender.service_collection;')
+        return {row['service_collection_id'] for row in cur.fetchall()}
@@ -0,0 +1,138 @@
+import argparse
+import pickle
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from recommender_api.index_alignment import IndexAlignment
+
+NPY_SUFFIX = '.npy'
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize the rows of the matrix in place. All-zero rows are left as zeros."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+def select_top_k(rows: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """The k rows with the highest scores and their scores, in decreasing order of score."""
+    k = min(k, len(rows))
+    if k <= 0:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.float32)
+
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top], kind='stable')]
+    return rows[top], scores[top]
+
+
+class PtvEmbeddings:
+    """
+    fastText sentence embeddings of the PTV services.
+
+    The embeddings are stored once as a contiguous float32 matrix with L2-normalized rows, so that
+    the cosine similarities of a query against all services are a single matrix-vector product.
+    Row i of the matrix is the embedding of service ids[i].
+    """
+
+    def __init__(self, ids: Sequence[str], values: Any, normalized: bool = False):
+        self.ids: List[str] = list(ids)
+        self.ann_index: Optional[Any] = None
+        # Positions of the rows in the worker's service filter and BM25 indexes
+        self.filter_index_alignment = IndexAlignment(self.ids)
+        self.bm25_index_alignment = IndexAlignment(self.ids)
+        if normalized:
+            self.values = np.asarray(values, dtype=np.float32)
+        else:
+            self.values = normalize_rows(np.array(values, dtype=np.float32, order='C'))
+
+        if self.values.ndim != 2 or len(self.values) != len(self.ids):
+            raise ValueError(f'Embedding matrix of shape {self.values.shape} does not match {len(self.ids)} ids.')
+
+    @classmethod
+    def from_dict(cls, embeddings: Dict[str, Any]) -> 'PtvEmbeddings':
+        """Create from the {'ids': [...], 'values': [...]} dict stored in the embeddings pickle."""
+        return cls(embeddings['ids'], embeddings['values'])
+
+    def __len__(self):
+        return len(self.ids)
+
+    def similarities(self, query: np.ndarray) -> np.ndarray:
+        """Cosine similarities of the query vector against all rows."""
+        query = np.asarray(query, dtype=np.float32)
+        query_norm = np.linalg.norm(query)
+        if query_norm == 0:
+            return np.zeros(len(self), dtype=np.float32)
+        return self.values @ (query / query_norm)
+
+    def row_similarities(self, rows: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Cosine similarities of the query vector against the given rows only."""
+        query = np.asarray(query, dtype=np.float32)
+        query_norm = np.linalg.norm(query)
+        if query_norm == 0:
+            return np.zeros(len(rows), dtype=np.float32)
+        return self.values[rows] @ (query / query_norm)
+
+    def top_k(self, query: np.ndarray, k: int, mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Row indices and cosine similarities of the k rows most similar to the query among the rows
+        selected by the boolean mask, in decreasing order of similarity. Uses the approximate
+        nearest-neighbour index when one is attached, otherwise scores all rows.
+        """
+        if self.ann_index is not None:
+            return self.ann_index.top_k(self.values, query, k, mask)
+        return self.exact_top_k(query, k, mask)
+
+    def exact_top_k(self, query: np.ndarray, k: int, mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Brute-force top_k over all rows selected by the mask."""
+        candidates = np.flatnonzero(mask)
+        if len(candidates) == 0:
+            return select_top_k(candidates, np.array([], dtype=np.float32), k)
+        return select_top_k(candidates, self.similarities(query)[candidates], k)
+
+
+def ids_file_path(file_path: str) -> str:
+    """Path of the id table stored next to an .npy embedding matrix."""
+    return f'{file_path[:-len(NPY_SUFFIX)]}.ids{NPY_SUFFIX}'
+
+
+def save_npy(embeddings: PtvEmbeddings, file_path: str):
+    """Store the normalized matrix as .npy and the row ids as a fixed-width byte string table next to it."""
+    np.save(file_path, embeddings.values)
+    np.save(ids_file_path(file_path), np.array(embeddings.ids, dtype=np.bytes_))
+
+
+def load_npy(file_path: str) -> PtvEmbeddings:
+    """
+    Memory-map the .npy embedding matrix read-only. The pages are backed by the file, so the Gunicorn
+    workers share one physical copy of the matrix instead of each gradually copying the unpickled arrays.
+    """
+    values = np.load(file_path, mmap_mode='r')
+
+    # Rows of the same service share one id string
+    unique_ids, row_ids = np.unique(np.load(ids_file_path(file_path)), return_inverse=True)
+    unique_ids = [service_id.decode('utf-8') for service_id in unique_ids]
+    return PtvEmbeddings([unique_ids[i] for i in row_ids], values, normalized=True)
+
+
+def load_embeddings(file_path: str) -> PtvEmbeddings:
+    """Load the embeddings from an .npy matrix written by save_npy, or from the pickle of the fastText training."""
+    if file_path.endswith(NPY_SUFFIX):
+        return load_npy(file_path)
+
+    with open(file_path, 'rb') as embeddings_file:
+        return PtvEmbeddings.from_dict(pickle.load(embeddings_file))
+
+
+def run():
+    parser = argparse.ArgumentParser(description='Convert the fastText embeddings pickle to the .npy format.')
+    parser.add_argument('pickle_file', help='ptv-embeddings.pkl')
+    parser.add_argument('npy_file', help='Output matrix, e.g. ptv-embeddings.npy. The ids are written to .ids.npy')
+    args = parser.parse_args()
+
+    save_npy(load_embeddings(args.pickle_file), args.npy_file)
+
+
+if __name__ == '__main__':
+    run()
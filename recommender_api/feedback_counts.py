@@ -0,0 +1,32 @@
+from typing import Any, Dict, List, Tuple
+
+from recommender_api.data_version import DataVersioned
+from recommender_api.db import get_service_feedback_counts
+
+
+class ServiceFeedbackCounts:
+    """
+    In-memory copy of the redirect and feedback counts per calling service and service,
+    i.e. the prev_redirects_service, prev_pos_feedback_service and prev_neg_feedback_service reranker features.
+    """
+
+    def __init__(self, rows: List[Dict[str, Any]]):
+        self._counts: Dict[Tuple[str, str], Tuple[int, int, int]] = {
+            (row['calling_service'], row['service_id']):
+                (row['redirects'], row['positive_feedbacks'], row['negative_feedbacks'])
+            for row in rows
+        }
+
+    def __len__(self):
+        return len(self._counts)
+
+    def features(self, service_ids: List[str], calling_service: str) -> List[Tuple[int, int, int]]:
+        """
+        Redirect, positive feedback and negative feedback counts of each service when recommended to the calling
+        service, zeros for services without any.
+        """
+        return [self._counts.get((calling_service, service_id), (0, 0, 0)) for service_id in service_ids]
+
+
+# The worker's feedback counts. The PTV data loader refreshes the counts before storing a new fetch timestamp.
+SERVICE_FEEDBACK_COUNTS = DataVersioned('feedback counts', lambda: ServiceFeedbackCounts(get_service_feedback_counts()))
@@ -6,6 +6,7 @@ import tools
 from gunicorn import glogging
 from tools.logger import AuroraAiJsonFormatter
 
+from recommender_api.main import init_worker, shutdown_worker
 from recommender_api.tools.logger import log
 
 
@@ -36,3 +37,8 @@ preload_app = True
 def post_worker_init(worker: gunicorn.workers.base.Worker):
     log.debug("forked worker")
     log.debug(f'{worker.wsgi.fasttext_model}')
+    init_worker()
+
+
+def worker_exit(server, worker: gunicorn.workers.base.Worker):
+    shutdown_worker()
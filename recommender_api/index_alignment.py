@@ -0,0 +1,35 @@
+from threading import Lock
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+
+def index_positions(positions: Dict[str, int], service_ids: Sequence[str]) -> np.ndarray:
+    """Positions of the given service ids in an index with the given positions, -1 for services not in it."""
+    return np.fromiter(
+        (positions.get(service_id, -1) for service_id in service_ids),
+        dtype=np.int64,
+        count=len(service_ids)
+    )
+
+
+class IndexAlignment:
+    """
+    Positions of a fixed list of service ids, e.g. the rows of the embedding matrix, in an index of services
+    such as ServiceFilterIndex or Bm25Index. The positions are computed once per index, and only those of the
+    latest index are kept, so a rebuilt index replaces them.
+    """
+
+    def __init__(self, service_ids: Sequence[str]):
+        self.service_ids = service_ids
+        self._index: Optional[Any] = None
+        self._positions = np.array([], dtype=np.int64)
+        self._lock = Lock()
+
+    def positions(self, index: Any) -> np.ndarray:
+        """The positions of the service ids in the index, as returned by index.positions."""
+        with self._lock:
+            if index is not self._index:
+                self._positions = index.positions(self.service_ids)
+                self._index = index
+            return self._positions
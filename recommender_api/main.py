@@ -1,16 +1,26 @@
 import os
-import pickle
 from pathlib import Path
 
 import boto3
 from boto3.s3.transfer import TransferConfig
 
-from flask import Flask
+from flask import Flask, jsonify
 
-from recommender_api import ft
+from recommender_api import ft, profile_management
 from recommender_api.blueprints.blueprints import recommendation_blueprint
-from recommender_api.db import reset_db_connection_pool
-
+from recommender_api.db import connection_pool_stats, reset_db_connection_pool
+from recommender_api.ann_index import load_ivf_index
+from recommender_api.embeddings import PtvEmbeddings, load_embeddings
+from recommender_api.feedback_counts import SERVICE_FEEDBACK_COUNTS
+from recommender_api.recommendation_events import flush_events
+from recommender_api.recommendation_writer import flush_recommendations
+from recommender_api.service_channel_web_pages import SERVICE_CHANNEL_WEB_PAGES
+from recommender_api.service_filter_index import SERVICE_FILTER_INDEX
+from recommender_api.service_vectors import SERVICE_VECTORS
+from recommender_api.service_recommender import BM25_INDEX
+
+from recommender_api.tools.cache import cache_stats
+from recommender_api.tools.http_client import http_client_stats
 from recommender_api.tools.config import config, env
 from recommender_api.tools.logger import log, LogOperationName
 
@@ -42,12 +52,58 @@ def create_utility_endpoints(app):
     def healthcheck():
         return "Healthcheck OK"
 
+    @app.route("/service-recommender/metrics/")
+    def metrics():
+        # Counters are per worker process
+        return jsonify({
+            'pid': os.getpid(),
+            'caches': cache_stats(),
+            'db_pool': connection_pool_stats(),
+            'http_clients': http_client_stats()
+        })
+
+
+def init_worker():
+    """
+    Build the worker-resident data structures after Gunicorn has forked the worker,
+    so that the first requests do not have to wait for them.
+    """
+    with log.open():
+        try:
+            SERVICE_FILTER_INDEX.get()
+            SERVICE_VECTORS.get()
+            SERVICE_FEEDBACK_COUNTS.get()
+            SERVICE_CHANNEL_WEB_PAGES.get()
+            if config['bm25_mode'] == 'corpus' or config['text_search_retrieval'] == 'hybrid':
+                BM25_INDEX.get()
+        except Exception as error:  # pylint: disable=W0703
+            # The structures are built lazily on first use if warm-up fails
+            log.technical.error(f'Worker warm-up failed: {error}')
+
+        try:
+            profile_management.warm_up_session_transfer_supports()
+        except Exception as error:  # pylint: disable=W0703
+            # Uncached session transfer supports are queried on use
+            log.technical.error(f'Session transfer support warm-up failed: {error}')
+
+
+def shutdown_worker():
+    """Store the recommendations, redirects and feedback the worker has queued before it exits."""
+    with log.open():
+        try:
+            flush_recommendations()
+            flush_events()
+        except Exception as error:  # pylint: disable=W0703
+            log.technical.error(f'Storing queued recommendations and events failed: {error}')
+
+
+def load_fasttext_embeddings(path) -> PtvEmbeddings:
+    embeddings = load_embeddings(f'{path}/{config["fasttext_embeddings_file"]}')
+
+    if config['text_search_index'] == 'ivf':
+        embeddings.ann_index = load_ivf_index(f'{path}/{config["fasttext_ann_index_file"]}', embeddings)
 
-def load_fasttext_embeddings(path):
-    with open(
-            f'{path}/{config["fasttext_embeddings_file"]}', 'rb'
-        ) as embeddings_file:
-        return pickle.load(embeddings_file)
+    return embeddings
 
 
 def init_fasttext(app, path):
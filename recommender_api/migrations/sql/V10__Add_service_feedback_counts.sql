@@ -0,0 +1,49 @@
+-- Redirect and feedback counts per calling service and service, used as reranker features.
+-- A redirected recommended service counts as a redirect. Feedback is counted only for recommended services
+-- without redirects, using the latest feedback given to the recommended service.
+CREATE TABLE service_recommender.service_feedback_counts (
+    calling_service text NOT NULL,
+    service_id text NOT NULL,
+    redirects integer NOT NULL,
+    positive_feedbacks integer NOT NULL,
+    negative_feedbacks integer NOT NULL,
+    CONSTRAINT service_feedback_counts_pkey PRIMARY KEY (calling_service, service_id)
+);
+
+CREATE FUNCTION service_recommender.refresh_service_feedback_counts() RETURNS void AS $$
+    DELETE FROM service_recommender.service_feedback_counts;
+
+    INSERT INTO service_recommender.service_feedback_counts
+    WITH redirected AS (
+        SELECT DISTINCT recommendation_id, service_id
+        FROM service_recommender.recommendation_redirect
+    ), latest_feedback AS (
+        SELECT DISTINCT ON (recommendation_id, service_id) recommendation_id, service_id, feedback_score
+        FROM service_recommender.recommendation_service_feedback
+        WHERE feedback_score IS NOT NULL
+        ORDER BY recommendation_id, service_id, ctid DESC
+    )
+    SELECT recommendation.calling_service,
+           recommended.service_id,
+           count(redirected.recommendation_id) AS redirects,
+           count(*) FILTER (WHERE redirected.recommendation_id IS NULL AND feedback.feedback_score = 1)
+               AS positive_feedbacks,
+           count(*) FILTER (WHERE redirected.recommendation_id IS NULL AND feedback.feedback_score = -1)
+               AS negative_feedbacks
+    FROM service_recommender.recommendation_service recommended
+    INNER JOIN service_recommender.recommendation recommendation
+        ON recommendation.recommendation_id = recommended.recommendation_id
+    LEFT JOIN redirected
+        ON redirected.recommendation_id = recommended.recommendation_id
+        AND redirected.service_id = recommended.service_id
+    LEFT JOIN latest_feedback feedback
+        ON feedback.recommendation_id = recommended.recommendation_id
+        AND feedback.service_id = recommended.service_id
+    WHERE recommendation.calling_service IS NOT NULL
+    GROUP BY recommendation.calling_service, recommended.service_id
+    HAVING count(redirected.recommendation_id) > 0 OR count(feedback.feedback_score) FILTER (
+        WHERE redirected.recommendation_id IS NULL AND feedback.feedback_score IN (1, -1)
+    ) > 0;
+$$ LANGUAGE sql;
+
+SELECT service_recommender.refresh_service_feedback_counts();
@@ -0,0 +1,16 @@
+-- Services and service channels in the recommendation output format, formatted by the PTV data loader
+-- for each output language. The service channels of a formatted service are listed in service_channel_ids.
+CREATE TABLE service_recommender.formatted_service (
+    service_id text NOT NULL,
+    language text NOT NULL,
+    service_channel_ids text[] NOT NULL,
+    document jsonb NOT NULL,
+    CONSTRAINT formatted_service_pkey PRIMARY KEY (service_id, language)
+);
+
+CREATE TABLE service_recommender.formatted_service_channel (
+    service_channel_id text NOT NULL,
+    language text NOT NULL,
+    document jsonb NOT NULL,
+    CONSTRAINT formatted_service_channel_pkey PRIMARY KEY (service_channel_id, language)
+);
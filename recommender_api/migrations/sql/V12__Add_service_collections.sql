@@ -0,0 +1,12 @@
+-- Non-archived PTV service collections, replaced by the PTV data loader. Used to validate the service_collections
+-- filter. Until the loader runs, the collections referenced by the stored services are the known ones.
+CREATE TABLE service_recommender.service_collection (
+    service_collection_id text NOT NULL,
+    CONSTRAINT service_collection_pkey PRIMARY KEY (service_collection_id)
+);
+
+INSERT INTO service_recommender.service_collection
+SELECT DISTINCT service_collection_id #>> '{}'
+FROM service_recommender.service,
+     jsonb_path_query(service_data, '$.serviceCollections[*].id') AS service_collection_id
+WHERE service_collection_id #>> '{}' IS NOT NULL;
@@ -1,8 +1,13 @@
-from typing import Any, Dict, List
+import hashlib
+from typing import Any, Dict, List, Tuple
 
 import requests
 
+from recommender_api.db import get_service_channel_ids_of_type
+from recommender_api.tools.cache import LruCache
 from recommender_api.tools.config import config
+from recommender_api.tools.http_client import HttpClient
+from recommender_api.tools.logger import log
 from recommender_api.tools.utils import get_secret
 
 profile_management_url = config['profile_management_api_url']
@@ -10,44 +15,146 @@ profile_management_url = config['profile_management_api_url']
 CHANNEL_TYPE_FOR_SESSION_TRANSFER = 'EChannel'
 
 
+def _timeout(read_timeout_key: str) -> Tuple[float, float]:
+    return float(config['profile_management_connect_timeout_seconds']), float(config[read_timeout_key])
+
+
+PROFILE_MANAGEMENT_CLIENT = HttpClient(
+    'profile_management',
+    profile_management_url,
+    pool_size=int(config['profile_management_pool_size']),
+    default_timeout=_timeout('profile_management_read_timeout_seconds'),
+    timeouts={
+        'client_info': _timeout('profile_management_client_info_read_timeout_seconds'),
+        'session_transfer_supports': _timeout('profile_management_session_transfer_read_timeout_seconds'),
+    },
+    retries=int(config['profile_management_retries']),
+    backoff_seconds=float(config['profile_management_retry_backoff_seconds']),
+    latency_log_interval=float(config['http_client_latency_log_interval_seconds'])
+)
+
+# The API key from the secrets manager, re-read after the TTL so that a rotated key is taken into use
+API_KEY_CACHE = LruCache('profile_management_api_key', 1, float(config['profile_management_api_key_cache_ttl_seconds']))
+
+# Client info by a hash of the authorization header. Revoked clients are accepted until their entry expires.
+CLIENT_INFO_CACHE = LruCache(
+    'client_info',
+    int(config['client_info_cache_size']),
+    float(config['client_info_cache_ttl_seconds'])
+)
+# Status codes of authorization headers rejected by profile management, by a hash of the header
+DENIED_CLIENT_CACHE = LruCache(
+    'denied_clients',
+    int(config['client_info_cache_size']),
+    float(config['client_info_denied_cache_ttl_seconds'])
+)
+DENIED_STATUS_CODES = [401, 403]
+
+# Whether a service channel supports session transfer, by service channel id
+SESSION_TRANSFER_CACHE = LruCache(
+    'session_transfer_supports',
+    int(config['session_transfer_cache_size']),
+    float(config['session_transfer_cache_ttl_seconds'])
+)
+SESSION_TRANSFER_BATCH_SIZE = int(config['session_transfer_batch_size'])
+
+
 def get_profile_management_api_key() -> str:
-    return (config.get('profile_management_recommender_api_key')
-            or get_secret('Profile_Management_Recommender_Api_key')['value'])
+    api_key = API_KEY_CACHE.get('api_key')
+    if api_key is None:
+        api_key = (config.get('profile_management_recommender_api_key')
+                   or get_secret('Profile_Management_Recommender_Api_key')['value'])
+        API_KEY_CACHE.put('api_key', api_key)
+    return api_key
 
 
 def add_session_transfer_indicator(recommended_services: List[Dict[str, Any]]):
-    response = requests.post(
-        f'{profile_management_url}/v1/aurora_ai_services/session_transfer_supports',
-        json={'ptv_service_channel_ids': _get_session_transfer_channel_candidates(recommended_services)},
-        headers={'authorization': f'Key {get_profile_management_api_key()}'}
+    """
+    Set the session_transfer flag of the service channels. Only channels whose support is not cached are
+    queried from profile management.
+    """
+    session_transfer_supports = get_session_transfer_supports(
+        _get_session_transfer_channel_candidates(recommended_services)
     )
+    _set_session_transfer_boolean(recommended_services, session_transfer_supports)
 
-    response.raise_for_status()
-    session_transfer_supports = response.json()
 
-    _set_session_transfer_boolean(recommended_services, session_transfer_supports)
+def get_session_transfer_supports(service_channel_ids: List[str]) -> Dict[str, bool]:
+    supports = {}
+    missing_ids = []
+    for service_channel_id in dict.fromkeys(service_channel_ids):
+        supported = SESSION_TRANSFER_CACHE.get(service_channel_id)
+        if supported is None:
+            missing_ids.append(service_channel_id)
+        else:
+            supports[service_channel_id] = supported
+
+    for start in range(0, len(missing_ids), SESSION_TRANSFER_BATCH_SIZE):
+        batch_ids = missing_ids[start:start + SESSION_TRANSFER_BATCH_SIZE]
+        # Only queries the support flags, so the request can be retried
+        response = PROFILE_MANAGEMENT_CLIENT.post(
+            'session_transfer_supports',
+            '/v1/aurora_ai_services/session_transfer_supports',
+            json={'ptv_service_channel_ids': batch_ids},
+            headers={'authorization': f'Key {get_profile_management_api_key()}'},
+            idempotent=True
+        )
+        response.raise_for_status()
+        batch_supports = response.json()
+
+        for service_channel_id in batch_ids:
+            supports[service_channel_id] = bool(batch_supports.get(service_channel_id))
+            SESSION_TRANSFER_CACHE.put(service_channel_id, supports[service_channel_id])
+
+    return supports
+
+
+def warm_up_session_transfer_supports():
+    """Cache the session transfer support of all service channels that can support it."""
+    service_channel_ids = get_service_channel_ids_of_type(CHANNEL_TYPE_FOR_SESSION_TRANSFER)
+    get_session_transfer_supports(service_channel_ids)
+    log.technical.message(f'Cached session transfer support of {len(service_channel_ids)} service channels')
 
 
 def get_client_info(authorization_header):
-    response = requests.get(
-        f'{profile_management_url}/oauth/client_info',
+    """
+    Client info of the authorization header from profile management, cached by a hash of the header.
+    Rejected headers are cached for a shorter time and raise an HTTPError like the rejecting response.
+    """
+    key = hashlib.sha256(authorization_header.encode('utf-8')).hexdigest()
+    client_info = CLIENT_INFO_CACHE.get(key)
+    if client_info is not None:
+        return client_info
+
+    denied_status = DENIED_CLIENT_CACHE.get(key)
+    if denied_status is not None:
+        raise requests.exceptions.HTTPError(f'{denied_status} Client Error: client info request denied recently')
+
+    response = PROFILE_MANAGEMENT_CLIENT.get(
+        'client_info',
+        '/oauth/client_info',
         headers={'Authorization': authorization_header}
     )
+    if response.status_code in DENIED_STATUS_CODES:
+        DENIED_CLIENT_CACHE.put(key, response.status_code)
     response.raise_for_status()
-    return response.json()
+
+    client_info = response.json()
+    CLIENT_INFO_CACHE.put(key, client_info)
+    return client_info
 
 
 def post_session_attributes(attributes, service_channel_id):
     response = None
     try:
-        url = f'{profile_management_url}/v1/session_attributes'
         headers = {'authorization': f'Key {get_profile_management_api_key()}'}
         body = {
             "sessionAttributes": attributes,
             "ptvServiceChannelId": service_channel_id
         }
 
-        response = requests.post(url, json=body, headers=headers)
+        response = PROFILE_MANAGEMENT_CLIENT.post('session_attributes', '/v1/session_attributes', json=body,
+                                                  headers=headers)
         response.raise_for_status()
 
         return response.json()
@@ -67,6 +174,15 @@ def post_session_attributes(attributes, service_channel_id):
         raise ProfileManagementApiError(status, message) from error
 
 
+def get_session_attributes(access_token: str) -> requests.Response:
+    return PROFILE_MANAGEMENT_CLIENT.get(
+        'get_session_attributes',
+        '/v1/session_attributes',
+        params={'access_token': access_token},
+        headers={'authorization': f'Key {get_profile_management_api_key()}'}
+    )
+
+
 def _get_session_transfer_channel_candidates(recommended_services: List[Dict[str, Any]]):
     return [
         service_channel['service_channel_id']
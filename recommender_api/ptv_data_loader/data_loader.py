@@ -2,7 +2,7 @@ import os
 import sys
 import io
 import json
-from typing import Dict, Any, Set, List, Optional
+from typing import Dict, Any, Set, List, Optional, Tuple
 import lzma
 import math
 import pandas as pd
@@ -11,6 +11,7 @@ import more_itertools
 import boto3
 
 from recommender_api.ptv_data_loader.constants import PTVPublishState
+from recommender_api import ptv_format
 from recommender_api.tools.config import config
 from recommender_api.tools.logger import log, LogOperationName
 
@@ -18,7 +19,10 @@ from recommender_api.ptv_data_loader.db import (
     load_services_to_db,
     load_service_vectors_to_db,
     load_service_channels_to_db,
+    load_formatted_services_to_db,
+    load_service_collections_to_db,
     add_ptv_fetch_timestamp_to_db,
+    refresh_service_feedback_counts,
     get_latest_ptv_fetch_timestamp,
     get_service_data_from_db,
     get_service_channel_data_from_db,
@@ -29,6 +33,7 @@ PTV_SERVICE_URL = config['ptv_url_prefix'] + config['ptv_service_url_suffix']
 PTV_SERVICE_LIST_URL = config['ptv_url_prefix'] + config['ptv_service_list_url_suffix']
 PTV_SERVICE_CHANNEL_URL = config['ptv_url_prefix'] + config['ptv_service_channel_url_suffix']
 PTV_SERVICE_CHANNEL_LIST_URL = config['ptv_url_prefix'] + config['ptv_service_channel_list_url_suffix']
+PTV_SERVICE_COLLECTION_URL = config['ptv_url_prefix'] + config['ptv_service_collection_url_suffix']
 
 SERVICES_BUCKET = config['services_bucket']
 SERVICES_KEY = config['services_key']
@@ -122,6 +127,29 @@ def fetch_service_ids(start_date: str, status: PTVPublishState = PTVPublishState
     return ids
 
 
+def fetch_service_collection_ids() -> Set[str]:
+    """Ids of the non-archived service collections in PTV"""
+    ids: Set[str] = set()
+    with log.open():
+        response = requests.get(PTV_SERVICE_COLLECTION_URL, params={'archived': 'false'}, timeout=120)
+        response.raise_for_status()
+        n_pages = response.json()['pageCount']
+        for page_number in range(1, n_pages + 1):
+            response = requests.get(
+                PTV_SERVICE_COLLECTION_URL,
+                params={'page': page_number, 'archived': 'false'},  # type: ignore
+                timeout=120
+            )
+            response.raise_for_status()
+            item_list = response.json()['itemList']
+            # Items without a name were not found in PTV
+            if item_list is not None:
+                ids |= {item['id'] for item in item_list if item['name'] is not None}
+        log.technical.message(f'Got {len(ids)} service collection ids from PTV')
+
+    return ids
+
+
 def fetch_item_list_by_id_from_ptv(url: str, ids: Set[str]):
     max_supported_request_id_count = 99
     results = []
@@ -308,6 +336,29 @@ def flag_archived_service_data(start_date: str):
         flag_archived_services_in_db(services, service_channels)
 
 
+def format_ptv_data(
+        services: Dict[str, Dict[str, Any]],
+        service_channels: Dict[str, Dict[str, Any]]
+) -> Tuple[List[tuple], List[tuple]]:
+    """Services and service channels formatted in each output language, as rows of the formatted tables"""
+    languages = config['formatted_service_languages'].split()
+    formatted_services = [
+        (
+            service_id, language, ptv_format.service_channel_ids(service),
+            ptv_format.format_service_document(service, language)
+        )
+        for service_id, service in services.items()
+        for language in languages
+    ]
+    formatted_service_channels = [
+        (service_channel_id, language, document)
+        for service_channel_id, service_channel in service_channels.items()
+        for language in languages
+        if (document := ptv_format.format_service_channel_document(service_channel, language)) is not None
+    ]
+    return formatted_services, formatted_service_channels
+
+
 def get_last_fetch_timestamp(mode: str):
     if mode == 'full-run':
         return None
@@ -324,7 +375,8 @@ def read_ptv_data(last_ptv_fetch: str):
     return services, service_channels
 
 
-def store_ptv_data(services: List[Dict], service_channels: List[Dict], last_ptv_fetch: Optional[str], store_to_s3=True):
+def store_ptv_data(services: List[Dict], service_channels: List[Dict], last_ptv_fetch: Optional[str], store_to_s3=True,
+                   service_collection_ids: Optional[Set[str]] = None):
     with log.open():
         load_services_to_db(services)
         load_service_channels_to_db(service_channels)
@@ -334,6 +386,7 @@ def store_ptv_data(services: List[Dict], service_channels: List[Dict], last_ptv_
     with log.open():
         published_services = get_service_data_from_db()
         published_service_channels = get_service_channel_data_from_db()
+        load_formatted_services_to_db(*format_ptv_data(published_services, published_service_channels))
 
     service_vectors = clean_service_vector_csv(
         load_service_vector_csv(SERVICES_BUCKET, SERVICE_VECTOR_KEY),
@@ -346,6 +399,14 @@ def store_ptv_data(services: List[Dict], service_channels: List[Dict], last_ptv_
     if store_to_s3:
         export_data_to_s3(published_services, published_service_channels)
 
+    if service_collection_ids is not None:
+        with log.open():
+            load_service_collections_to_db(service_collection_ids)
+
+    # The API reloads the counts when it sees the new fetch timestamp
+    with log.open():
+        refresh_service_feedback_counts()
+
     with log.open():
         add_ptv_fetch_timestamp_to_db()
 
@@ -363,7 +424,22 @@ def main():
         last_ptv_fetch = get_last_fetch_timestamp(mode)
 
         services, service_channels = read_ptv_data(last_ptv_fetch)
-        store_ptv_data(services, service_channels, last_ptv_fetch, store_to_s3=True)
+
+        # The stored service collections are kept if PTV fails to list them
+        service_collection_ids: Optional[Set[str]] = None
+        try:
+            service_collection_ids = fetch_service_collection_ids()
+        except Exception as error:  # pylint: disable=W0703
+            with log.open():
+                log.technical.error(f'Fetching service collections failed: {str(error)}')
+
+        store_ptv_data(
+            services,
+            service_channels,
+            last_ptv_fetch,
+            store_to_s3=True,
+            service_collection_ids=service_collection_ids
+        )
 
     except Exception as error:
         with log.open():
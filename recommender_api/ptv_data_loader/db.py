@@ -1,6 +1,6 @@
 import json
 
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, List, Optional, Set, Union
 
 from psycopg2.extras import execute_values, Json, DictCursor
 import pandas as pd
@@ -242,6 +242,79 @@ def load_service_channels_to_db(service_channels: List[Dict[str, Any]]):
             log.technical.message('Service channels inserted into db.')
 
 
+def load_formatted_services_to_db(formatted_services: List[tuple], formatted_service_channels: List[tuple]):
+    """
+    Replace the formatted services and service channels. Uses DELETE rather than TRUNCATE so that the API
+    keeps reading the previous documents until the new ones are committed.
+    """
+    db_endpoint_address = (
+        DB_HOST_ROUTING if DB_HOST_ROUTING != '' else db_endpoint(DB_NAME, REGION)
+    )
+    with db_connection(
+        db_endpoint_address=db_endpoint_address,
+        db_auth_endpoint=db_endpoint_address,
+        db_name=DB_NAME,
+        port=DB_PORT,
+        user=DB_USER,
+        region=REGION,
+    ) as conn:
+        log.technical.database(db_endpoint_address, DB_PORT, DB_NAME)
+
+        with conn.cursor(cursor_factory=LoggingDictCursor) as cur:
+            cur.execute('DELETE FROM service_recommender.formatted_service')
+            cur.execute('DELETE FROM service_recommender.formatted_service_channel')
+            execute_values(
+                cur,
+                """
+                INSERT INTO service_recommender.formatted_service
+                    (service_id, language, service_channel_ids, document)
+                VALUES %s
+                """,
+                [(service_id, language, channel_ids, Json(document))
+                 for service_id, language, channel_ids, document in formatted_services]
+            )
+            execute_values(
+                cur,
+                """
+                INSERT INTO service_recommender.formatted_service_channel
+                    (service_channel_id, language, document)
+                VALUES %s
+                """,
+                [(service_channel_id, language, Json(document))
+                 for service_channel_id, language, document in formatted_service_channels]
+            )
+
+        conn.commit()
+        log.technical.message('Formatted services inserted into db.')
+
+
+def load_service_collections_to_db(service_collection_ids: Set[str]):
+    """Replace the service collections with the given non-archived collections."""
+    db_endpoint_address = (
+        DB_HOST_ROUTING if DB_HOST_ROUTING != '' else db_endpoint(DB_NAME, REGION)
+    )
+    with db_connection(
+        db_endpoint_address=db_endpoint_address,
+        db_auth_endpoint=db_endpoint_address,
+        db_name=DB_NAME,
+        port=DB_PORT,
+        user=DB_USER,
+        region=REGION,
+    ) as conn:
+        log.technical.database(db_endpoint_address, DB_PORT, DB_NAME)
+
+        with conn.cursor(cursor_factory=LoggingDictCursor) as cur:
+            cur.execute('DELETE FROM service_recommender.service_collection')
+            execute_values(
+                cur,
+                'INSERT INTO service_recommender.service_collection (service_collection_id) VALUES %s',
+                [(service_collection_id,) for service_collection_id in service_collection_ids]
+            )
+
+        conn.commit()
+        log.technical.message(f'{len(service_collection_ids)} service collections inserted into db.')
+
+
 def add_ptv_fetch_timestamp_to_db():
     db_endpoint_address = (
         DB_HOST_ROUTING if DB_HOST_ROUTING != '' else db_endpoint(DB_NAME, REGION)
@@ -264,6 +337,28 @@ def add_ptv_fetch_timestamp_to_db():
         log.technical.message(f'Updated fetch timestamp in db.')
 
 
+def refresh_service_feedback_counts():
+    db_endpoint_address = (
+        DB_HOST_ROUTING if DB_HOST_ROUTING != '' else db_endpoint(DB_NAME, REGION)
+    )
+    with db_connection(
+        db_endpoint_address=db_endpoint_address,
+        db_auth_endpoint=db_endpoint_address,
+        db_name=DB_NAME,
+        port=DB_PORT,
+        user=DB_USER,
+        region=REGION,
+    ) as conn:
+
+        log.technical.database(db_endpoint_address, DB_PORT, DB_NAME)
+
+        with conn.cursor(cursor_factory=LoggingDictCursor) as cur:
+            cur.execute('SELECT service_recommender.refresh_service_feedback_counts()')
+
+        conn.commit()
+        log.technical.message('Refreshed service feedback counts in db.')
+
+
 def get_latest_ptv_fetch_timestamp():
     db_endpoint_address = (
         DB_HOST_ROUTING if DB_HOST_ROUTING != '' else db_endpoint(DB_NAME, REGION)
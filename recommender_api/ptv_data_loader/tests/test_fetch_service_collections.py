@@ -0,0 +1,38 @@
+from unittest import mock
+
+import pytest
+
+from recommender_api.ptv_data_loader import data_loader
+from recommender_api.ptv_data_loader.data_loader import fetch_service_collection_ids
+
+
+def _response(body):
+    response = mock.Mock()
+    response.json.return_value = body
+    return response
+
+
+def test_fetch_service_collection_ids_reads_all_pages():
+    pages = [
+        _response({'pageCount': 2}),
+        _response({'itemList': [{'id': 'a', 'name': 'A'}, {'id': 'missing', 'name': None}]}),
+        _response({'itemList': [{'id': 'b', 'name': 'B'}]}),
+    ]
+
+    with mock.patch('recommender_api.ptv_data_loader.data_loader.requests.get', side_effect=pages) as get:
+        assert fetch_service_collection_ids() == {'a', 'b'}
+
+    assert get.call_args.kwargs['params'] == {'page': 2, 'archived': 'false'}
+    assert all(call.kwargs['timeout'] for call in get.call_args_list)
+
+
+def test_main_keeps_stored_service_collections_if_fetching_them_fails():
+    with mock.patch.object(data_loader, 'get_last_fetch_timestamp', return_value=None), \
+            mock.patch.object(data_loader, 'read_ptv_data', return_value=([], {})), \
+            mock.patch.object(data_loader, 'fetch_service_collection_ids', side_effect=ConnectionError('timeout')), \
+            mock.patch.object(data_loader, 'store_ptv_data') as store_ptv_data, \
+            pytest.raises(SystemExit) as exit_info:
+        data_loader.main()
+
+    assert exit_info.value.code == 0
+    assert store_ptv_data.call_args.kwargs['service_collection_ids'] is None
@@ -0,0 +1,29 @@
+import json
+import os
+
+from recommender_api.ptv_data_loader.data_loader import format_ptv_data
+
+TEST_DATA_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..', 'tests', 'test_data')
+
+
+def _load(file_name):
+    with open(os.path.join(TEST_DATA_DIR, file_name), 'r', encoding='utf-8') as in_file:
+        return json.load(in_file)
+
+
+def test_format_ptv_data_formats_each_language():
+    service = _load('etalukio_service.json')
+    channel = _load('otava_service_channel.json')
+    excluded_channel = {**channel, 'id': 'fax', 'serviceChannelType': 'Fax'}
+
+    formatted_services, formatted_channels = format_ptv_data(
+        {service['id']: service},
+        {channel['id']: channel, 'fax': excluded_channel}
+    )
+
+    assert [(row[0], row[1]) for row in formatted_services] == [(service['id'], 'fi'), (service['id'], 'sv'),
+                                                                (service['id'], 'en')]
+    assert channel['id'] in formatted_services[0][2]
+    assert formatted_services[0][3]['service_name'] == 'Nettilukio aikuisille'
+    assert [(row[0], row[1]) for row in formatted_channels] == [(channel['id'], 'fi'), (channel['id'], 'sv'),
+                                                                (channel['id'], 'en')]
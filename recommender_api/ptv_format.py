@@ -0,0 +1,297 @@
+"""
+Formatting of PTV service and service channel documents into the recommendation output format.
+Used by the API and by the PTV data loader, which stores the formatted documents in advance.
+"""
+from typing import Any, Dict, List, Optional, Union
+
+LIST_JOINER = ', '
+INCLUDED_SERVICE_CHANNEL_TYPES = [
+    'EChannel',
+    'WebPage',
+    'Phone',
+    'ServiceLocation',
+    'PrintableForm',
+]
+# Top-level fields of the PTV documents read by format_service_outputs
+FORMATTED_SERVICE_FIELDS = [
+    'id',
+    'serviceNames',
+    'serviceDescriptions',
+    'fundingType',
+    'serviceChannels',
+    'areaType',
+    'areas',
+    'organizations',
+    'targetGroups',
+    'serviceCollections',
+    'serviceClasses',
+    'requirements',
+    'serviceChargeType',
+]
+FORMATTED_SERVICE_CHANNEL_FIELDS = [
+    'id',
+    'serviceChannelType',
+    'serviceChannelNames',
+    'serviceChannelDescriptions',
+    'webPages',
+    'emails',
+    'addresses',
+    'serviceHours',
+    'phoneNumbers',
+]
+
+
+def _first_item(
+        list_values: List[Dict[str, Any]], language: str = 'fi', field_name: str = 'value'
+) -> str:
+    values_with_language = [
+        item[field_name] for item in list_values if item['language'] == language
+    ]
+    return values_with_language[0] if len(values_with_language) > 0 else ''
+
+
+def get_str(dictionary: Dict[str, Any], key: str) -> str:
+    value = dictionary.get(key, '')
+    return '' if value is None else value
+
+
+def _extract_translated_ptv_value(
+        service_data: Dict[str, Any],
+        field_name: str,
+        language: str,
+        type_attribute: Optional[str] = None
+):
+    list_values = [
+        item.get('value', '')
+        for item in service_data.get(field_name, [])
+        if item.get('language') == language and (type_attribute is None or item.get('type') == type_attribute)
+    ]
+
+    # Remove possible Nones
+    list_values = [x for x in list_values if x is not None]
+    return LIST_JOINER.join(list_values)
+
+
+def format_service_outputs(
+        service_data: List[Dict[str, Any]],
+        service_channels_data: List[Dict[str, Any]],
+        language: str
+) -> List[Dict[str, Any]]:
+    formatted_service_channels = {
+        channel['id']: _format_service_channel_output(channel, language)
+        for channel in service_channels_data
+        if channel.get('serviceChannelType') in INCLUDED_SERVICE_CHANNEL_TYPES
+    }
+
+    return [
+        with_service_channels(format_service_document(service, language), service_channel_ids(service),
+                              formatted_service_channels)
+        for service in service_data
+    ]
+
+
+def service_channel_ids(service: Dict[str, Any]) -> List[str]:
+    """Ids of the service channels of the service, in the order of the PTV document."""
+    return [
+        get_str(ch.get('serviceChannel', {}), 'id')
+        for ch in service.get('serviceChannels', [])
+    ]
+
+
+def with_service_channels(
+        service_document: Dict[str, Any],
+        channel_ids: List[str],
+        formatted_service_channels: Dict[str, Dict[str, Any]]
+) -> Dict[str, Any]:
+    """
+    The formatted service with its formatted channels. Channels that are not included in the output,
+    e.g. archived ones or ones of excluded types, are missing from formatted_service_channels and are left out.
+    """
+    channels = [
+        formatted_service_channels[ch_id]
+        for ch_id in channel_ids
+        if ch_id in formatted_service_channels
+    ]
+    return {**service_document, 'service_channels': channels}
+
+
+def format_service_document(service: Dict[str, Any], language: str) -> Dict[str, Any]:
+    """The formatted service without its service channels."""
+    return {
+        'service_id': service['id'],
+        'service_name': _extract_translated_ptv_value(service, 'serviceNames', language, 'Name'),
+        'service_description': _extract_translated_ptv_value(
+            service,
+            'serviceDescriptions',
+            language,
+            'Description',
+        ),
+        'service_description_summary': _extract_translated_ptv_value(
+            service,
+            'serviceDescriptions',
+            language,
+            'Summary'
+        ),
+        'funding_type': service.get('fundingType'),
+        'user_instruction': _extract_translated_ptv_value(
+            service,
+            'serviceDescriptions',
+            language,
+            'UserInstruction'
+        ),
+        'area_type': service.get('areaType'),
+        'areas': service.get('areas'),
+        'responsible_organization': _format_responsible_organization(service),
+        'target_groups': _format_target_groups(service.get('targetGroups', [])),
+        'service_collections': _format_service_collections(service.get('serviceCollections', [])),
+        'service_class_uris': _format_service_class_uris(service),
+        'requirements': [
+            i['value']
+            for i in service.get('requirements', [])
+            if i['language'] == 'fi'
+        ],
+        'charge_type': get_str(service, 'serviceChargeType'),
+        'charge_additional_info': _extract_translated_ptv_value(
+            service,
+            'serviceDescriptions',
+            language,
+            'ChargeTypeAdditionalInfo'
+        ),
+    }
+
+
+def format_service_channel_document(service_channel: Dict[str, Any], language: str) -> Optional[Dict[str, Any]]:
+    """The formatted service channel, None for channels of types not included in the output."""
+    if service_channel.get('serviceChannelType') not in INCLUDED_SERVICE_CHANNEL_TYPES:
+        return None
+    return _format_service_channel_output(service_channel, language)
+
+
+def _format_responsible_organization(service: Dict[str, Any]) -> Optional[Dict[str, str]]:
+    organizations = service.get('organizations', [])
+    return next(
+        (
+            organization.get('organization')
+            for organization in organizations
+            if organization.get("roleType") == "Responsible"
+        ),
+        None,
+    )
+
+
+def _format_service_class_uris(service: Dict[str, Any]) -> List[str]:
+    return [
+        service_class['newUri']
+        for service_class in service.get('serviceClasses', [])
+        if 'newUri' in service_class
+    ]
+
+
+def _format_target_groups(target_groups: Dict[str, Any]) -> List[str]:
+    return list(map(lambda target_group: target_group['code'], target_groups))  # type: ignore
+
+
+def _format_service_collections(target_groups: Dict[str, Any]) -> List[str]:
+    return list(map(lambda target_group: target_group['id'], target_groups))  # type: ignore
+
+
+def _format_address(address: Dict[str, Any]) -> Optional[str]:
+    street = address.get('streetAddress', {})
+    if not street or address.get('type', '') != 'Location':
+        return None
+    street_name = _first_item(street.get('street', []))
+    municipality = _first_item(street.get('municipality', {}).get('name', []))
+    return f"{street_name} {get_str(street, 'streetNumber')}, {get_str(street, 'postalCode')}, {municipality}"
+
+
+def _format_location(address: Dict[str, Any]) -> Union[Dict[str, str], None]:
+    street = address.get('streetAddress', {})
+    if not street or address.get('type', '') != 'Location':
+        return None
+
+    return {
+        'latitude': get_str(street, 'latitude'),
+        'longitude': get_str(street, 'longitude'),
+    }
+
+
+def _format_phone_number(phone_number: Dict[str, Any]) -> str:
+    number = (
+        f"{get_str(phone_number, 'additionalInformation')} {get_str(phone_number, 'prefixNumber')} "
+        f"{get_str(phone_number, 'number')}"
+    )
+    return number.strip()
+
+
+def _format_service_hour(service_hour: Dict[str, Any]) -> str:
+    if service_hour.get('isAlwaysOpen'):
+        return 'Aina avoinna'
+
+    def format_hour(hour: Dict[str, Any]) -> str:
+        from_str = f'{hour.get("dayFrom")} {hour.get("from")}'
+        to_str = f'{hour.get("dayTo")} {hour.get("to")}'
+        return f'{from_str.strip()} - {to_str.strip()}'
+
+    opening_hours = ', '.join(
+        [format_hour(hour) for hour in service_hour.get("openingHour", [])]
+    )
+    return opening_hours
+
+
+def _format_service_channel_output(service_channel: Dict[str, Any], language: str) -> Dict[str, Any]:
+    web_pages = [
+        get_str(page, 'url')
+        for page in service_channel['webPages']
+        if page['language'] == 'fi'
+    ]
+    emails = [
+        e['value'] for e in service_channel.get('emails', []) if e['language'] == 'fi'
+    ]
+    addresses = [
+        _format_address(a)
+        for a in service_channel.get('addresses', [])
+        if _format_address(a)
+    ]
+    # Assumes only one location address per service channel
+    address = addresses[0] if len(addresses) > 0 else ''
+    service_hours = [
+        _format_service_hour(service_hour)
+        for service_hour in service_channel.get('serviceHours', [])
+        if service_hour.get('serviceHourType') == 'DaysOfTheWeek'
+    ]
+    # Filter out Fax
+    phone_numbers = [
+        _format_phone_number(number)
+        for number in service_channel.get('phoneNumbers', [])
+        if number.get('type') == 'Phone'
+    ]
+    locations = [
+        _format_location(a)
+        for a in service_channel.get('addresses', [])
+        if _format_location(a)
+    ]
+    location = locations[0] if len(locations) > 0 else ''
+
+    return {
+        'service_channel_id': get_str(service_channel, 'id'),
+        'service_channel_name': _extract_translated_ptv_value(service_channel, 'serviceChannelNames', language, 'Name'),
+        'service_channel_type': get_str(service_channel, 'serviceChannelType'),
+        'service_channel_description_summary': _extract_translated_ptv_value(
+            service_channel,
+            'serviceChannelDescriptions',
+            language,
+            'Summary'
+        ),
+        'service_channel_description': _extract_translated_ptv_value(
+            service_channel,
+            'serviceChannelDescriptions',
+            language,
+            'Description'
+        ),
+        'phone_numbers': phone_numbers,
+        'web_pages': web_pages,
+        'emails': emails,
+        'address': address,
+        'location': location,
+        'service_hours': service_hours,
+    }
@@ -0,0 +1,105 @@
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple, Union
+
+from psycopg2 import Error
+
+from recommender_api import db
+from recommender_api.batch_writer import BatchWriter
+from recommender_api.recommendation_writer import recommended_services, wait_until_recommendation_stored
+from recommender_api.tools.config import config
+from recommender_api.tools.logger import log
+
+REDIRECT = 'redirect'
+FEEDBACK = 'feedback'
+SERVICE_FEEDBACK = 'service_feedback'
+
+
+def _write_events(events: List[Tuple[str, tuple]]):
+    """
+    Store the events in one transaction. If that fails, the events are stored one by one and the ones that
+    still fail are logged and dropped.
+    """
+    for recommendation_id in {row[0] for _, row in events}:
+        wait_until_recommendation_stored(recommendation_id)
+
+    try:
+        _store(events)
+    except Error as batch_error:
+        log.technical.error(f'Storing {len(events)} recommendation events failed, storing one by one: {batch_error}')
+        for kind, row in events:
+            try:
+                _store([(kind, row)])
+            except Error as error:
+                log.technical.error(f'Dropped {kind} event of recommendation {row[0]}: {error}')
+
+
+def _store(events: List[Tuple[str, tuple]]):
+    db.store_recommendation_events(
+        [row for kind, row in events if kind == REDIRECT],
+        [row for kind, row in events if kind == FEEDBACK],
+        [row for kind, row in events if kind == SERVICE_FEEDBACK]
+    )
+
+
+# Redirects and feedback, validated when queued
+EVENT_WRITER = BatchWriter(
+    'recommendation event',
+    _write_events,
+    queue_size=int(config['event_write_queue_size']),
+    batch_size=int(config['event_write_batch_size']),
+    flush_interval=float(config['event_write_interval_seconds'])
+)
+
+
+def _buffered() -> bool:
+    return config['event_write_mode'] == 'async'
+
+
+def store_redirect(recommendation_id: int, service_id: str, service_channel_id: str,
+                   auroraai_access_token: Optional[str]):
+    """Store a redirect to a recommended service. Raises InvalidRedirectException if it was not recommended."""
+    if not _buffered():
+        wait_until_recommendation_stored(recommendation_id)
+        db.store_redirect(recommendation_id, service_id, service_channel_id, auroraai_access_token)
+        return
+
+    services = recommended_services(recommendation_id)
+    if services is None or service_id not in services:
+        log.technical.error(f'Invalid redirect to service {service_id} of recommendation {recommendation_id}')
+        raise db.InvalidRedirectException()
+
+    EVENT_WRITER.put((
+        REDIRECT,
+        (recommendation_id, service_id, service_channel_id, auroraai_access_token, datetime.now(timezone.utc))
+    ))
+
+
+def store_feedback(recommendation_id: int, feedback_score: Optional[int] = None,
+                   service_feedbacks: Optional[List[Dict[str, Union[str, int]]]] = None):
+    """
+    Store feedback to a recommendation and its services. Raises InvalidRecommendationIdException or
+    InvalidServiceIdException, and stores nothing, if the recommendation or a service was not recommended.
+    """
+    if not _buffered():
+        wait_until_recommendation_stored(recommendation_id)
+        db.store_feedback(recommendation_id, feedback_score, service_feedbacks)
+        return
+
+    services = recommended_services(recommendation_id)
+    if feedback_score and services is None:
+        raise db.InvalidRecommendationIdException(f'Invalid recommendation_id: {recommendation_id}')
+    for service_feedback in service_feedbacks or []:
+        if services is None or service_feedback['service_id'] not in services:
+            raise db.InvalidServiceIdException(f'Invalid service id: {service_feedback["service_id"]}')
+
+    if feedback_score:
+        EVENT_WRITER.put((FEEDBACK, (recommendation_id, feedback_score)))
+    for service_feedback in service_feedbacks or []:
+        EVENT_WRITER.put((
+            SERVICE_FEEDBACK,
+            (recommendation_id, service_feedback['service_id'], service_feedback['feedback_score'])
+        ))
+
+
+def flush_events():
+    EVENT_WRITER.flush()
@@ -0,0 +1,150 @@
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Deque, FrozenSet, List, Optional, Set, Tuple
+
+import flask
+from psycopg2 import Error
+
+from recommender_api import db
+from recommender_api.batch_writer import BatchWriter
+from recommender_api.tools.cache import LruCache
+from recommender_api.tools.config import config
+from recommender_api.tools.logger import log
+
+# Recommended services by recommendation id, for validating redirects and feedback without a query.
+# Recommendations do not change once stored, so the entries do not expire.
+RECENT_RECOMMENDATIONS = LruCache('recent_recommendations', int(config['recent_recommendation_cache_size']))
+
+
+class RecommendationWriter:
+    """
+    Write-behind storage of recommendations. Recommendations get ids reserved in blocks from the recommendation
+    id sequence and are stored in batches by a BatchWriter.
+
+    Queued recommendations are stored within flush_interval seconds. Writes that refer to a recommendation,
+    i.e. redirects and feedback, call wait_until_stored first.
+
+    A batch that fails is retried after each of retry_delays seconds and then stored one by one. The ids of
+    recommendations that still fail are removed from RECENT_RECOMMENDATIONS, so events referring to them are
+    rejected like those of unknown recommendations.
+    """
+
+    def __init__(self, id_block_size: int, queue_size: int, batch_size: int, flush_interval: float,
+                 retry_delays: Tuple[float, ...] = (0.1, 0.5, 2.0)):
+        self.id_block_size = id_block_size
+        self.flush_interval = flush_interval
+        self.retry_delays = retry_delays
+        self._ids: Deque[int] = deque()
+        self._ids_lock = threading.Lock()
+        self._pending: Set[int] = set()
+        self._stored = threading.Condition()
+        self._batches = BatchWriter('recommendation', self._write, queue_size, batch_size, flush_interval)
+
+    def store(self, services: List[str], request: flask.Request) -> int:
+        """Queue the recommendation of the request, add it to RECENT_RECOMMENDATIONS and return its id."""
+        recommendation_id = self._next_id()
+        with self._stored:
+            self._pending.add(recommendation_id)
+        RECENT_RECOMMENDATIONS.put(recommendation_id, frozenset(services))
+        self._batches.put(
+            (recommendation_id, datetime.now(timezone.utc), db.recommendation_record(request), services)
+        )
+        return recommendation_id
+
+    def wait_until_stored(self, recommendation_id: int, timeout: float) -> bool:
+        """Store the queued recommendations if the recommendation is one of them. False on timeout."""
+        if recommendation_id not in self._pending:
+            return True
+
+        self._batches.flush()
+        with self._stored:
+            return self._stored.wait_for(lambda: recommendation_id not in self._pending, timeout)
+
+    def flush(self):
+        self._batches.flush()
+
+    def _next_id(self) -> int:
+        with self._ids_lock:
+            if not self._ids:
+                self._ids.extend(db.allocate_recommendation_ids(self.id_block_size))
+            return self._ids.popleft()
+
+    def _write(self, recommendations: List[tuple]):
+        try:
+            if not self._store_batch(recommendations):
+                self._store_one_by_one(recommendations)
+        finally:
+            with self._stored:
+                self._pending.difference_update(recommendation[0] for recommendation in recommendations)
+                self._stored.notify_all()
+
+    def _store_batch(self, recommendations: List[tuple]) -> bool:
+        """Store the recommendations in one transaction, retrying with backoff. False if every attempt failed."""
+        for delay in (*self.retry_delays, None):
+            try:
+                db.store_recommendation_batch(recommendations)
+                return True
+            except Error as error:
+                log.technical.error(f'Storing {len(recommendations)} recommendations failed: {error}')
+                if delay is not None:
+                    time.sleep(delay)
+        return False
+
+    @staticmethod
+    def _store_one_by_one(recommendations: List[tuple]):
+        for recommendation in recommendations:
+            try:
+                db.store_recommendation_batch([recommendation])
+            except Error as error:
+                RECENT_RECOMMENDATIONS.remove(recommendation[0])
+                log.technical.error(f'Dropped recommendation {recommendation[0]}: {error}')
+
+
+RECOMMENDATION_WRITER = RecommendationWriter(
+    id_block_size=int(config['recommendation_id_block_size']),
+    queue_size=int(config['recommendation_write_queue_size']),
+    batch_size=int(config['recommendation_write_batch_size']),
+    flush_interval=float(config['recommendation_write_interval_seconds'])
+)
+PENDING_RECOMMENDATION_TIMEOUT_SECONDS = 5.0
+
+
+def store_recommendation(services: List[str], request: flask.Request) -> int:
+    """Store the recommended services of the request and return the recommendation id."""
+    if config['recommendation_write_mode'] == 'async':
+        return RECOMMENDATION_WRITER.store(services, request)
+
+    recommendation_id = db.store_recommendations_db(services, request)
+    RECENT_RECOMMENDATIONS.put(recommendation_id, frozenset(services))
+    return recommendation_id
+
+
+def recommended_services(recommendation_id: int) -> Optional[FrozenSet[str]]:
+    """
+    The services of the recommendation, None if there is no such recommendation.
+
+    In async recommendation write mode, a recommendation made by another worker is not found until that worker
+    has stored it, i.e. for about recommendation_write_interval_seconds, or longer while it retries a failed
+    batch. Its redirects and feedback are rejected in that window.
+    """
+    services = RECENT_RECOMMENDATIONS.get(recommendation_id)
+    if services is not None:
+        return services
+
+    services = db.get_recommended_services(recommendation_id)
+    if services is not None:
+        services = frozenset(services)
+        RECENT_RECOMMENDATIONS.put(recommendation_id, services)
+    return services
+
+
+def wait_until_recommendation_stored(recommendation_id: int):
+    """Make sure that a recommendation queued by this worker is stored before writing rows that refer to it."""
+    if not RECOMMENDATION_WRITER.wait_until_stored(recommendation_id, PENDING_RECOMMENDATION_TIMEOUT_SECONDS):
+        log.technical.error(f'Recommendation {recommendation_id} was not stored in time')
+
+
+def flush_recommendations():
+    RECOMMENDATION_WRITER.flush()
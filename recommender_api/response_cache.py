@@ -0,0 +1,67 @@
+import copy
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from recommender_api.data_version import current_data_version
+from recommender_api.recommender_input import RecommenderParameters
+from recommender_api.tools.cache import LruCache
+from recommender_api.tools.config import config
+
+# Recommendations before per-request redirect links and session transfer indicators are added.
+# The TTL bounds how long reranked responses miss new redirects and feedback.
+RESPONSE_CACHE = LruCache(
+    'responses',
+    int(config['response_cache_size']),
+    float(config['response_cache_ttl_seconds'])
+)
+
+
+def _sorted(values: List[Any]) -> Tuple:
+    return tuple(sorted(set(values)))
+
+
+def response_cache_key(
+        params: RecommenderParameters,
+        calling_service: str,
+        request_path: str
+) -> Optional[Hashable]:
+    """
+    Key of the recommendations for the given parameters, None if the cache is disabled. Filters are order
+    independent, and municipality codes are the ones after expanding regions, hospital districts and wellbeing
+    service counties. The PTV data version is part of the key, so entries computed from older PTV data are not
+    used after the data loader runs.
+    """
+    if RESPONSE_CACHE.max_size <= 0:
+        return None
+
+    life_situation_meters: Optional[Dict[str, List[int]]] = getattr(params, 'life_situation_meters', None)
+    return (
+        request_path,
+        calling_service,
+        current_data_version(),
+        params.limit,
+        params.rerank,
+        _sorted(params.municipality_codes),
+        params.include_national_services,
+        params.only_national_services,
+        _sorted(params.service_classes),
+        _sorted(params.target_groups),
+        _sorted(params.service_collections),
+        _sorted(params.funding_type),
+        getattr(params, 'search_text', None),
+        tuple(sorted((meter, tuple(values)) for meter, values in life_situation_meters.items()))
+        if life_situation_meters else None
+    )
+
+
+def get_cached_response(key: Optional[Hashable]) -> Optional[List[Dict[str, Any]]]:
+    """A copy of the cached recommendations, as callers modify them in place."""
+    if key is None:
+        return None
+
+    recommendations = RESPONSE_CACHE.get(key)
+    return copy.deepcopy(recommendations) if recommendations is not None else None
+
+
+def cache_response(key: Optional[Hashable], recommendations: List[Dict[str, Any]]):
+    if key is not None:
+        RESPONSE_CACHE.put(key, copy.deepcopy(recommendations))
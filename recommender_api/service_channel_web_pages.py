@@ -0,0 +1,29 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+from recommender_api.data_version import DataVersioned
+from recommender_api.db import get_service_channel_web_pages
+
+
+class ServiceChannelWebPages:
+    """
+    In-memory copy of the URLs of the Finnish web pages of the service channels, i.e. the targets of the
+    redirect links, so that redirects need no query.
+    """
+
+    def __init__(self, rows: List[Dict[str, Any]]):
+        self._web_pages: Dict[str, Tuple[str, ...]] = {
+            row['service_channel_id']: tuple(row['web_pages']) for row in rows
+        }
+
+    def __len__(self):
+        return len(self._web_pages)
+
+    def get(self, service_channel_id: str) -> Optional[Tuple[str, ...]]:
+        """Web page URLs of the service channel, None for unknown and archived service channels."""
+        return self._web_pages.get(service_channel_id)
+
+
+# The worker's service channel web pages
+SERVICE_CHANNEL_WEB_PAGES = DataVersioned(
+    'service channel web pages', lambda: ServiceChannelWebPages(get_service_channel_web_pages())
+)
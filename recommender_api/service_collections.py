@@ -0,0 +1,33 @@
+import time
+from threading import Lock
+from typing import FrozenSet, Optional
+
+from recommender_api.db import get_service_collection_ids
+from recommender_api.tools.config import config
+from recommender_api.tools.logger import log
+
+SERVICE_COLLECTION_CACHE_TTL_SECONDS = float(config['service_collection_cache_ttl_seconds'])
+
+_service_collection_ids: Optional[FrozenSet[str]] = None
+_loaded_at: Optional[float] = None
+_lock = Lock()
+
+
+def get_valid_service_collection_ids() -> FrozenSet[str]:
+    """
+    Return the ids of the non-archived service collections, stored by the PTV data loader. The worker reads
+    them from the database at most once per TTL.
+    """
+    global _service_collection_ids, _loaded_at  # pylint: disable=W0603
+
+    with _lock:
+        now = time.monotonic()
+        service_collection_ids = _service_collection_ids
+        if service_collection_ids is None or _loaded_at is None \
+                or now - _loaded_at >= SERVICE_COLLECTION_CACHE_TTL_SECONDS:
+            service_collection_ids = frozenset(get_service_collection_ids())
+            _service_collection_ids = service_collection_ids
+            _loaded_at = now
+            log.debug(f'Loaded {len(service_collection_ids)} service collections')
+
+        return service_collection_ids
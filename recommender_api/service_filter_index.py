@@ -0,0 +1,120 @@
+from typing import Any, Dict, Iterable, List, Sequence
+
+import numpy as np
+
+from recommender_api.data_version import DataVersioned
+from recommender_api.db import get_service_filter_data
+from recommender_api.index_alignment import index_positions
+
+NATIONWIDE_AREA_TYPE_PREFIX = 'Nationwide'
+
+
+def _postings(values_per_row: Iterable[Iterable[str]]) -> Dict[str, np.ndarray]:
+    """Map each value to the sorted row positions where it appears."""
+    rows_per_value: Dict[str, List[int]] = {}
+    for position, values in enumerate(values_per_row):
+        for value in set(values):
+            if value:
+                rows_per_value.setdefault(value, []).append(position)
+
+    return {value: np.array(rows, dtype=np.int32) for value, rows in rows_per_value.items()}
+
+
+class ServiceFilterIndex:
+    """
+    In-memory index of the filterable attributes of non-archived services.
+
+    Each attribute value is mapped to the positions of the services having it, so that a filter
+    combination can be evaluated with a few vectorized mask operations. A service matches a filter if
+    it has any of the filter values, and a service class filter also matches the parent classes.
+    """
+
+    def __init__(self, rows: List[Dict[str, Any]]):
+        self.service_ids: List[str] = [row['service_id'] for row in rows]
+        self._positions: Dict[str, int] = {service_id: i for i, service_id in enumerate(self.service_ids)}
+
+        area_types = [row.get('area_type') for row in rows]
+        self._nationwide = np.array(
+            [area_type is not None and area_type.startswith(NATIONWIDE_AREA_TYPE_PREFIX) for area_type in area_types],
+            dtype=bool
+        )
+        self._not_nationwide = np.array(
+            [area_type is not None and not area_type.startswith(NATIONWIDE_AREA_TYPE_PREFIX)
+             for area_type in area_types],
+            dtype=bool
+        )
+
+        self._municipalities = _postings((row.get('municipality_codes') or '').split(' ') for row in rows)
+        self._service_classes = _postings(
+            (row.get('service_class_uris') or []) + (row.get('service_class_parent_uris') or []) for row in rows
+        )
+        self._target_groups = _postings(row.get('target_groups') or [] for row in rows)
+        self._service_collections = _postings(row.get('service_collections') or [] for row in rows)
+        self._funding_types = _postings([row['funding_type']] if row.get('funding_type') else [] for row in rows)
+
+    def __len__(self):
+        return len(self.service_ids)
+
+    def mask(
+            self,
+            municipality_codes: List[str],
+            include_national: bool,
+            only_national: bool,
+            service_classes: List[str],
+            target_groups: List[str],
+            service_collections: List[str],
+            funding_type: List[str]
+    ) -> np.ndarray:
+        """Boolean mask over self.service_ids of the services matching the given filters."""
+        mask = self._municipality_mask(municipality_codes, include_national, only_national)
+
+        if service_classes:
+            mask &= self._any_of(self._service_classes, service_classes)
+        if target_groups:
+            mask &= self._any_of(self._target_groups, target_groups)
+        if service_collections:
+            mask &= self._any_of(self._service_collections, service_collections)
+        if funding_type:
+            mask &= self._any_of(self._funding_types, funding_type)
+
+        return mask
+
+    def positions(self, service_ids: Sequence[str]) -> np.ndarray:
+        """Index positions of the given service ids, -1 for services not in the index."""
+        return index_positions(self._positions, service_ids)
+
+    def aligned_mask(self, positions: np.ndarray, *filters) -> np.ndarray:
+        """
+        Boolean mask over rows (e.g. of the embedding matrix) of the services matching the filters, given the
+        index positions of the rows, e.g. from an IndexAlignment. Takes the same filter arguments as mask().
+        """
+        # Position -1 points to the appended False, so services missing from the index never match
+        mask = np.append(self.mask(*filters), False)
+        return mask[positions]
+
+    def _municipality_mask(self, municipality_codes: List[str], include_national: bool, only_national: bool):
+        if only_national:
+            return self._nationwide.copy()
+
+        if not municipality_codes and not include_national:
+            return self._not_nationwide.copy()
+
+        if not municipality_codes and include_national:
+            return np.ones(len(self), dtype=bool)
+
+        mask = self._any_of(self._municipalities, municipality_codes)
+        if include_national:
+            mask |= self._nationwide
+        return mask
+
+    def _any_of(self, postings: Dict[str, np.ndarray], values: List[str]) -> np.ndarray:
+        mask = np.zeros(len(self), dtype=bool)
+        for value in values:
+            positions = postings.get(value)
+            if positions is not None:
+                mask[positions] = True
+        return mask
+
+
+# The worker's filter index, rebuilt from the service table when the PTV data version changes
+SERVICE_FILTER_INDEX = DataVersioned('service filter index', lambda: ServiceFilterIndex(get_service_filter_data()))
@@ -1,25 +1,28 @@
+import math
 import re
-from statistics import geometric_mean
-from typing import Dict, Any, List, Union, Optional
+from typing import Dict, Any, List, Optional, Sequence, Tuple
 
 import pandas as pd
 import numpy as np
 import numpy.typing as npt
-import torch
-from numpy import dot
 from numpy.linalg import norm
 
 from rank_bm25 import BM25Okapi
 
+from recommender_api.tools.cache import LruCache
 from recommender_api.tools.logger import log
 from recommender_api.tools.config import config
 
-from recommender_api.db import get_service_vectors, get_filtered_service_ids, \
-    get_service_class_names, get_service_descriptions, \
-    get_redirects_and_feedback
+from recommender_api.bm25_index import build_bm25_index
+from recommender_api.data_version import DataVersioned
+from recommender_api.db import get_service_class_names, get_service_descriptions
+from recommender_api.embeddings import PtvEmbeddings, select_top_k
+from recommender_api.feedback_counts import SERVICE_FEEDBACK_COUNTS
 from recommender_api.municipality_data import MOCK_SERVICE_MUNICIPALITY
 from recommender_api.ptv import get_format_service_data
 from recommender_api.mock_session_service import mock_service_results
+from recommender_api.service_filter_index import SERVICE_FILTER_INDEX
+from recommender_api.service_vectors import ServiceVectors, SERVICE_VECTORS
 from recommender_api.recommender_input import Recommender3x10dParameters, RecommenderTextSearchParameters
 
 MIN_SIMILARITY = 1e-4  # geometric mean is defined for positive numbers
@@ -53,6 +56,11 @@ LS_METER_SEARCH = {'working_studying': 'koulu tukiopetus preppauskurssit arvosan
                    'resilience': 'vaikeus voittaminen psykologi motivaatio valmennus',
                    'life_satisfaction': 'tyytyväisyys elämä mielenterveys masennus ahdistus'}
 
+# fastText query vectors and unfiltered nearest neighbours of repeated search texts
+QUERY_VECTOR_CACHE = LruCache('query_vectors', int(config['query_vector_cache_size']))
+NEIGHBOUR_CACHE = LruCache('text_search_neighbours', int(config['text_search_neighbour_cache_size']))
+NEIGHBOUR_CACHE_DEPTH = int(config['text_search_neighbour_cache_depth'])
+
 CHANNEL_TYPE_FOR_SESSION_ID = 'EChannel'
 ERROR_NO_VECTORS = 'No service vectors found with given input.'
 
@@ -93,7 +101,7 @@ def find_similar_services(similarity_df: pd.DataFrame, weight: float = 1.0) -> p
 
 
 def _filter_fast_text_embeddings(
-        embeddings: Dict[str,  Union[List, np.ndarray]],
+        ptv_embeddings: PtvEmbeddings,
         municipality_codes: List[str],
         include_national: bool,
         only_national: bool,
@@ -101,8 +109,11 @@ def _filter_fast_text_embeddings(
         target_groups: List[str],
         service_collections: List[str],
         funding_type: List[str]
-):
-    service_ids_from_db = set(get_filtered_service_ids(  # type: ignore
+) -> np.ndarray:
+    """Boolean mask over the embedding rows of the services matching the given filters."""
+    index = SERVICE_FILTER_INDEX.get()
+    return index.aligned_mask(
+        ptv_embeddings.filter_index_alignment.positions(index),
         municipality_codes,
         include_national,
         only_national,
@@ -110,58 +121,25 @@ def _filter_fast_text_embeddings(
         target_groups,
         service_collections,
         funding_type
-    ))
-
-    # When filtering the service-ids and embedding-values in the input dict, the order of items must not change.
-    zipped_embeddings = [
-        (service_id, value) for service_id, value in zip(embeddings['ids'], embeddings['values'])
-        if service_id in service_ids_from_db
-    ]
-
-    if not zipped_embeddings:
-        return None, None
-
-    filtered_service_ids, filtered_embeddings = zip(*zipped_embeddings)
-
-    return list(filtered_service_ids), np.stack(filtered_embeddings)
-
-
-def compute_redirect_data(service_id_list: List[str], feedback_data: pd.DataFrame) -> pd.DataFrame:
-    redirects = feedback_data[['recommendation_id', 'service_id',
-                               'redirect_time']].dropna().copy()
-    redirects = redirects[['recommendation_id', 'service_id']].drop_duplicates()\
-                .groupby(['service_id']).count()\
-                .rename(columns={"recommendation_id": "prev_redirects_service"}).reset_index()
-
-    # join with service ids and fillna with 0
-    redirects = pd.DataFrame(service_id_list, columns=['service_id'])\
-                .merge(redirects, how="left").fillna(0)
-    return redirects
-
-def compute_feedback_data(service_id_list: List[str],
-                          score: int,
-                          feedback_data: pd.DataFrame) -> pd.DataFrame:
-
-    feedback_data = feedback_data[feedback_data.redirect_time.isnull()]\
-                   [['recommendation_id', 'service_id', 'feedback_score']]\
-                   .dropna().copy()
-    feedback_data = feedback_data.drop_duplicates(subset=['recommendation_id', 'service_id'],
-                                                  keep="last")\
-                   .query("feedback_score == @score")
-
-    if score == 1:
-        feedback_data = feedback_data.groupby(['service_id'])['feedback_score'].sum().reset_index()
-        feedback_data.rename(columns={'feedback_score': 'prev_pos_feedback_service'}, inplace=True)
-    elif score == -1:
-        feedback_data['feedback_score'] = feedback_data['feedback_score'].replace(-1, 1)
-        feedback_data = feedback_data.groupby(['service_id'])['feedback_score'].sum().reset_index()
-        feedback_data.rename(columns={'feedback_score': 'prev_neg_feedback_service'}, inplace=True)
+    )
 
-    # join with service ids and fillna with 0
-    feedback_data = pd.DataFrame(service_id_list, columns=['service_id'])\
-                    .merge(feedback_data, how="left").fillna(0)
 
-    return feedback_data
+def reranker_features(result: List[Dict[str, Any]]) -> np.ndarray:
+    """
+    Feature matrix of the results in the encoding XGBRanker.predict uses for a DataFrame of RERANKER_DTYPE:
+    categorical features are pandas category codes, i.e. positions among the sorted distinct values of the
+    batch, and missing categories are NaN.
+    """
+    features = np.empty((len(result), len(RERANKER_FEATURES)), dtype=np.float32)
+    for column, feature in enumerate(RERANKER_FEATURES):
+        values: List[Any] = [item.get(feature) for item in result]
+        dtype = RERANKER_DTYPE[feature]
+        if dtype == 'category':
+            codes = {value: code for code, value in enumerate(sorted({v for v in values if not pd.isna(v)}))}
+            features[:, column] = [np.nan if pd.isna(value) else codes[value] for value in values]
+        else:
+            features[:, column] = np.asarray(values, dtype=np.float64).astype(dtype)
+    return features
 
 
 def reranked(
@@ -169,20 +147,25 @@ def reranked(
     reranker: Any,
     limit: Optional[int] = None
 ) -> List[Dict[str, Any]]:
-    data = pd.DataFrame.from_records(result, columns=RERANKER_FEATURES)
-    data = data.astype(dtype=RERANKER_DTYPE)  # convert to types that model requires
-    pred = reranker.predict(data)
-    for i, item in enumerate(result):
-        item['pred'] = pred[i]
-        item['similarity'] = np.max([item['similarity'], MIN_SIMILARITY])
-        item['pred'] = np.max([item['pred'], MIN_SIMILARITY])
-        item['geomean'] = geometric_mean([item['similarity'], item['pred']])
-    sorted_result = sorted(result, key=lambda x: x['geomean'], reverse=True)
+    booster = reranker.get_booster()
+    best_iteration = booster.attr('best_iteration')  # XGBRanker.predict uses the trees up to the best iteration
+    pred = booster.inplace_predict(
+        reranker_features(result),
+        iteration_range=(0, int(best_iteration) + 1) if best_iteration is not None else (0, 0),
+        missing=np.nan
+    )
+
+    similarities = np.maximum(np.array([item['similarity'] for item in result], dtype=np.float64), MIN_SIMILARITY)
+    pred = np.maximum(pred.astype(np.float64), MIN_SIMILARITY)
+    # Same arithmetic as statistics.geometric_mean, NumPy's log and exp may differ in the last bit
+    geomeans = [math.exp((math.log(similarity) + math.log(prediction)) / 2)
+                for similarity, prediction in zip(similarities.tolist(), pred.tolist())]
+
+    order = sorted(range(len(result)), key=lambda i: geomeans[i], reverse=True)
+    sorted_result = [result[i] for i in order]
     # add rank and delete temporary data
     for i, res in enumerate(sorted_result):
         res['rank'] = i + 1
-        res.pop('pred')
-        res.pop('geomean')
         for feature in RERANKER_FEATURES:
             res.pop(feature)
     if limit:
@@ -215,16 +198,45 @@ def join_service_descriptions(meta_data: List[Dict[str, Any]]) -> List[str]:
     return result
 
 
+def _request_bm25_scores(service_id_list: List[str],
+                         service_meta_data: List[Dict[str, Any]],
+                         search_text: str) -> npt.NDArray:
+    """BM25 scores with the document frequencies of the candidate services only, as the reranker was trained"""
+    service_descriptions: Dict[str, Dict[str, str]] = get_service_descriptions(service_id_list)
+    for item in service_meta_data:
+        service_id = service_descriptions.get(item['service_id'], None)
+        if service_id:
+            service_description: str = service_id.get('service_description', '')
+            service_summary: str = service_id.get('description_summary', '')
+            service_instruction: str = service_id.get('user_instruction', '')
+            item['service_description'] = service_description
+            item['description_summary'] = service_summary
+            item['user_instruction'] = service_instruction
+
+    tokenized_query = process(search_text)
+    descriptions = join_service_descriptions(service_meta_data)
+    tokenized_descriptions = [process(desc) for desc in descriptions]
+    return bm25_score(tokenized_descriptions, tokenized_query)
+
+
+def tokenized_description(service: Dict[str, Any]) -> List[str]:
+    return process(join_service_descriptions([service])[0])
+
+
+# The worker's BM25 index of the service descriptions
+BM25_INDEX = DataVersioned('BM25 index', lambda: build_bm25_index(tokenized_description))
+
+
 def text_search_in_ptv(
         params: RecommenderTextSearchParameters,
-        ptv_embeddings: Dict[str,  Union[List, np.ndarray]],
+        ptv_embeddings: PtvEmbeddings,
         model: Any,
         reranker: Any,
         calling_service: str,
         request_path: str
 ) -> List[Dict[str, Any]]:
 
-    service_ids, embeddings = _filter_fast_text_embeddings(  # type: ignore
+    mask = _filter_fast_text_embeddings(
         ptv_embeddings,
         params.municipality_codes,
         params.include_national_services,
@@ -235,24 +247,25 @@ def text_search_in_ptv(
         params.funding_type
     )
 
-    if embeddings is None:
+    if not mask.any():
         return []  # no services found
 
-    search_text = params.search_text
+    # fastText splits sentences on whitespace, so texts differing only by whitespace have the same vector
+    query_key = ' '.join(params.search_text.split())
 
-    embedded_query = model.get_sentence_vector(search_text)
-    embedded_query_tensor = torch.tensor(embedded_query)
-    ptv_embeddings_tensor = torch.tensor(embeddings)
-    similarities = torch.cosine_similarity(
-        embedded_query_tensor, ptv_embeddings_tensor)
+    embedded_query = _query_vector(model, params.search_text, query_key)
 
     if params.rerank: # raise inner limit
-        top_count = min(params.limit+1, len(similarities))
+        top_count = params.limit+1
+    else:
+        top_count = params.limit
+    if config['text_search_retrieval'] == 'hybrid':
+        top_rows, similarity_scores = _hybrid_top_k(
+            ptv_embeddings, params.search_text, query_key, embedded_query, top_count, mask
+        )
     else:
-        top_count = min(params.limit, len(similarities))
-    torch_top = torch.topk(similarities, k=top_count)
-    top_ids = [service_ids[i] for i in torch_top[1]]
-    similarity_scores = torch_top[0]
+        top_rows, similarity_scores = _top_k(ptv_embeddings, query_key, embedded_query, top_count, mask)
+    top_ids = [ptv_embeddings.ids[i] for i in top_rows]
     log.debug(f'recommending service ids: {top_ids}')
     log.debug(f'and their scores: {similarity_scores.tolist()}')
     service_meta_data = get_format_service_data(top_ids)
@@ -278,6 +291,92 @@ def text_search_in_ptv(
     return result
 
 
+def _query_vector(model: Any, search_text: str, query_key: str) -> np.ndarray:
+    embedded_query = QUERY_VECTOR_CACHE.get(query_key)
+    if embedded_query is None:
+        embedded_query = model.get_sentence_vector(search_text)
+        embedded_query.setflags(write=False)
+        QUERY_VECTOR_CACHE.put(query_key, embedded_query)
+    return embedded_query
+
+
+def _top_k(
+        ptv_embeddings: PtvEmbeddings,
+        query_key: str,
+        embedded_query: np.ndarray,
+        top_count: int,
+        mask: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Top rows matching the filter mask. If the neighbour cache is enabled, they are taken from the cached
+    unfiltered top rows of the query when enough of those match the filters.
+    """
+    if NEIGHBOUR_CACHE.max_size <= 0 or top_count > NEIGHBOUR_CACHE_DEPTH:
+        return ptv_embeddings.top_k(embedded_query, top_count, mask)
+
+    neighbours = NEIGHBOUR_CACHE.get(query_key)
+    if neighbours is None:
+        neighbours = ptv_embeddings.top_k(
+            embedded_query, NEIGHBOUR_CACHE_DEPTH, np.ones(len(ptv_embeddings), dtype=bool)
+        )
+        NEIGHBOUR_CACHE.put(query_key, neighbours)
+
+    rows, scores = neighbours
+    matching = mask[rows]
+    if np.count_nonzero(matching) < top_count:
+        return ptv_embeddings.top_k(embedded_query, top_count, mask)
+    return rows[matching][:top_count], scores[matching][:top_count]
+
+
+def reciprocal_rank_fusion(rankings: List[Sequence[int]], k: int) -> List[int]:
+    """
+    Merge rankings of rows by the sum of 1 / (k + rank) over the rankings each row appears in.
+    Rows with equal fused scores keep the order in which they first appear in the rankings.
+    """
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking, start=1):
+            fused[row] = fused.get(row, 0.0) + 1.0 / (k + rank)
+    return sorted(fused, key=lambda row: fused[row], reverse=True)
+
+
+def _hybrid_top_k(
+        ptv_embeddings: PtvEmbeddings,
+        search_text: str,
+        query_key: str,
+        embedded_query: np.ndarray,
+        top_count: int,
+        mask: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Candidate rows from both the corpus-wide BM25 index and the embeddings, merged with reciprocal rank fusion.
+    A query that is exactly the name of a matching service is answered from the lexical candidates alone,
+    named services first. The similarity scores of the chosen rows are their cosine similarities.
+    """
+    bm25_index = BM25_INDEX.get()
+    positions = ptv_embeddings.bm25_index_alignment.positions(bm25_index)
+    lexical_scores = bm25_index.aligned_scores(positions, process(search_text))
+    lexical_candidates = np.flatnonzero(mask & (lexical_scores > 0))
+    lexical_rows, _ = select_top_k(
+        lexical_candidates, lexical_scores[lexical_candidates], int(config['hybrid_lexical_depth'])
+    )
+
+    named = mask & bm25_index.aligned_name_mask(positions, search_text)
+    if named.any():
+        log.debug('Exact service name match, skipping embedding retrieval')
+        rows = np.flatnonzero(named).tolist() + [row for row in lexical_rows.tolist() if not named[row]]
+    else:
+        semantic_rows, _ = _top_k(
+            ptv_embeddings, query_key, embedded_query, max(int(config['hybrid_semantic_depth']), top_count), mask
+        )
+        rows = reciprocal_rank_fusion(
+            [semantic_rows.tolist(), lexical_rows.tolist()], int(config['hybrid_rrf_k'])
+        )
+
+    top_rows = np.array(rows[:top_count], dtype=np.int64)
+    return top_rows, ptv_embeddings.row_similarities(top_rows, embedded_query)
+
+
 def add_reranker_features_for_text_search(
         result: List[Dict[str, Any]],
         calling_service: str,
@@ -287,35 +386,25 @@ def add_reranker_features_for_text_search(
 ) -> List[Dict[str, Any]]:
 
     service_id_list: List[str] = [value for res in result if (value := res.get('service_id')) is not None]
-    service_descriptions: Dict[str, Dict[str, str]] = get_service_descriptions(service_id_list)
-    for item in service_meta_data:
-        service_id = service_descriptions.get(item['service_id'], None)
-        if service_id:
-            service_description: str = service_id.get('service_description', '')
-            service_summary: str = service_id.get('description_summary', '')
-            service_instruction: str = service_id.get('user_instruction', '')
-            item['service_description'] = service_description
-            item['description_summary'] = service_summary
-            item['user_instruction'] = service_instruction
-
     service_class_names = get_service_class_names(service_id_list)
 
-    tokenized_query = process(params.search_text)
-    descriptions = join_service_descriptions(service_meta_data)
-    tokenized_descriptions = [process(desc) for desc in descriptions]
-    bm25_scores = bm25_score(tokenized_descriptions, tokenized_query)
+    if config['bm25_mode'] == 'corpus':
+        bm25_scores = BM25_INDEX.get().scores(
+            [item['service_id'] for item in result],
+            process(params.search_text)
+        )
+    else:
+        bm25_scores = _request_bm25_scores(service_id_list, service_meta_data, params.search_text)
 
-    feedback_data = get_redirects_and_feedback(service_id_list, calling_service)
-    redirects = compute_redirect_data(service_id_list, feedback_data)
-    neg_feedback = compute_feedback_data(service_id_list, -1, feedback_data)
-    pos_feedback = compute_feedback_data(service_id_list, 1, feedback_data)
+    feedback_counts = SERVICE_FEEDBACK_COUNTS.get().features(service_id_list, calling_service)
 
     for i, item in enumerate(result):
+        redirects, pos_feedback, neg_feedback = feedback_counts[i]
         item['calling_service'] = calling_service
         item['bm25_score'] = bm25_scores[i]
-        item['prev_neg_feedback_service'] = neg_feedback['prev_neg_feedback_service'][i]
-        item['prev_pos_feedback_service'] = pos_feedback['prev_pos_feedback_service'][i]
-        item['prev_redirects_service'] = redirects['prev_redirects_service'][i]
+        item['prev_neg_feedback_service'] = neg_feedback
+        item['prev_pos_feedback_service'] = pos_feedback
+        item['prev_redirects_service'] = redirects
         item['request_path'] = request_path
         item['service_class_name'] = service_class_names.get(item['service_id'])
         item['similarity'] = item.get('similarity_score')
@@ -335,7 +424,8 @@ def recommend(params: Recommender3x10dParameters,
         log.debug(f'Giving mock service')
         recommended_services_ids, formatted_results = mock_service_results()
     else:
-        service_vectors = get_service_vectors(
+        vectors = SERVICE_VECTORS.get()
+        mask = vectors.mask(
             params.municipality_codes,
             params.include_national_services,
             params.only_national_services,
@@ -345,7 +435,7 @@ def recommend(params: Recommender3x10dParameters,
             params.funding_type
         )
 
-        if len(service_vectors) == 0:
+        if not mask.any():
             log.technical.error(
                 f'No service vectors! Municipalities: {params.municipality_codes}, '
                 f'service-classes: {params.service_classes}!'
@@ -353,19 +443,22 @@ def recommend(params: Recommender3x10dParameters,
             formatted_results = []
 
         else:
-            similarities = calculate_similarities(service_vectors, params.life_situation_meters)
-            recommended_services_ids = similarities.index[0:params.limit]
+            recommended_services_ids, similarities = top_services_by_life_situation(
+                vectors,
+                mask,
+                params.life_situation_meters,
+                params.limit
+            )
 
-            formatted_results = get_format_service_data(
-                list(recommended_services_ids))
+            formatted_results = get_format_service_data(recommended_services_ids)
 
+            similarity_by_id = dict(zip(recommended_services_ids, similarities))
             for service_item in formatted_results:
-                service_item['similarity_score'] = similarities.loc[service_item.get(
-                    'service_id')]
+                service_item['similarity_score'] = similarity_by_id[service_item['service_id']]
 
             formatted_results = sorted(formatted_results,
-                                       key=lambda service_item: similarities.index.get_loc(
-                                           service_item.get('service_id')
+                                       key=lambda service_item: recommended_services_ids.index(
+                                           service_item['service_id']
                                        ),
                                        reverse=False)
 
@@ -391,75 +484,63 @@ def add_reranker_features_for_recommend(
 
     service_id_list: List[str] = [value for res in formatted_results
                                   if (value := res.get('service_id')) is not None]
-    # get historical redirects and feedback, filtered by service_ids and calling_service
-    feedback_data = get_redirects_and_feedback(service_id_list, calling_service)
-
-    # compute redirect and feedback features
-    redirects = compute_redirect_data(service_id_list, feedback_data)
-    pos_feedback = compute_feedback_data(service_id_list, 1, feedback_data)
-    neg_feedback = compute_feedback_data(service_id_list, -1, feedback_data)
+    # historical redirects and feedback of the services, as of the last PTV data load
+    feedback_counts = SERVICE_FEEDBACK_COUNTS.get().features(service_id_list, calling_service)
 
     service_class_names = get_service_class_names(service_id_list)
 
     # append to results
     for i, res in enumerate(formatted_results):
+        redirects, pos_feedback, neg_feedback = feedback_counts[i]
         res['calling_service'] = calling_service
         res['bm25_score'] = np.nan
-        res['prev_neg_feedback_service'] = neg_feedback['prev_neg_feedback_service'][i]
-        res['prev_pos_feedback_service'] = pos_feedback['prev_pos_feedback_service'][i]
-        res['prev_redirects_service'] = redirects['prev_redirects_service'][i]
+        res['prev_neg_feedback_service'] = neg_feedback
+        res['prev_pos_feedback_service'] = pos_feedback
+        res['prev_redirects_service'] = redirects
         res['request_path'] = request_path
         res['service_class_name'] = service_class_names.get(res['service_id'])
         res['similarity'] = res.get('similarity_score')
 
     return formatted_results
 
-def calculate_similarities(
-        service_vectors: pd.DataFrame,
-        life_situation_meters: Dict[str, List[int]]
-):
-    log.debug(f'Service vectors: {service_vectors}')
-    transformed_meters = transform_ls_meters(life_situation_meters, service_vectors.columns.values)
-    log.debug(f'Transformed meters: {transformed_meters}')
-
-    relevant_service_vectors = remove_irrelevant_service_vector_elements(service_vectors, transformed_meters.columns)
+def top_services_by_life_situation(
+        vectors: ServiceVectors,
+        mask: np.ndarray,
+        life_situation_meters: Dict[str, List[int]],
+        limit: int
+) -> Tuple[List[str], np.ndarray]:
+    """
+    Ids and similarities of the limit services most similar to the life situation meters among the rows
+    selected by the mask, by cosine similarity over the columns of the given meters. Computed on the in-memory
+    matrix with cached row norms. Services with equal similarity are ranked in row order.
+    Raise ValueError if the selected service vectors are all zeros in the columns of the given meters.
+    """
+    meters = {key: 1 - np.mean(values) / 10.1 for key, values in life_situation_meters.items()}
+    meters = {key: value for key, value in meters.items() if not np.isnan(value)}  # meter not given
+    positions = vectors.column_positions(list(meters))
+    query = np.fromiter(meters.values(), dtype=np.float64, count=len(meters))
+
+    norms, nonzero = vectors.subset_norms(positions)
+    rows = np.flatnonzero(mask & nonzero)
+    if len(rows) == 0:
+        raise ValueError(ERROR_NO_VECTORS)
 
-    # cosine similarity calculation in form dot(A, b)/(norm(A)*norm(b)),
-    # where A is the service vector matrix, and b is the query vector
-    A = relevant_service_vectors.values
-    b = transformed_meters.iloc[0]
-    similarities = dot(A, b) / (norm(A, axis=1) * norm(b))
-    similarities = pd.Series(similarities, index=relevant_service_vectors.index)
-    similarities.sort_values(ascending=False, inplace=True)
-    return similarities
+    similarities = vectors.values[np.ix_(rows, positions)].astype(np.float64) @ query
+    similarities /= norms[rows] * norm(query)
 
+    top = _top_positions(similarities, limit)
+    return [vectors.service_ids[row] for row in rows[top]], similarities[top]
 
-def remove_irrelevant_service_vector_elements(service_vectors: pd.DataFrame, input_columns):
-    """
-    Remove service vector columns that are not found in user input and then rows that are all zeros.
-    Raise ValueError if no service vectors are left.
-    """
-    relevant_service_vectors = service_vectors[input_columns]
-    relevant_service_vectors = relevant_service_vectors.loc[~(relevant_service_vectors == 0).all(axis=1)]
 
-    if len(relevant_service_vectors) == 0:
-        raise ValueError(ERROR_NO_VECTORS)
+def _top_positions(scores: np.ndarray, limit: int) -> np.ndarray:
+    """Positions of the limit highest scores in decreasing order, equal scores in position order."""
+    if limit < len(scores):
+        kth_score = -np.partition(-scores, limit - 1)[limit - 1]
+        if not np.isnan(kth_score):
+            candidates = np.flatnonzero(scores >= kth_score)
+            return candidates[np.argsort(-scores[candidates], kind='stable')][:limit]
 
-    return relevant_service_vectors
-
-
-def transform_ls_meters(ls_meters: Dict[str, List[int]], _columns: np.ndarray) -> pd.DataFrame:
-    # calculate mean (if more than one value per meter),
-    # rescale ls_meters between 0..1 and reverse scale
-    # divide by the number 10.1 to avoid zero vectors in
-    # the case of a vector with all 10
-    transformed_meters = dict()
-    for (key, values) in ls_meters.items():
-        transformed_meters[key] = 1 - np.mean(values) / 10.1
-    # if meter is not given - drop column
-    transformed_meters = pd.DataFrame(
-        [transformed_meters]).dropna(axis=1, how='all')
-    return transformed_meters
+    return np.argsort(-scores, kind='stable')[:limit]
 
 
 def set_redirect_urls(recommendation_id,
@@ -0,0 +1,74 @@
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from recommender_api.data_version import DataVersioned
+from recommender_api.db import get_all_service_vectors
+from recommender_api.index_alignment import IndexAlignment
+from recommender_api.service_filter_index import SERVICE_FILTER_INDEX
+
+# Columns of service_recommender.service_vectors
+SERVICE_VECTOR_COLUMNS = [
+    'health',
+    'resilience',
+    'housing',
+    'working_studying',
+    'family',
+    'friends',
+    'finance',
+    'improvement_of_strengths',
+    'self_esteem',
+    'life_satisfaction'
+]
+
+
+class ServiceVectors:
+    """
+    In-memory copy of the service vector table. Row i of the matrix is the 3X10D vector of service_ids[i].
+    The column type is real, so float32 holds the values exactly.
+    """
+
+    def __init__(self, rows: List[Dict[str, Any]]):
+        self.service_ids: List[str] = [row['service_id'] for row in rows]
+        self.columns = SERVICE_VECTOR_COLUMNS
+        self.values = np.array(
+            [[row[column] for column in self.columns] for row in rows],
+            dtype=np.float32
+        ).reshape(len(rows), len(self.columns))
+        self._column_positions = {column: i for i, column in enumerate(self.columns)}
+        self._subset_norms: Dict[Tuple[int, ...], Tuple[np.ndarray, np.ndarray]] = {}
+        self._filter_index_alignment = IndexAlignment(self.service_ids)
+
+    def __len__(self):
+        return len(self.service_ids)
+
+    def mask(self, *filters) -> np.ndarray:
+        """
+        Boolean mask over the rows of the non-archived services matching the filters. Takes the same filter
+        arguments as ServiceFilterIndex.mask().
+        """
+        index = SERVICE_FILTER_INDEX.get()
+        return index.aligned_mask(self._filter_index_alignment.positions(index), *filters)
+
+    def column_positions(self, columns: List[str]) -> List[int]:
+        """Matrix column positions of the given columns. Raises KeyError for unknown columns."""
+        return [self._column_positions[column] for column in columns]
+
+    def subset_norms(self, positions: List[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Row norms over the given columns and the mask of rows that are not all zeros in them. A request uses
+        the columns of the life situation meters it has values for, and the few distinct column selections
+        of the clients are computed once.
+        """
+        key = tuple(positions)
+        cached = self._subset_norms.get(key)
+        if cached is None:
+            subset = self.values[:, positions].astype(np.float64)
+            cached = (np.linalg.norm(subset, axis=1), (subset != 0).any(axis=1))
+            self._subset_norms[key] = cached
+        return cached
+
+
+# The worker's service vectors. The data loader reloads the service vector table in the same run that stores a new
+# fetch timestamp.
+SERVICE_VECTORS = DataVersioned('service vectors', lambda: ServiceVectors(get_all_service_vectors()))
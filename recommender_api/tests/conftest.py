@@ -66,10 +66,10 @@ def fixture_mock_get_secret():
         yield
 
 
-@pytest.fixture(name="mock_get_service_collections_from_ptv")
-def fixture_mock_get_service_collections_from_ptv():
+@pytest.fixture(name="mock_get_valid_service_collection_ids")
+def fixture_mock_get_valid_service_collection_ids():
     with patch(
-            'recommender_api.api_spec.get_service_collections_from_ptv',
+            'recommender_api.api_spec.get_valid_service_collection_ids',
             return_value={'744c4b61-fde5-4d23-a844-cee5728b9119'}
     ):
         yield
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose
+
+from recommender_api.ann_index import IvfIndex, load_ivf_index
+from recommender_api.embeddings import PtvEmbeddings
+
+
+def _generate_embeddings(rows=400, dim=16):
+    rng = np.random.default_rng(1)
+    centers = rng.normal(size=(8, dim))
+    values = centers[rng.integers(8, size=rows)] + rng.normal(scale=0.1, size=(rows, dim))
+    return PtvEmbeddings([f's{i}' for i in range(rows)], values)
+
+
+def test_ivf_top_k_matches_exact_search():
+    embeddings = _generate_embeddings()
+    index = IvfIndex.build(embeddings, n_lists=8)
+    query = embeddings.values[5]
+    mask = np.ones(len(embeddings), dtype=bool)
+
+    rows, scores = index.top_k(embeddings.values, query, 5, mask)
+
+    exact_rows, exact_scores = embeddings.exact_top_k(query, 5, mask)
+    assert rows.tolist() == exact_rows.tolist()
+    assert_allclose(scores, exact_scores, rtol=1e-6)
+
+
+def test_ivf_top_k_probes_more_lists_for_restrictive_filters():
+    embeddings = _generate_embeddings()
+    index = IvfIndex.build(embeddings, n_lists=8)
+    index.nprobe = 1
+    mask = np.zeros(len(embeddings), dtype=bool)
+    mask[::50] = True
+
+    rows, _ = index.top_k(embeddings.values, embeddings.values[5], 20, mask)
+
+    assert sorted(rows.tolist()) == np.flatnonzero(mask).tolist()
+
+
+def test_load_ivf_index_rejects_index_of_other_embeddings(tmp_path):
+    embeddings = _generate_embeddings()
+    file_path = str(tmp_path / 'index.npz')
+    IvfIndex.build(embeddings, n_lists=8).save(file_path)
+
+    assert load_ivf_index(file_path, embeddings) is not None
+    with pytest.warns(UserWarning, match='does not match'):
+        assert load_ivf_index(file_path, PtvEmbeddings(embeddings.ids[::-1], embeddings.values[::-1])) is None
+
+
+def test_load_ivf_index_falls_back_to_exact_search_without_index_file(tmp_path):
+    with pytest.warns(UserWarning, match='Cannot read ANN index'):
+        assert load_ivf_index(str(tmp_path / 'missing.npz'), _generate_embeddings()) is None
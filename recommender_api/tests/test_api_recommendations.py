@@ -145,7 +145,7 @@ def test_invalid_authorization(mock_client):
 
 
 def test_recommend_service_incorrect_input_simple_values(mock_add_session_transfer_indicator,
-                                                         mock_get_service_collections_from_ptv):
+                                                         mock_get_valid_service_collection_ids):
     client = main.create_app(fasttext_path=FASTTEXT_PATH).test_client()
 
     invalid_inputs = {
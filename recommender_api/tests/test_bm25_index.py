@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+from rank_bm25 import BM25Okapi
+
+from recommender_api.bm25_index import Bm25Index
+from recommender_api.search_text_filter import filter_special_chars
+from recommender_api.service_recommender import process
+
+DESCRIPTIONS = {
+    's1': 'Kunta tarjoaa asumisneuvontaa vuokralaisille ja asunnon omistajille.',
+    's2': 'Nuorisotalo järjestää harrastustoimintaa nuorille. Harrastukset ovat maksuttomia.',
+    's3': 'Työttömille työnhakijoille järjestetään työkokeilua ja neuvontaa.',
+    's4': 'Neuvonta ja ohjaus: asuminen, työ ja toimeentulo.',
+    's5': 'Harrastusmahdollisuudet ikääntyneille ja nuorille kunnan liikuntapaikoilla.',
+}
+
+
+@pytest.fixture(name='documents')
+def fixture_documents():
+    return {service_id: process(text) for service_id, text in DESCRIPTIONS.items()}
+
+
+@pytest.mark.parametrize('query', ['neuvonta', 'harrastustoimintaa nuorille', 'ja', 'ei löydy', 'ja ja nuorille'])
+def test_scores_match_bm25_okapi_over_the_corpus(documents, query):
+    index = Bm25Index(documents)
+    expected = BM25Okapi(list(documents.values())).get_scores(process(query))
+
+    candidates = ['s4', 's2', 's5']
+    scores = index.scores(candidates, process(query))
+
+    np.testing.assert_allclose(scores, expected[[3, 1, 4]], rtol=1e-12)
+
+
+def test_unknown_services_score_zero(documents):
+    scores = Bm25Index(documents).scores(['unknown', 's2'], process('nuorille'))
+
+    assert scores[0] == 0
+    assert scores[1] > 0
+
+
+def test_empty_corpus():
+    assert Bm25Index({}).scores(['s1'], ['neuvonta']).tolist() == [0.0]
+
+
+def test_corpus_scores_and_aligned_scores(documents):
+    index = Bm25Index(documents)
+    query = process('neuvonta nuorille')
+    expected = BM25Okapi(list(documents.values())).get_scores(query)
+
+    np.testing.assert_allclose(index.corpus_scores(query), expected, rtol=1e-12)
+    positions = index.positions(['s3', 'unknown', 's1'])
+    np.testing.assert_allclose(index.aligned_scores(positions, query), [expected[2], 0, expected[0]], rtol=1e-12)
+
+
+def test_aligned_name_mask(documents):
+    index = Bm25Index(documents, names={'s1': 'Asumisneuvonta', 's2': 'Nuorisotalo', 's3': None})
+
+    positions = index.positions(['s2', 's1', 'x'])
+
+    assert index.aligned_name_mask(positions, '  nuorisotalo ').tolist() == [True, False, False]
+    assert not index.aligned_name_mask(positions, 'nuorisotalo lähellä').any()
+
+
+def test_aligned_name_mask_of_punctuated_names(documents):
+    index = Bm25Index(documents, names={'s1': 'Kela, asumistuki', 's2': 'Perhekeskus (Espoo)'})
+
+    positions = index.positions(['s1', 's2'])
+
+    assert index.aligned_name_mask(positions, filter_special_chars('Kela, asumistuki')).tolist() == [True, False]
+    assert index.aligned_name_mask(positions, filter_special_chars('perhekeskus (espoo)')).tolist() == [False, True]
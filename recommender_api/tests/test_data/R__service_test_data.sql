@@ -424,4 +424,10 @@ values
         99993,
         'b9e2ff7d-3d18-476d-94e0-4a818f1136d6',
         -1
-    );
\ No newline at end of file
+    );
+
+SELECT service_recommender.refresh_service_feedback_counts();
+
+INSERT INTO service_recommender.service_collection (service_collection_id)
+VALUES ('744c4b61-fde5-4d23-a844-cee5728b9119')
+ON CONFLICT DO NOTHING;
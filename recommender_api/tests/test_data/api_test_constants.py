@@ -1,6 +1,3 @@
-import pandas as pd
-import numpy as np
-
 FASTTEXT_PATH = "recommender_api/fasttext"
 XGBOOST_PATH = "recommender_api/xgboost"
 
@@ -78,21 +75,3 @@ TEXT_SEARCH_TEST_DATA = [{
         }],
         'rank': -1
     }]
-
-REDIRECT_AND_FEEDBACK_TEST_DATA = pd.DataFrame(\
-    np.c_[[1, 1, 1, 2, 2, 3],
-          ['b9e2ff7d-3d18-476d-94e0-4a818f1136d6',
-           'd64476db-f2df-4699-bb6a-1bfae007577a',
-           '909e5065-ad9d-40f5-a54d-58c88b2f6bfc',
-           'b9e2ff7d-3d18-476d-94e0-4a818f1136d6',
-           'd64476db-f2df-4699-bb6a-1bfae007577a',
-           '909e5065-ad9d-40f5-a54d-58c88b2f6bfc'],
-          [1, np.nan, 1, 1, np.nan, -1],
-          np.repeat("test_service", 6),
-          [np.nan, np.datetime64('now'), np.nan,
-           np.nan, np.datetime64('now'), np.nan]],
-    columns=['recommendation_id',
-             'service_id',
-             'feedback_score',
-             'calling_service',
-             'redirect_time'])
@@ -0,0 +1,16 @@
+from unittest import mock
+
+from recommender_api import data_version
+from recommender_api.data_version import DataVersioned
+
+
+def test_value_is_rebuilt_when_data_version_changes():
+    build = mock.Mock(side_effect=lambda: object())
+    value = DataVersioned('test value', build)
+
+    with mock.patch.object(data_version, 'current_data_version', side_effect=['v1', 'v1', 'v2']):
+        first = value.get()
+        assert value.get() is first
+        assert value.get() is not first
+
+    assert build.call_count == 2
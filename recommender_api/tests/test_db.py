@@ -1,10 +1,14 @@
+from typing import List, Set
 from unittest.mock import patch
 
+import numpy as np
 import pytest
 import botocore
 
-from recommender_api.db import get_services_ptv_data, get_service_channels_ptv_data, get_service_vectors, \
-    get_filtered_service_ids
+from recommender_api import ptv, ptv_format
+from recommender_api.db import get_services_ptv_data, get_service_channels_ptv_data
+from recommender_api.service_filter_index import SERVICE_FILTER_INDEX
+from recommender_api.service_vectors import SERVICE_VECTORS
 from recommender_api.tools.config import config
 from recommender_api.tools.logger import log
 
@@ -42,6 +46,45 @@ def fixture_mock_get_apikeys():
             yield
 
 
+@pytest.fixture(name="mock_data_version", autouse=True)
+def fixture_mock_data_version():
+    # Build the in-memory structures from the test database once
+    with patch('recommender_api.data_version.current_data_version', return_value='test'):
+        yield
+
+
+def filtered_vector_ids(
+        municipality_codes: List[str],
+        include_national: bool,
+        only_national: bool,
+        service_classes: List[str],
+        target_groups: List[str],
+        service_collections: List[str],
+        funding_type: List[str],
+) -> Set[str]:
+    """Ids of the service vectors that /recommend_service scores with the given filters."""
+    vectors = SERVICE_VECTORS.get()
+    mask = vectors.mask(municipality_codes, include_national, only_national, service_classes, target_groups,
+                        service_collections, funding_type)
+    return set(np.array(vectors.service_ids, dtype=object)[mask])
+
+
+def filtered_service_ids(
+        municipality_codes: List[str],
+        include_national: bool,
+        only_national: bool,
+        service_classes: List[str],
+        target_groups: List[str],
+        service_collections: List[str],
+        funding_type: List[str],
+) -> Set[str]:
+    """Ids of the text search candidates with the given filters."""
+    index = SERVICE_FILTER_INDEX.get()
+    mask = index.mask(municipality_codes, include_national, only_national, service_classes, target_groups,
+                      service_collections, funding_type)
+    return set(np.array(index.service_ids, dtype=object)[mask])
+
+
 def test_get_service_ptv_data_with_invalid_ids():
     assert get_services_ptv_data(['1234', '4567']) == []
 
@@ -137,7 +180,7 @@ def test_get_service_channel_ptv_data_with_valid_ids():
 
 
 def test_get_service_vectors_single_service_class():
-    result = get_service_vectors(
+    result = filtered_vector_ids(
         ['091'],
         include_national=False,
         only_national=False,
@@ -147,11 +190,11 @@ def test_get_service_vectors_single_service_class():
         service_collections=[],
         funding_type=[]
     )
-    assert set(result.index) == {'b9e2ff7d-3d18-476d-94e0-4a818f1136d6'}
+    assert result == {'b9e2ff7d-3d18-476d-94e0-4a818f1136d6'}
 
 
 def test_get_service_vectors_multiple_service_classes():
-    result = get_service_vectors(
+    result = filtered_vector_ids(
         [],
         include_national=False,
         only_national=False,
@@ -164,11 +207,11 @@ def test_get_service_vectors_multiple_service_classes():
         funding_type=[]
     )
 
-    assert set(result.index) == {'b9e2ff7d-3d18-476d-94e0-4a818f1136d6'}
+    assert result == {'b9e2ff7d-3d18-476d-94e0-4a818f1136d6'}
 
 
 def test_get_service_vectors_multiple_service_classes_in_one_service():
-    result = get_service_vectors(
+    result = filtered_vector_ids(
         [],
         include_national=False,
         only_national=False,
@@ -178,9 +221,9 @@ def test_get_service_vectors_multiple_service_classes_in_one_service():
         service_collections=[],
         funding_type=[]
     )
-    assert '909e5065-ad9d-40f5-a54d-58c88b2f6bfc' in set(result.index)
+    assert '909e5065-ad9d-40f5-a54d-58c88b2f6bfc' in result
 
-    result = get_service_vectors(
+    result = filtered_vector_ids(
         [],
         include_national=False,
         only_national=False,
@@ -190,9 +233,9 @@ def test_get_service_vectors_multiple_service_classes_in_one_service():
         service_collections=[],
         funding_type=[]
     )
-    assert '909e5065-ad9d-40f5-a54d-58c88b2f6bfc' in set(result.index)
+    assert '909e5065-ad9d-40f5-a54d-58c88b2f6bfc' in result
 
-    result = get_service_vectors(
+    result = filtered_vector_ids(
         [],
         include_national=False,
         only_national=False,
@@ -204,11 +247,11 @@ def test_get_service_vectors_multiple_service_classes_in_one_service():
         service_collections=[],
         funding_type=[]
     )
-    assert '909e5065-ad9d-40f5-a54d-58c88b2f6bfc' in set(result.index)
+    assert '909e5065-ad9d-40f5-a54d-58c88b2f6bfc' in result
 
 
 def test_get_service_vectors_no_services_in_service_class():
-    result = get_service_vectors(
+    result = filtered_vector_ids(
         ['091'],
         include_national=False,
         only_national=False,
@@ -219,14 +262,14 @@ def test_get_service_vectors_no_services_in_service_class():
         funding_type=[]
     )
 
-    assert set(result.index) == set()
+    assert result == set()
 
 
 def test_get_service_vectors_for_single_municipality_empty_service_class_list():
-    result = get_service_vectors(['091'], False, False, [], [], [], [])
+    result = filtered_vector_ids(['091'], False, False, [], [], [], [])
 
     # This is treated same as None
-    assert set(result.index) == {
+    assert result == {
         'b9e2ff7d-3d18-476d-94e0-4a818f1136d6',
         'd64476db-f2df-4699-bb6a-1bfae007577a',
         'e7df7411-64ef-48ef-ad5f-eebacde480e2'
@@ -234,7 +277,7 @@ def test_get_service_vectors_for_single_municipality_empty_service_class_list():
 
 
 def test_get_service_vectors_national_service_in_class():
-    result = get_service_vectors(
+    result = filtered_vector_ids(
         [],
         include_national=True,
         only_national=True,
@@ -245,13 +288,13 @@ def test_get_service_vectors_national_service_in_class():
         funding_type=[]
     )
 
-    assert set(result.index) == {
+    assert result == {
         '811c88b7-74db-414c-bbce-9735c9feb14a',
     }
 
 
 def test_get_service_vectors_by_top_level_service_class():
-    result = get_service_vectors(
+    result = filtered_vector_ids(
         [],
         include_national=False,
         only_national=False,
@@ -262,14 +305,14 @@ def test_get_service_vectors_by_top_level_service_class():
         funding_type=[]
     )
 
-    assert set(result.index) == {
+    assert result == {
         'b9e2ff7d-3d18-476d-94e0-4a818f1136d6',
         '909e5065-ad9d-40f5-a54d-58c88b2f6bfc',
     }
 
 
 def test_get_service_vectors_no_services_in_top_level_service_class():
-    result = get_service_vectors(
+    result = filtered_vector_ids(
         ['091'],
         include_national=False,
         only_national=False,
@@ -280,16 +323,16 @@ def test_get_service_vectors_no_services_in_top_level_service_class():
         funding_type=[]
     )
 
-    assert set(result.index) == set()
+    assert result == set()
 
 
 def test_get_service_vectors_malformed_service_class_uri():
-    result = get_service_vectors(['091'], False, False, ['foobar'], [], [], [])
-    assert set(result.index) == set()
+    result = filtered_vector_ids(['091'], False, False, ['foobar'], [], [], [])
+    assert result == set()
 
 
 def test_get_service_vectors_only_non_national():
-    result = get_service_vectors(
+    result = filtered_vector_ids(
         [],
         include_national=False,
         only_national=False,
@@ -298,7 +341,7 @@ def test_get_service_vectors_only_non_national():
         service_collections=[],
         funding_type=[]
     )
-    assert set(result.index) == {
+    assert result == {
         '909e5065-ad9d-40f5-a54d-58c88b2f6bfc',
         'e7df7411-64ef-48ef-ad5f-eebacde480e2',
         'b9e2ff7d-3d18-476d-94e0-4a818f1136d6',
@@ -307,8 +350,8 @@ def test_get_service_vectors_only_non_national():
 
 
 def test_get_service_vectors_multiple_municipalities():
-    result = get_service_vectors(['091', '638'], False, False, [], [], [], [])
-    assert set(result.index) == {
+    result = filtered_vector_ids(['091', '638'], False, False, [], [], [], [])
+    assert result == {
         '909e5065-ad9d-40f5-a54d-58c88b2f6bfc',
         'b9e2ff7d-3d18-476d-94e0-4a818f1136d6',
         'd64476db-f2df-4699-bb6a-1bfae007577a',
@@ -317,7 +360,7 @@ def test_get_service_vectors_multiple_municipalities():
 
 
 def test_get_service_vectors_municipal_and_national():
-    result = get_service_vectors(
+    result = filtered_vector_ids(
         ['638'],
         include_national=True,
         only_national=False,
@@ -326,7 +369,7 @@ def test_get_service_vectors_municipal_and_national():
         service_collections=[],
         funding_type=[]
     )
-    assert set(result.index) == {
+    assert result == {
         '07058248-f002-4897-b1d5-7df9aa734c55',
         '6c415cf0-827d-47d0-86e4-866100bc86a8',
         '811c88b7-74db-414c-bbce-9735c9feb14a',
@@ -335,7 +378,7 @@ def test_get_service_vectors_municipal_and_national():
 
 
 def test_get_service_vectors_with_target_group():
-    result = get_service_vectors(
+    result = filtered_vector_ids(
         ["091"],
         include_national=False,
         only_national=False,
@@ -344,11 +387,11 @@ def test_get_service_vectors_with_target_group():
         service_collections=[],
         funding_type=[]
     )
-    assert set(result.index) == {'d64476db-f2df-4699-bb6a-1bfae007577a'}
+    assert result == {'d64476db-f2df-4699-bb6a-1bfae007577a'}
 
 
 def test_get_service_vectors_unexistent_target_group():
-    result = get_service_vectors(
+    result = filtered_vector_ids(
         ['638'],
         include_national=True,
         only_national=False,
@@ -357,11 +400,11 @@ def test_get_service_vectors_unexistent_target_group():
         service_collections=[],
         funding_type=[]
     )
-    assert set(result.index) == set()
+    assert result == set()
 
 
 def test_get_service_vectors_with_service_collection():
-    result = get_service_vectors(
+    result = filtered_vector_ids(
         ["091"],
         include_national=False,
         only_national=False,
@@ -370,11 +413,11 @@ def test_get_service_vectors_with_service_collection():
         service_collections=["744c4b61-fde5-4d23-a844-cee5728b9119"],
         funding_type=[]
     )
-    assert set(result.index) == {'d64476db-f2df-4699-bb6a-1bfae007577a'}
+    assert result == {'d64476db-f2df-4699-bb6a-1bfae007577a'}
 
 
 def test_get_service_vectors_unexistent_service_collection():
-    result = get_service_vectors(
+    result = filtered_vector_ids(
         ['638'],
         include_national=True,
         only_national=False,
@@ -383,11 +426,11 @@ def test_get_service_vectors_unexistent_service_collection():
         service_collections=["ABCD"],
         funding_type=[]
     )
-    assert set(result.index) == set()
+    assert result == set()
 
 
 def test_get_filtered_service_ids_single_service_class():
-    result = get_filtered_service_ids(
+    result = filtered_service_ids(
         ['091'],
         include_national=False,
         only_national=False,
@@ -397,11 +440,11 @@ def test_get_filtered_service_ids_single_service_class():
         service_collections=[],
         funding_type=[]
     )
-    assert result == ['b9e2ff7d-3d18-476d-94e0-4a818f1136d6']
+    assert result == {'b9e2ff7d-3d18-476d-94e0-4a818f1136d6'}
 
 
 def test_get_filtered_service_ids_multiple_service_classes():
-    result = get_filtered_service_ids(
+    result = filtered_service_ids(
         [],
         include_national=False,
         only_national=False,
@@ -414,14 +457,14 @@ def test_get_filtered_service_ids_multiple_service_classes():
         funding_type=[]
     )
 
-    assert result == [
+    assert result == {
         'b9e2ff7d-3d18-476d-94e0-4a818f1136d6',
         '909e5065-ad9d-40f5-a54d-58c88b2f6bfc'
-    ]
+    }
 
 
 def test_get_filtered_service_ids_with_target_group():
-    result = get_filtered_service_ids(
+    result = filtered_service_ids(
         [],
         include_national=False,
         only_national=False,
@@ -431,11 +474,11 @@ def test_get_filtered_service_ids_with_target_group():
         funding_type=[]
     )
 
-    assert result == ['d64476db-f2df-4699-bb6a-1bfae007577a']
+    assert result == {'d64476db-f2df-4699-bb6a-1bfae007577a'}
 
 
 def test_get_filtered_service_ids_with_invalid_target_group():
-    result = get_filtered_service_ids(
+    result = filtered_service_ids(
         [],
         include_national=False,
         only_national=False,
@@ -445,11 +488,11 @@ def test_get_filtered_service_ids_with_invalid_target_group():
         funding_type=[]
     )
 
-    assert result == []
+    assert result == set()
 
 
 def test_get_filtered_service_ids_with_service_collection():
-    result = get_filtered_service_ids(
+    result = filtered_service_ids(
         [],
         include_national=False,
         only_national=False,
@@ -459,13 +502,13 @@ def test_get_filtered_service_ids_with_service_collection():
         funding_type=[]
     )
 
-    assert result == [
+    assert result == {
         'd64476db-f2df-4699-bb6a-1bfae007577a'
-    ]
+    }
 
 
 def test_get_filtered_service_ids_with_invalid_service_collection():
-    result = get_filtered_service_ids(
+    result = filtered_service_ids(
         [],
         include_national=False,
         only_national=False,
@@ -475,11 +518,11 @@ def test_get_filtered_service_ids_with_invalid_service_collection():
         funding_type=[]
     )
 
-    assert result == []
+    assert result == set()
 
 
 def test_get_filtered_service_ids_multiple_service_classes_in_one_service():
-    result = get_filtered_service_ids(
+    result = filtered_service_ids(
         [],
         include_national=False,
         only_national=False,
@@ -491,7 +534,7 @@ def test_get_filtered_service_ids_multiple_service_classes_in_one_service():
     )
     assert '909e5065-ad9d-40f5-a54d-58c88b2f6bfc' in result
 
-    result = get_filtered_service_ids(
+    result = filtered_service_ids(
         [],
         include_national=False,
         only_national=False,
@@ -503,7 +546,7 @@ def test_get_filtered_service_ids_multiple_service_classes_in_one_service():
     )
     assert '909e5065-ad9d-40f5-a54d-58c88b2f6bfc' in result
 
-    result = get_filtered_service_ids(
+    result = filtered_service_ids(
         [],
         include_national=False,
         only_national=False,
@@ -519,7 +562,7 @@ def test_get_filtered_service_ids_multiple_service_classes_in_one_service():
 
 
 def test_get_filtered_service_ids_no_services_in_service_class():
-    result = get_filtered_service_ids(
+    result = filtered_service_ids(
         ['091'],
         include_national=False,
         only_national=False,
@@ -530,22 +573,22 @@ def test_get_filtered_service_ids_no_services_in_service_class():
         funding_type=[]
     )
 
-    assert result == []
+    assert result == set()
 
 
 def test_get_filtered_service_ids_for_single_municipality_empty_service_class_list():
-    result = get_filtered_service_ids(['091'], False, False, [], [], [], [])
+    result = filtered_service_ids(['091'], False, False, [], [], [], [])
 
     # This is treated same as None
-    assert result == [
+    assert result == {
         'b9e2ff7d-3d18-476d-94e0-4a818f1136d6',
         'd64476db-f2df-4699-bb6a-1bfae007577a',
         'e7df7411-64ef-48ef-ad5f-eebacde480e2'
-    ]
+    }
 
 
 def test_get_filtered_service_ids_national_service_in_class():
-    result = get_filtered_service_ids(
+    result = filtered_service_ids(
         [],
         include_national=True,
         only_national=True,
@@ -556,13 +599,13 @@ def test_get_filtered_service_ids_national_service_in_class():
         funding_type=[]
     )
 
-    assert result == [
+    assert result == {
         '811c88b7-74db-414c-bbce-9735c9feb14a'
-    ]
+    }
 
 
 def test_get_filtered_service_ids_by_top_level_service_class():
-    result = get_filtered_service_ids(
+    result = filtered_service_ids(
         [],
         include_national=False,
         only_national=False,
@@ -573,14 +616,14 @@ def test_get_filtered_service_ids_by_top_level_service_class():
         funding_type=[]
     )
 
-    assert result == [
+    assert result == {
         'b9e2ff7d-3d18-476d-94e0-4a818f1136d6',
         '909e5065-ad9d-40f5-a54d-58c88b2f6bfc',
-    ]
+    }
 
 
 def test_get_filtered_service_ids_no_services_in_top_level_service_class():
-    result = get_filtered_service_ids(
+    result = filtered_service_ids(
         ['091'],
         include_national=False,
         only_national=False,
@@ -591,16 +634,16 @@ def test_get_filtered_service_ids_no_services_in_top_level_service_class():
         funding_type=[]
     )
 
-    assert result == []
+    assert result == set()
 
 
 def test_get_filtered_service_ids_malformed_service_class_uri():
-    result = get_filtered_service_ids(['091'], False, False, ['foobar'], [], [], [])
-    assert result == []
+    result = filtered_service_ids(['091'], False, False, ['foobar'], [], [], [])
+    assert result == set()
 
 
 def test_get_filtered_service_ids_all_areas():
-    result = get_filtered_service_ids(
+    result = filtered_service_ids(
         municipality_codes=[],
         include_national=True,
         only_national=False,
@@ -609,7 +652,7 @@ def test_get_filtered_service_ids_all_areas():
         service_collections=[],
         funding_type=[]
     )
-    assert result == [
+    assert result == {
         'b9e2ff7d-3d18-476d-94e0-4a818f1136d6',
         '07058248-f002-4897-b1d5-7df9aa734c55',
         '811c88b7-74db-414c-bbce-9735c9feb14a',
@@ -617,11 +660,11 @@ def test_get_filtered_service_ids_all_areas():
         'd64476db-f2df-4699-bb6a-1bfae007577a',
         '6c415cf0-827d-47d0-86e4-866100bc86a8',
         'e7df7411-64ef-48ef-ad5f-eebacde480e2',
-    ]
+    }
 
 
 def test_get_filtered_service_ids_only_national():
-    result = get_filtered_service_ids(
+    result = filtered_service_ids(
         [],
         include_national=False,
         only_national=True,
@@ -630,26 +673,26 @@ def test_get_filtered_service_ids_only_national():
         service_collections=[],
         funding_type=[]
     )
-    assert result == [
+    assert result == {
         '07058248-f002-4897-b1d5-7df9aa734c55',
         '6c415cf0-827d-47d0-86e4-866100bc86a8',
         '811c88b7-74db-414c-bbce-9735c9feb14a'
 
-    ]
+    }
 
 
 def test_get_filtered_service_ids_multiple_municipalities():
-    result = get_filtered_service_ids(['091', '638'], False, False, [], [], [], [])
-    assert result == [
+    result = filtered_service_ids(['091', '638'], False, False, [], [], [], [])
+    assert result == {
         '909e5065-ad9d-40f5-a54d-58c88b2f6bfc',
         'b9e2ff7d-3d18-476d-94e0-4a818f1136d6',
         'd64476db-f2df-4699-bb6a-1bfae007577a',
         'e7df7411-64ef-48ef-ad5f-eebacde480e2'
-    ]
+    }
 
 
 def test_get_filtered_service_ids_municipal_and_national():
-    result = get_filtered_service_ids(
+    result = filtered_service_ids(
         ['638'],
         include_national=True,
         only_national=False,
@@ -658,16 +701,16 @@ def test_get_filtered_service_ids_municipal_and_national():
         service_collections=[],
         funding_type=[]
     )
-    assert result == [
+    assert result == {
         '07058248-f002-4897-b1d5-7df9aa734c55',
         '6c415cf0-827d-47d0-86e4-866100bc86a8',
         '811c88b7-74db-414c-bbce-9735c9feb14a',
         '909e5065-ad9d-40f5-a54d-58c88b2f6bfc'
-    ]
+    }
 
 
 def test_get_filtered_service_ids_with__public_funding_type():
-    result = get_filtered_service_ids(
+    result = filtered_service_ids(
         [],
         include_national=True,
         only_national=False,
@@ -677,11 +720,11 @@ def test_get_filtered_service_ids_with__public_funding_type():
         funding_type=['PubliclyFunded']
     )
 
-    assert result == ['811c88b7-74db-414c-bbce-9735c9feb14a']
+    assert result == {'811c88b7-74db-414c-bbce-9735c9feb14a'}
 
 
 def test_get_filtered_service_ids_with__market_funding_type():
-    result = get_filtered_service_ids(
+    result = filtered_service_ids(
         [],
         include_national=False,
         only_national=False,
@@ -691,6 +734,22 @@ def test_get_filtered_service_ids_with__market_funding_type():
         funding_type=['MarketFunded']
     )
 
-    assert result == [
+    assert result == {
+        'b9e2ff7d-3d18-476d-94e0-4a818f1136d6'
+    }
+
+
+def test_get_format_service_data_matches_full_ptv_documents():
+    service_ids = [
+        'd64476db-f2df-4699-bb6a-1bfae007577a',
+        'e7df7411-64ef-48ef-ad5f-eebacde480e2',
         'b9e2ff7d-3d18-476d-94e0-4a818f1136d6'
     ]
+    services = get_services_ptv_data(service_ids)
+    channels = get_service_channels_ptv_data({
+        channel['serviceChannel']['id'] for service in services for channel in service.get('serviceChannels', [])
+    })
+    expected = ptv_format.format_service_outputs(services, channels, 'fi')
+
+    by_id = lambda formatted: sorted(formatted, key=lambda service: service['service_id'])
+    assert by_id(ptv.get_format_service_data(service_ids)) == by_id(expected)
@@ -0,0 +1,73 @@
+import numpy as np
+import torch
+from numpy.testing import assert_allclose, assert_array_equal
+
+from recommender_api.embeddings import PtvEmbeddings, load_embeddings, save_npy
+
+
+def _generate_embeddings(rows=50, dim=8):
+    rng = np.random.default_rng(1)
+    return PtvEmbeddings([f's{i}' for i in range(rows)], rng.normal(size=(rows, dim)))
+
+
+def test_rows_are_normalized_float32():
+    embeddings = _generate_embeddings()
+
+    assert embeddings.values.dtype == np.float32
+    assert embeddings.values.flags['C_CONTIGUOUS']
+    assert_allclose(np.linalg.norm(embeddings.values, axis=1), 1.0, rtol=1e-6)
+
+
+def test_zero_row_has_zero_similarity():
+    embeddings = PtvEmbeddings(['s1', 's2'], [[0.0, 0.0], [1.0, 1.0]])
+
+    assert_allclose(embeddings.similarities(np.array([1.0, 0.0])), [0.0, np.sqrt(0.5)], rtol=1e-6)
+
+
+def test_similarities_match_torch_cosine_similarity():
+    rng = np.random.default_rng(2)
+    values = rng.normal(size=(50, 8)).astype(np.float32)
+    query = rng.normal(size=8).astype(np.float32)
+
+    expected = torch.cosine_similarity(torch.tensor(query), torch.tensor(values)).numpy()
+
+    assert_allclose(PtvEmbeddings(range(50), values).similarities(query), expected, rtol=1e-5, atol=1e-6)
+
+
+def test_top_k_respects_mask_and_order():
+    embeddings = _generate_embeddings()
+    query = np.random.default_rng(3).normal(size=8)
+    mask = np.zeros(len(embeddings), dtype=bool)
+    mask[::3] = True
+
+    rows, scores = embeddings.top_k(query, 5, mask)
+
+    all_scores = embeddings.similarities(query)
+    expected_rows = sorted(np.flatnonzero(mask), key=lambda row: -all_scores[row])[:5]
+    assert_array_equal(rows, expected_rows)
+    assert_allclose(scores, all_scores[expected_rows])
+
+
+def test_top_k_with_fewer_candidates_than_k():
+    embeddings = _generate_embeddings()
+    mask = np.zeros(len(embeddings), dtype=bool)
+    mask[[4, 7]] = True
+
+    rows, _ = embeddings.top_k(np.ones(8), 10, mask)
+
+    assert sorted(rows.tolist()) == [4, 7]
+    assert len(embeddings.top_k(np.ones(8), 10, np.zeros(len(embeddings), dtype=bool))[0]) == 0
+
+
+def test_npy_format_is_memory_mapped_read_only(tmp_path):
+    embeddings = PtvEmbeddings(['s1', 's2', 's1'], [[1.0, 2.0], [3.0, 4.0], [0.0, 1.0]])
+    file_path = str(tmp_path / 'embeddings.npy')
+    save_npy(embeddings, file_path)
+
+    loaded = load_embeddings(file_path)
+
+    assert loaded.ids == ['s1', 's2', 's1']
+    assert isinstance(loaded.values.base, np.memmap)
+    assert not loaded.values.flags['WRITEABLE']
+    assert_array_equal(loaded.values, embeddings.values)
+    assert_allclose(loaded.similarities(np.array([1.0, 1.0])), embeddings.similarities(np.array([1.0, 1.0])))
@@ -0,0 +1,16 @@
+from recommender_api.feedback_counts import ServiceFeedbackCounts
+
+ROWS = [
+    {'calling_service': 'Palvelu A', 'service_id': 's1', 'redirects': 2, 'positive_feedbacks': 0,
+     'negative_feedbacks': 1},
+    {'calling_service': 'Palvelu B', 'service_id': 's1', 'redirects': 0, 'positive_feedbacks': 3,
+     'negative_feedbacks': 0},
+]
+
+
+def test_features_by_calling_service():
+    counts = ServiceFeedbackCounts(ROWS)
+
+    assert counts.features(['s2', 's1'], 'Palvelu A') == [(0, 0, 0), (2, 0, 1)]
+    assert counts.features(['s1'], 'Palvelu B') == [(0, 3, 0)]
+    assert counts.features(['s1'], None) == [(0, 0, 0)]
@@ -1,6 +1,7 @@
 import numpy as np
 from numpy.testing import assert_array_equal
 
+from recommender_api.embeddings import PtvEmbeddings
 from recommender_api.service_recommender import _filter_fast_text_embeddings
 
 
@@ -14,11 +15,11 @@ def test_filter_fast_text_embeddings():
         'values': np.array([[1, 2], [3, 4], [5, 6]])
     }
 
-    filtered_service_ids, filtered_embeddings = _filter_fast_text_embeddings(
-        embeddings_input, ['091'], False, False, [], [], [], [])
+    mask = _filter_fast_text_embeddings(
+        PtvEmbeddings.from_dict(embeddings_input), ['091'], False, False, [], [], [], [])
 
-    assert filtered_service_ids == [
+    assert [service_id for service_id, match in zip(embeddings_input['ids'], mask) if match] == [
         'b9e2ff7d-3d18-476d-94e0-4a818f1136d6',
         'd64476db-f2df-4699-bb6a-1bfae007577a'
     ]
-    assert_array_equal(filtered_embeddings, np.array([[1, 2], [5, 6]]))
+    assert_array_equal(embeddings_input['values'][mask], np.array([[1, 2], [5, 6]]))
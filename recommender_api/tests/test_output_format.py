@@ -1,7 +1,9 @@
 import json
 import os
+from unittest import mock
 
-from recommender_api import ptv
+from recommender_api import ptv, ptv_format
+from recommender_api.tools.cache import LruCache
 
 BASEDIR = os.path.dirname(os.path.realpath(__file__))
 EXPECTED_SERVICE_CHANNEL = {
@@ -101,7 +103,7 @@ def test_format_service_channel_output():
     ) as f:
         otava_channel = json.load(f)
 
-    formated_output = ptv._format_service_channel_output(otava_channel, 'fi')
+    formated_output = ptv_format._format_service_channel_output(otava_channel, 'fi')
     print(formated_output)
     assert formated_output == EXPECTED_SERVICE_CHANNEL
 
@@ -115,6 +117,89 @@ def test_format_service_output():
     ) as f:
         otava_channel = json.load(f)
 
-    formatted_output = ptv._format_service_outputs([etalukio_service], [otava_channel], 'fi')
+    formatted_output = ptv_format.format_service_outputs([etalukio_service], [otava_channel], 'fi')
     print(formatted_output)
     assert formatted_output == [EXPECTED_SERVICE]
+
+
+def test_format_service_output_from_projected_fields():
+    with open(f'{BASEDIR}/test_data/etalukio_service.json', 'r', encoding='utf-8') as f:
+        etalukio_service = json.load(f)
+
+    with open(
+        f'{BASEDIR}/test_data/otava_service_channel.json', 'r', encoding='utf-8'
+    ) as f:
+        otava_channel = json.load(f)
+
+    projected_service = {k: v for k, v in etalukio_service.items() if k in ptv_format.FORMATTED_SERVICE_FIELDS}
+    projected_channel = {k: v for k, v in otava_channel.items() if k in ptv_format.FORMATTED_SERVICE_CHANNEL_FIELDS}
+
+    formatted_output = ptv_format.format_service_outputs([projected_service], [projected_channel], 'fi')
+    assert formatted_output == [EXPECTED_SERVICE]
+
+
+def _load_test_documents():
+    with open(f'{BASEDIR}/test_data/etalukio_service.json', 'r', encoding='utf-8') as f:
+        etalukio_service = json.load(f)
+
+    with open(
+        f'{BASEDIR}/test_data/otava_service_channel.json', 'r', encoding='utf-8'
+    ) as f:
+        otava_channel = json.load(f)
+
+    return etalukio_service, otava_channel
+
+
+def test_preformatted_service_documents_match_service_output():
+    etalukio_service, otava_channel = _load_test_documents()
+
+    service_document = ptv_format.format_service_document(etalukio_service, 'fi')
+    channel_document = ptv_format.format_service_channel_document(otava_channel, 'fi')
+    formatted_output = ptv_format.with_service_channels(
+        service_document,
+        ptv_format.service_channel_ids(etalukio_service),
+        {otava_channel['id']: channel_document}
+    )
+
+    assert formatted_output == EXPECTED_SERVICE
+    assert ptv_format.format_service_channel_document({**otava_channel, 'serviceChannelType': 'Fax'}, 'fi') is None
+
+
+def test_get_format_service_data_formats_services_without_preformatted_documents():
+    etalukio_service, otava_channel = _load_test_documents()
+    preformatted = {
+        'service_id': 'preformatted',
+        'service_channel_ids': [otava_channel['id']],
+        'document': {**ptv_format.format_service_document(etalukio_service, 'fi'), 'service_id': 'preformatted'},
+        'service_channels': {otava_channel['id']: ptv_format.format_service_channel_document(otava_channel, 'fi')}
+    }
+
+    with mock.patch('recommender_api.ptv.get_formatted_services', return_value=[preformatted]), \
+            mock.patch('recommender_api.ptv.get_services_and_channels_ptv_data',
+                       return_value=([etalukio_service], [otava_channel])) as get_ptv_data:
+        formatted_output = ptv.get_format_service_data(['preformatted', etalukio_service['id']])
+
+    assert formatted_output == [{**EXPECTED_SERVICE, 'service_id': 'preformatted'}, EXPECTED_SERVICE]
+    assert get_ptv_data.call_args.args[0] == [etalukio_service['id']]
+
+
+def test_cached_formatted_services_are_copies():
+    etalukio_service, otava_channel = _load_test_documents()
+    cache = LruCache('test_formatted_services', 10)
+
+    with mock.patch('recommender_api.ptv.FORMATTED_SERVICE_CACHE', cache), \
+            mock.patch('recommender_api.ptv.current_data_version', return_value='2023-06-01T00:00:00'), \
+            mock.patch('recommender_api.ptv.get_formatted_services', return_value=[]), \
+            mock.patch('recommender_api.ptv.get_services_and_channels_ptv_data',
+                       return_value=([etalukio_service], [otava_channel])) as get_ptv_data:
+        first_output = ptv.get_format_service_data([etalukio_service['id']])
+        first_output[0]['rank'] = 1
+        first_output[0]['service_channels'][0]['web_pages'] = ['https://redirect']
+        second_output = ptv.get_format_service_data([etalukio_service['id']])
+
+        with mock.patch('recommender_api.ptv.current_data_version', return_value='2023-06-02T00:00:00'):
+            ptv.get_format_service_data([etalukio_service['id']])
+
+    assert second_output == [EXPECTED_SERVICE]
+    assert get_ptv_data.call_count == 2
+    assert cache.stats()['hits'] == 1
@@ -0,0 +1,86 @@
+from unittest import mock
+
+import pytest
+import requests
+
+from recommender_api import profile_management
+from recommender_api.tools.cache import LruCache
+from recommender_api.tools.config import config
+
+CLIENT_INFO_URL = f'{config["profile_management_api_url"]}/oauth/client_info'
+SESSION_TRANSFER_URL = f'{config["profile_management_api_url"]}/v1/aurora_ai_services/session_transfer_supports'
+CLIENT_INFO = {'provider': {'fi': 'Organisaatio'}, 'name': {'fi': 'Palvelu'}}
+
+pytestmark = pytest.mark.disable_client_info_mock
+
+
+@pytest.fixture(name='client_info_caches')
+def fixture_client_info_caches():
+    with mock.patch.object(profile_management, 'CLIENT_INFO_CACHE', LruCache('test_client_info', 10, 300)), \
+            mock.patch.object(profile_management, 'DENIED_CLIENT_CACHE', LruCache('test_denied_clients', 10, 30)):
+        yield
+
+
+@pytest.mark.usefixtures('client_info_caches')
+def test_client_info_is_cached_by_authorization_header(requests_mock):
+    requests_mock.get(CLIENT_INFO_URL, json=CLIENT_INFO)
+
+    assert profile_management.get_client_info('Key a') == CLIENT_INFO
+    assert profile_management.get_client_info('Key a') == CLIENT_INFO
+    profile_management.get_client_info('Key b')
+
+    assert requests_mock.call_count == 2
+    assert 'Key a' not in repr(profile_management.CLIENT_INFO_CACHE._entries)  # pylint: disable=W0212
+
+
+@pytest.mark.usefixtures('client_info_caches')
+def test_denied_authorization_is_cached(requests_mock):
+    requests_mock.get(CLIENT_INFO_URL, status_code=403)
+
+    for _ in range(2):
+        with pytest.raises(requests.exceptions.HTTPError):
+            profile_management.get_client_info('Key denied')
+
+    assert requests_mock.call_count == 1
+
+
+@pytest.mark.usefixtures('client_info_caches')
+def test_server_errors_are_not_cached(requests_mock):
+    requests_mock.get(CLIENT_INFO_URL, [{'status_code': 500}, {'json': CLIENT_INFO}])
+
+    with pytest.raises(requests.exceptions.HTTPError):
+        profile_management.get_client_info('Key a')
+
+    assert profile_management.get_client_info('Key a') == CLIENT_INFO
+
+
+@pytest.fixture(name='session_transfer_cache')
+def fixture_session_transfer_cache():
+    with mock.patch.object(profile_management, 'SESSION_TRANSFER_CACHE', LruCache('test_session_transfer', 10, 300)):
+        yield
+
+
+@pytest.mark.usefixtures('session_transfer_cache')
+def test_session_transfer_supports_queried_only_for_uncached_channels(requests_mock):
+    requests_mock.post(SESSION_TRANSFER_URL, [{'json': {'a': True}}, {'json': {'c': True}}])
+
+    assert profile_management.get_session_transfer_supports(['a', 'b', 'a']) == {'a': True, 'b': False}
+    assert profile_management.get_session_transfer_supports(['b', 'c', 'a']) == {'a': True, 'b': False, 'c': True}
+
+    assert requests_mock.call_count == 2
+    assert requests_mock.last_request.json() == {'ptv_service_channel_ids': ['c']}
+
+
+@pytest.mark.usefixtures('session_transfer_cache')
+def test_cached_session_transfer_supports_need_no_request(requests_mock):
+    requests_mock.post(SESSION_TRANSFER_URL, json={'a': True})
+
+    with mock.patch.object(profile_management, 'get_service_channel_ids_of_type', return_value=['a', 'b']), \
+            mock.patch.object(profile_management, 'SESSION_TRANSFER_BATCH_SIZE', 1):
+        profile_management.warm_up_session_transfer_supports()
+    services = [{'service_channels': [{'service_channel_id': 'a', 'service_channel_type': 'EChannel'},
+                                      {'service_channel_id': 'b', 'service_channel_type': 'EChannel'}]}]
+    profile_management.add_session_transfer_indicator(services)
+
+    assert requests_mock.call_count == 2
+    assert [channel['session_transfer'] for channel in services[0]['service_channels']] == [True, False]
@@ -0,0 +1,102 @@
+import time
+from unittest import mock
+
+import pytest
+from psycopg2 import IntegrityError
+
+from recommender_api import db, recommendation_events, recommendation_writer
+from recommender_api.batch_writer import BatchWriter
+from recommender_api.tools.cache import LruCache
+from recommender_api.tools.logger import log
+
+ASYNC_CONFIG = {'event_write_mode': 'async', 'recommendation_write_mode': 'async'}
+SERVICE_ID = 'd64476db-f2df-4699-bb6a-1bfae007577a'
+OTHER_SERVICE_ID = '867fa742-3806-4fa5-b2c0-5749ea325167'
+
+
+@pytest.fixture(name='event_writer')
+def fixture_event_writer():
+    writer = BatchWriter('test event', recommendation_events._write_events,  # pylint: disable=W0212
+                         queue_size=100, batch_size=100, flush_interval=60)
+    recent = LruCache('test_recent_recommendations', 10)
+    recent.put(1, frozenset([SERVICE_ID]))
+
+    with mock.patch.dict('recommender_api.tools.config.config', ASYNC_CONFIG), \
+            mock.patch.object(recommendation_events, 'EVENT_WRITER', writer), \
+            mock.patch.object(writer, '_start_writer'), \
+            mock.patch.object(recommendation_writer, 'RECENT_RECOMMENDATIONS', recent), \
+            mock.patch.object(db, 'get_recommended_services', return_value=None), \
+            mock.patch.object(db, 'store_recommendation_events') as store_events:
+        yield writer, store_events
+
+
+def test_valid_events_are_stored_in_one_batch(event_writer):
+    writer, store_events = event_writer
+
+    recommendation_events.store_redirect(1, SERVICE_ID, 'channel', None)
+    recommendation_events.store_feedback(1, 1, [{'service_id': SERVICE_ID, 'feedback_score': -1}])
+    store_events.assert_not_called()
+    writer.flush()
+
+    redirects, feedbacks, service_feedbacks = store_events.call_args.args
+    assert [redirect[:4] for redirect in redirects] == [(1, SERVICE_ID, 'channel', None)]
+    assert feedbacks == [(1, 1)]
+    assert service_feedbacks == [(1, SERVICE_ID, -1)]
+
+
+def test_events_of_unknown_recommendations_and_services_are_rejected(event_writer):
+    writer, store_events = event_writer
+
+    with pytest.raises(db.InvalidRedirectException):
+        recommendation_events.store_redirect(1, OTHER_SERVICE_ID, 'channel', None)
+    with pytest.raises(db.InvalidRecommendationIdException):
+        recommendation_events.store_feedback(2, 1)
+    with pytest.raises(db.InvalidServiceIdException, match=OTHER_SERVICE_ID):
+        recommendation_events.store_feedback(1, 1, [{'service_id': OTHER_SERVICE_ID, 'feedback_score': 1}])
+    writer.flush()
+
+    store_events.assert_not_called()
+    db.get_recommended_services.assert_called_once_with(2)
+
+
+def test_failed_batch_is_stored_one_by_one(event_writer):
+    writer, store_events = event_writer
+    store_events.side_effect = [IntegrityError('batch'), None, IntegrityError('redirect')]
+
+    recommendation_events.store_feedback(1, 1)
+    recommendation_events.store_redirect(1, SERVICE_ID, 'channel', None)
+    writer.flush()
+
+    assert store_events.call_count == 3
+    assert store_events.call_args_list[1].args == ([], [(1, 1)], [])
+
+
+def test_background_writer_flushes_the_log_of_each_batch():
+    def write_batch(events):
+        log.technical.error(f'Dropped {len(events)} events')
+
+    writer = BatchWriter('test event', write_batch, queue_size=10, batch_size=1, flush_interval=60)
+
+    with mock.patch.object(log.technical.__class__, 'flush') as flush_technical:
+        writer.put(('feedback', (1, 1)))
+        writer.put(('feedback', (2, 1)))
+
+        deadline = time.monotonic() + 5
+        while flush_technical.call_count < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    assert flush_technical.call_count == 2
+
+
+def test_flush_writes_the_batch_the_background_writer_is_collecting():
+    write_batch = mock.Mock()
+    writer = BatchWriter('test event', write_batch, queue_size=10, batch_size=10, flush_interval=60)
+
+    for event_id in range(5):
+        writer.put(('feedback', (event_id, 1)))
+    time.sleep(0.05)
+    write_batch.assert_not_called()
+
+    writer.flush()
+
+    assert [event[1][0] for call in write_batch.call_args_list for event in call.args[0]] == [0, 1, 2, 3, 4]
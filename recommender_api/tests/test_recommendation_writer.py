@@ -0,0 +1,82 @@
+import time
+from typing import Any, Dict, Tuple
+from unittest import mock
+
+import pytest
+from psycopg2 import IntegrityError
+
+from recommender_api import recommendation_writer
+from recommender_api.recommendation_writer import RecommendationWriter
+from recommender_api.tools.cache import LruCache
+
+RECORD: Tuple[str, str, str, str, Dict[str, Any]] = (
+    'session', 'organisation', 'service', '/service-recommender/v1/recommend_service', {}
+)
+
+
+@pytest.fixture(name='mock_db')
+def fixture_mock_db():
+    with mock.patch.object(recommendation_writer.db, 'allocate_recommendation_ids',
+                           side_effect=[[1, 2], [3, 4]]) as allocate, \
+            mock.patch.object(recommendation_writer.db, 'recommendation_record', return_value=RECORD), \
+            mock.patch.object(recommendation_writer.db, 'store_recommendation_batch') as store_batch:
+        yield allocate, store_batch
+
+
+def _stored_ids(store_batch):
+    return [[recommendation[0] for recommendation in call.args[0]] for call in store_batch.call_args_list]
+
+
+def test_ids_are_allocated_in_blocks_and_full_queue_is_written_synchronously(mock_db):
+    allocate, store_batch = mock_db
+    writer = RecommendationWriter(id_block_size=2, queue_size=1, batch_size=10, flush_interval=1)
+
+    with mock.patch.object(writer._batches, '_start_writer'):  # pylint: disable=W0212
+        assert [writer.store(['s1'], None) for _ in range(3)] == [1, 2, 3]
+        assert _stored_ids(store_batch) == [[2], [3]]
+        assert writer.wait_until_stored(1, timeout=1)
+
+    assert _stored_ids(store_batch) == [[2], [3], [1]]
+    assert allocate.call_count == 2
+    assert store_batch.call_args.args[0][0][2:] == (RECORD, ['s1'])
+
+
+def test_background_writer_stores_queued_recommendations_in_batches(mock_db):
+    _, store_batch = mock_db
+    writer = RecommendationWriter(id_block_size=2, queue_size=10, batch_size=10, flush_interval=0.05)
+
+    writer.store(['s1'], None)
+    writer.store(['s2'], None)
+
+    deadline = time.monotonic() + 5
+    while not store_batch.called and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert _stored_ids(store_batch) == [[1, 2]]
+    assert writer.wait_until_stored(2, timeout=1)
+
+
+def test_failed_batch_is_retried_and_then_stored_one_by_one(mock_db):
+    _, store_batch = mock_db
+    failures = iter([False, True])
+
+    def store(recommendations):
+        if len(recommendations) > 1 or next(failures):
+            raise IntegrityError('insert failed')
+
+    store_batch.side_effect = store
+    recent = LruCache('test_recent_recommendations', 10)
+    writer = RecommendationWriter(id_block_size=2, queue_size=10, batch_size=10, flush_interval=1,
+                                  retry_delays=(0.1,))
+
+    with mock.patch.object(recommendation_writer, 'RECENT_RECOMMENDATIONS', recent), \
+            mock.patch.object(recommendation_writer.time, 'sleep') as sleep, \
+            mock.patch.object(writer._batches, '_start_writer'):  # pylint: disable=W0212
+        writer.store(['s1'], None)
+        writer.store(['s2'], None)
+        assert recent.get(1) == frozenset(['s1'])
+        assert writer.wait_until_stored(1, timeout=1)
+
+    assert _stored_ids(store_batch) == [[1, 2], [1, 2], [1], [2]]
+    sleep.assert_called_once_with(0.1)
+    assert recent.get(1) == frozenset(['s1'])
+    assert recent.get(2) is None
@@ -0,0 +1,73 @@
+import copy
+from statistics import geometric_mean
+
+import numpy as np
+import pandas as pd
+import pytest
+from xgboost.sklearn import XGBRanker
+
+from recommender_api.service_recommender import MIN_SIMILARITY, RERANKER_DTYPE, RERANKER_FEATURES, reranked
+from recommender_api.tests.test_data.api_test_constants import XGBOOST_PATH
+from recommender_api.tools.config import config
+
+SERVICE_CLASS_NAMES = [f'Palveluluokka {i}' for i in range(90)] + [None]
+
+
+@pytest.fixture(name='reranker', scope='module')
+def fixture_reranker():
+    reranker = XGBRanker()
+    reranker.load_model(f'{XGBOOST_PATH}/{config["xgboost_model_file"]}')
+    return reranker
+
+
+def _reranked_with_data_frame(result, reranker, limit=None):
+    """The reranking before the inplace prediction path, for comparison"""
+    data = pd.DataFrame.from_records(result, columns=RERANKER_FEATURES).astype(dtype=RERANKER_DTYPE)
+    pred = reranker.predict(data)
+    for i, item in enumerate(result):
+        item['similarity'] = np.max([item['similarity'], MIN_SIMILARITY])
+        item['geomean'] = geometric_mean([item['similarity'], np.max([pred[i], MIN_SIMILARITY])])
+    sorted_result = sorted(result, key=lambda x: x['geomean'], reverse=True)
+    for i, res in enumerate(sorted_result):
+        res['rank'] = i + 1
+        res.pop('geomean')
+        for feature in RERANKER_FEATURES:
+            res.pop(feature)
+    return sorted_result[0:limit] if limit else sorted_result
+
+
+def _generate_results(rng, size):
+    return [
+        {
+            'service_id': f's{i}',
+            'similarity_score': similarity,
+            'similarity': similarity,
+            'calling_service': rng.choice(['Palvelu A', 'Palvelu B', 'Palvelu C']),
+            'request_path': rng.choice(['/service-recommender/v1/text_search',
+                                        '/service-recommender/v1/recommend_service']),
+            'service_class_name': SERVICE_CLASS_NAMES[rng.integers(len(SERVICE_CLASS_NAMES))],
+            'bm25_score': rng.random() * 10 if rng.random() < 0.5 else np.nan,
+            'prev_redirects_service': float(rng.integers(0, 5)),
+            'prev_pos_feedback_service': float(rng.integers(0, 3)),
+            'prev_neg_feedback_service': float(rng.integers(0, 3))
+        }
+        for i, similarity in enumerate(rng.random(size).tolist())
+    ]
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_reranked_matches_data_frame_prediction(reranker, seed):
+    rng = np.random.default_rng(seed)
+    result = _generate_results(rng, int(rng.integers(1, 52)))
+    limit = int(rng.integers(1, 10)) if seed % 2 else None
+
+    expected = _reranked_with_data_frame(copy.deepcopy(result), reranker, limit)
+
+    assert reranked(result, reranker, limit) == expected
+
+
+def test_reranked_removes_features_and_adds_rank(reranker):
+    result = reranked(_generate_results(np.random.default_rng(1), 5), reranker)
+
+    assert [item['rank'] for item in result] == [1, 2, 3, 4, 5]
+    assert all(set(item) == {'service_id', 'similarity_score', 'rank'} for item in result)
@@ -16,12 +16,11 @@ from recommender_api import main, ft
 from recommender_api.tests.test_data.api_test_constants import CORRECT_INPUT, \
     FASTTEXT_PATH, URL, AUTHORIZATION_HEADER_NAME, VALID_HEADERS, TEXT_SEARCH_URL, \
     VALID_AUTHORIZATION, TEXT_SEARCH_TEST_DATA, XGBOOST_PATH, \
-    REDIRECT_FEEDBACK_TEST_SERVICE_ID_LIST, REDIRECT_AND_FEEDBACK_TEST_DATA, \
-    TEST_SERVICE
+    REDIRECT_FEEDBACK_TEST_SERVICE_ID_LIST, TEST_SERVICE
 
 from recommender_api.tests.test_api_recommendations import assert_result_format, set_log_test_stream
-from recommender_api.service_recommender import get_redirects_and_feedback, compute_redirect_data, \
-    compute_feedback_data
+from recommender_api.db import database, get_service_feedback_counts
+from recommender_api.feedback_counts import ServiceFeedbackCounts
 
 
 if os.getenv('ENVIRONMENT') == 'localunittest':
@@ -133,28 +132,44 @@ if os.getenv('ENVIRONMENT') == 'localunittest':
         assert result1 != result2
 
 
-    def test_get_redirects_and_feedback():
-        feedback_data = get_redirects_and_feedback(REDIRECT_FEEDBACK_TEST_SERVICE_ID_LIST,
-                                                   TEST_SERVICE)
-        feedback_data = feedback_data.query("recommendation_id >= 99990")
-        assert set(feedback_data.recommendation_id) == {99990, 99991, 99992, 99993}
-
-
-    def test_compute_redirect_data():
-        redirects = compute_redirect_data(REDIRECT_FEEDBACK_TEST_SERVICE_ID_LIST,
-                              REDIRECT_AND_FEEDBACK_TEST_DATA)
-        assert all(redirects['prev_redirects_service'].values == [2,0,0])
-
-    def test_compute_feedback_data():
-        pos_feedback = compute_feedback_data(REDIRECT_FEEDBACK_TEST_SERVICE_ID_LIST,
-                                             1,
-                                             REDIRECT_AND_FEEDBACK_TEST_DATA)
-        assert all(pos_feedback['prev_pos_feedback_service'].values == [0, 1, 2])
-
-        neg_feedback = compute_feedback_data(REDIRECT_FEEDBACK_TEST_SERVICE_ID_LIST,
-                                             -1,
-                                             REDIRECT_AND_FEEDBACK_TEST_DATA)
-        assert all(neg_feedback['prev_neg_feedback_service'].values == [0, 1, 0])
+    def test_service_feedback_counts_of_test_data():
+        counts = ServiceFeedbackCounts(get_service_feedback_counts())
+
+        assert counts.features(REDIRECT_FEEDBACK_TEST_SERVICE_ID_LIST, TEST_SERVICE) == [
+            (3, 0, 1),
+            (0, 0, 0),
+            (0, 3, 1)
+        ]
+
+
+    def test_refresh_service_feedback_counts():
+        redirected, rated, unrated = REDIRECT_FEEDBACK_TEST_SERVICE_ID_LIST
+
+        with database() as (conn, cur):
+            cur.execute("""
+                INSERT INTO service_recommender.recommendation (recommendation_id, calling_service)
+                VALUES (99994, 'test_refresh'), (99995, 'test_refresh');
+                INSERT INTO service_recommender.recommendation_service (recommendation_id, service_id)
+                VALUES (99994, %(redirected)s), (99994, %(rated)s), (99994, %(unrated)s), (99995, %(rated)s);
+                INSERT INTO service_recommender.recommendation_redirect (recommendation_id, service_id)
+                VALUES (99994, %(redirected)s), (99994, %(redirected)s);
+                INSERT INTO service_recommender.recommendation_service_feedback
+                    (recommendation_id, service_id, feedback_score)
+                VALUES (99994, %(redirected)s, 1), (99994, %(rated)s, 1), (99994, %(rated)s, -1),
+                    (99995, %(rated)s, -1);
+                SELECT service_recommender.refresh_service_feedback_counts();
+            """, {'redirected': redirected, 'rated': rated, 'unrated': unrated})
+            cur.execute("""
+                SELECT calling_service, service_id, redirects, positive_feedbacks, negative_feedbacks
+                FROM service_recommender.service_feedback_counts
+                WHERE calling_service = 'test_refresh';
+            """)
+            counts = ServiceFeedbackCounts([dict(row) for row in cur.fetchall()])
+            conn.rollback()
+
+        # A redirect is counted once per recommendation and hides the feedback. Later feedback replaces earlier.
+        assert counts.features([redirected, rated, unrated], 'test_refresh') == [(1, 0, 0), (0, 0, 2), (0, 0, 0)]
+        assert len(counts) == 2
 
 
     @pytest.fixture(scope='module')
@@ -0,0 +1,59 @@
+from unittest import mock
+
+import pytest
+
+from recommender_api.recommender_input import Recommender3x10dParameters, RecommenderTextSearchParameters
+from recommender_api.response_cache import cache_response, get_cached_response, response_cache_key
+from recommender_api.tools.cache import LruCache
+
+TEXT_SEARCH_PATH = '/service-recommender/v1/text_search'
+
+
+@pytest.fixture(autouse=True)
+def response_cache():
+    with mock.patch('recommender_api.response_cache.RESPONSE_CACHE', LruCache('test_responses', 10)), \
+            mock.patch('recommender_api.response_cache.current_data_version', return_value='2023-06-01T00:00:00'):
+        yield
+
+
+def _text_search_key(service_filters, search_text='kela'):
+    params = RecommenderTextSearchParameters({'search_text': search_text, 'service_filters': service_filters})
+    return response_cache_key(params, 'test service', TEXT_SEARCH_PATH)
+
+
+def test_key_does_not_depend_on_filter_order():
+    assert _text_search_key({'municipality_codes': ['091', '049'], 'target_groups': ['KR1', 'KR2']}) \
+        == _text_search_key({'municipality_codes': ['049', '091'], 'target_groups': ['KR2', 'KR1']})
+
+
+def test_key_depends_on_search_text_filters_and_data_version():
+    key = _text_search_key({'municipality_codes': ['091']})
+
+    assert key != _text_search_key({'municipality_codes': ['091']}, 'kela tuki')
+    assert key != _text_search_key({'municipality_codes': ['049']})
+    with mock.patch('recommender_api.response_cache.current_data_version', return_value='2023-06-02T00:00:00'):
+        assert key != _text_search_key({'municipality_codes': ['091']})
+
+
+def test_key_depends_on_life_situation_meters():
+    def key(meters):
+        return response_cache_key(
+            Recommender3x10dParameters({'life_situation_meters': meters}),
+            'test service',
+            '/service-recommender/v1/recommend_service'
+        )
+
+    assert key({'family': [3], 'health': [8]}) == key({'health': [8], 'family': [3]})
+    assert key({'family': [3], 'health': [8]}) != key({'family': [3], 'health': [7]})
+
+
+def test_cached_response_is_a_copy():
+    key = _text_search_key({})
+    recommendations = [{'service_id': 's1', 'service_channels': [{'web_pages': ['https://www.suomi.fi']}]}]
+    cache_response(key, recommendations)
+
+    cached = get_cached_response(key)
+    cached[0]['service_channels'][0]['web_pages'] = ['redirect link']
+
+    assert get_cached_response(key) == recommendations
+    assert get_cached_response(None) is None
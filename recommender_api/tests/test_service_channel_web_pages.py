@@ -0,0 +1,27 @@
+from unittest import mock
+
+import pytest
+
+from recommender_api import ptv
+from recommender_api.service_channel_web_pages import ServiceChannelWebPages
+
+ROWS = [
+    {'service_channel_id': 'c1', 'web_pages': ['https://a.fi', '']},
+    {'service_channel_id': 'c2', 'web_pages': []},
+]
+
+
+def test_web_pages_by_service_channel():
+    web_pages = ServiceChannelWebPages(ROWS)
+
+    assert len(web_pages) == 2
+    assert web_pages.get('c1') == ('https://a.fi', '')
+    assert web_pages.get('c2') == ()
+    assert web_pages.get('c3') is None
+
+
+def test_unknown_service_channel_raises_index_error():
+    with mock.patch.object(ptv.SERVICE_CHANNEL_WEB_PAGES, 'get', return_value=ServiceChannelWebPages(ROWS)):
+        assert ptv.get_service_channel_web_pages('c1') == ['https://a.fi', '']
+        with pytest.raises(IndexError):
+            ptv.get_service_channel_web_pages('c3')
@@ -0,0 +1,20 @@
+from unittest import mock
+
+from recommender_api import service_collections
+from recommender_api.service_collections import get_valid_service_collection_ids
+
+COLLECTION_IDS = {'744c4b61-fde5-4d23-a844-cee5728b9119'}
+
+
+def test_service_collections_reloaded_after_ttl():
+    with mock.patch.object(service_collections, '_loaded_at', None), \
+            mock.patch.object(service_collections, 'SERVICE_COLLECTION_CACHE_TTL_SECONDS', 300), \
+            mock.patch.object(service_collections, 'get_service_collection_ids',
+                              return_value=COLLECTION_IDS) as get_ids, \
+            mock.patch.object(service_collections.time, 'monotonic', side_effect=[1000.0, 1299.0, 1300.0]):
+        assert get_valid_service_collection_ids() == COLLECTION_IDS
+        assert get_valid_service_collection_ids() == COLLECTION_IDS
+        assert get_ids.call_count == 1
+
+        get_valid_service_collection_ids()
+        assert get_ids.call_count == 2
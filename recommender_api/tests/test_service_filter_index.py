@@ -0,0 +1,118 @@
+import numpy as np
+from numpy.testing import assert_array_equal
+
+from recommender_api.index_alignment import IndexAlignment
+from recommender_api.service_filter_index import ServiceFilterIndex
+
+SERVICE_CLASS_P5_1 = 'http://uri.suomi.fi/codelist/ptv/ptvserclass2/code/P5.1'
+SERVICE_CLASS_P5_3 = 'http://uri.suomi.fi/codelist/ptv/ptvserclass2/code/P5.3'
+SERVICE_CLASS_P5 = 'http://uri.suomi.fi/codelist/ptv/ptvserclass2/code/P5'
+
+
+def _generate_index():
+    return ServiceFilterIndex([
+        {
+            'service_id': 's1',
+            'area_type': 'Municipality',
+            'municipality_codes': '091',
+            'funding_type': 'PubliclyFunded',
+            'service_class_uris': [SERVICE_CLASS_P5_3],
+            'service_class_parent_uris': [SERVICE_CLASS_P5],
+            'target_groups': ['KR1'],
+            'service_collections': ['c1']
+        },
+        {
+            'service_id': 's2',
+            'area_type': 'Municipality',
+            'municipality_codes': '091 092',
+            'funding_type': 'MarketFunded',
+            'service_class_uris': [SERVICE_CLASS_P5_1],
+            'service_class_parent_uris': [SERVICE_CLASS_P5],
+            'target_groups': [],
+            'service_collections': []
+        },
+        {
+            'service_id': 's3',
+            'area_type': 'Nationwide',
+            'municipality_codes': '',
+            'funding_type': None,
+            'service_class_uris': [],
+            'service_class_parent_uris': [],
+            'target_groups': ['KR1', 'KR2'],
+            'service_collections': []
+        },
+        {
+            'service_id': 's4',
+            'area_type': None,
+            'municipality_codes': None,
+            'funding_type': None,
+            'service_class_uris': None,
+            'service_class_parent_uris': None,
+            'target_groups': None,
+            'service_collections': None
+        }
+    ])
+
+
+def _matching_ids(index, *filters):
+    return [service_id for service_id, match in zip(index.service_ids, index.mask(*filters)) if match]
+
+
+def test_municipality_filter_without_national_services():
+    assert _matching_ids(_generate_index(), ['092'], False, False, [], [], [], []) == ['s2']
+
+
+def test_municipality_filter_with_national_services():
+    assert _matching_ids(_generate_index(), ['092'], True, False, [], [], [], []) == ['s2', 's3']
+
+
+def test_only_national_services():
+    assert _matching_ids(_generate_index(), [], True, True, [], [], [], []) == ['s3']
+
+
+def test_no_area_filters_excludes_national_services():
+    assert _matching_ids(_generate_index(), [], False, False, [], [], [], []) == ['s1', 's2']
+
+
+def test_no_area_filters_with_national_services_matches_all():
+    assert _matching_ids(_generate_index(), [], True, False, [], [], [], []) == ['s1', 's2', 's3', 's4']
+
+
+def test_service_class_filter_matches_class_and_parent_class():
+    index = _generate_index()
+    assert _matching_ids(index, [], True, False, [SERVICE_CLASS_P5_3], [], [], []) == ['s1']
+    assert _matching_ids(index, [], True, False, [SERVICE_CLASS_P5], [], [], []) == ['s1', 's2']
+
+
+def test_target_group_service_collection_and_funding_type_filters():
+    index = _generate_index()
+    assert _matching_ids(index, [], True, False, [], ['KR1'], [], []) == ['s1', 's3']
+    assert _matching_ids(index, [], True, False, [], [], ['c1'], []) == ['s1']
+    assert _matching_ids(index, [], True, False, [], [], [], ['MarketFunded']) == ['s2']
+    assert _matching_ids(index, [], True, False, [], ['ABCD'], [], []) == []
+
+
+def test_combined_filters():
+    assert _matching_ids(_generate_index(), ['091'], True, False, [], ['KR1'], [], []) == ['s1', 's3']
+
+
+def test_aligned_mask_keeps_order_and_excludes_unknown_services():
+    index = _generate_index()
+    embedding_ids = ['s3', 'unknown', 's1', 's3', 's2']
+
+    mask = index.aligned_mask(index.positions(embedding_ids), ['091'], True, False, [], [], [], [])
+
+    assert_array_equal(mask, np.array([True, False, True, True, True]))
+
+
+def test_alignment_is_computed_once_per_index():
+    alignment = IndexAlignment(['s3', 'unknown', 's1'])
+    index = _generate_index()
+
+    positions = alignment.positions(index)
+    assert positions.tolist() == [2, -1, 0]
+    assert alignment.positions(index) is positions
+
+    rebuilt = _generate_index()
+    assert alignment.positions(rebuilt) is not positions
+    assert alignment.positions(rebuilt).tolist() == [2, -1, 0]
@@ -1,92 +1,209 @@
 import math
-import pandas as pd
+from unittest import mock
+
+import numpy as np
 import pytest
+from numpy.linalg import norm
 
-from recommender_api.service_recommender import calculate_similarities
+from recommender_api.embeddings import PtvEmbeddings
+from recommender_api.bm25_index import Bm25Index
+from recommender_api.service_recommender import top_services_by_life_situation, reciprocal_rank_fusion, process, \
+    _hybrid_top_k, _query_vector, _top_k
+from recommender_api.service_vectors import SERVICE_VECTOR_COLUMNS, ServiceVectors
+from recommender_api.tools.cache import LruCache
 
 
-def test_calculate_similarities_with_life_situation_0():
-    similarities = calculate_similarities(
+@pytest.mark.parametrize('value', [0, 1, 10])
+def test_top_services_by_life_situation_with_life_situation(value):
+    _, similarities = top_services_by_life_situation(
         _generate_service_vectors(),
-        _generate_3x10d_values(0)
+        np.ones(3, dtype=bool),
+        _generate_3x10d_values(value),
+        10
     )
 
-    similarities_list = similarities.values.tolist()
+    similarities_list = similarities.tolist()
     assert not any([math.isnan(x) for x in similarities_list])
     assert all([0 <= x <= 10 for x in similarities_list])
     assert len(similarities_list) == 3
 
 
-def test_calculate_similarities_with_life_situation_1():
-    similarities = calculate_similarities(
+def test_top_services_by_life_situation_no_stamps_for_one_service():
+    # one of the generated service vectors has 0 value for both 'health' and 'housing'
+    _, similarities = top_services_by_life_situation(
         _generate_service_vectors(),
-        _generate_3x10d_values(1)
+        np.ones(3, dtype=bool),
+        {'health': [5], 'housing': [0]},
+        10
     )
 
-    similarities_list = similarities.values.tolist()
+    similarities_list = similarities.tolist()
     assert not any([math.isnan(x) for x in similarities_list])
     assert all([0 <= x <= 10 for x in similarities_list])
-    assert len(similarities_list) == 3
+    assert len(similarities_list) == 2
 
 
-def test_calculate_similarities_with_life_situation_10():
-    similarities = calculate_similarities(
-        _generate_service_vectors(),
-        _generate_3x10d_values(10)
-    )
+def test_top_services_by_life_situation_with_no_stamps_for_any_service():
+    # all the generated service vectors have 0 value for 'life_satisfaction'
+    with pytest.raises(ValueError):
+        top_services_by_life_situation(
+            _generate_service_vectors(),
+            np.ones(3, dtype=bool),
+            {'life_satisfaction': [1]},
+            10
+        )
 
-    similarities_list = similarities.values.tolist()
-    assert not any([math.isnan(x) for x in similarities_list])
-    assert all([0 <= x <= 10 for x in similarities_list])
-    assert len(similarities_list) == 3
 
+def _generate_3x10d_values(value):
+    return {key: value for key in SERVICE_VECTOR_COLUMNS}
 
-def test_calculate_similarities_no_stamps_for_one_service():
-    # one of the generated service vectors has 0 value for both 'health' and 'housing'
-    similarities = calculate_similarities(
-        _generate_service_vectors(),
-        {'health': [5], 'housing': [0]}
-    )
 
-    similarities_list = similarities.values.tolist()
-    assert not any([math.isnan(x) for x in similarities_list])
-    assert all([0 <= x <= 10 for x in similarities_list])
-    assert len(similarities_list) == 2
+def _generate_service_vectors():
+    return ServiceVectors([
+        {'service_id': service_id, **dict(zip(SERVICE_VECTOR_COLUMNS, values))}
+        for service_id, values in [
+            ('s1', [1.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0]),
+            ('s2', [0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0]),
+            ('s3', [1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 0.0]),
+        ]
+    ])
 
 
-def test_calculate_similarities_with_no_stamps_for_any_service():
-    # all the generated service vectors have 0 value for 'life_satisfaction'
+def test_query_vector_is_cached_by_whitespace_normalized_text():
+    model = mock.Mock()
+    model.get_sentence_vector.return_value = np.ones(3, dtype=np.float32)
+
+    first = _query_vector(model, 'kela  tuki ', 'kela tuki')
+    second = _query_vector(model, 'kela tuki', 'kela tuki')
+
+    assert second is first
+    model.get_sentence_vector.assert_called_once_with('kela  tuki ')
+
+
+def test_cached_neighbours_give_same_filtered_top_rows_as_exact_search():
+    rng = np.random.default_rng(1)
+    embeddings = PtvEmbeddings([f's{i}' for i in range(200)], rng.normal(size=(200, 8)))
+    query = rng.normal(size=8)
+    mask = rng.random(200) < 0.3
+
+    with mock.patch('recommender_api.service_recommender.NEIGHBOUR_CACHE', LruCache('test_neighbours', 10)):
+        _top_k(embeddings, 'query', query, 5, np.ones(200, dtype=bool))
+        rows, scores = _top_k(embeddings, 'query', query, 5, mask)
+
+    expected_rows, expected_scores = embeddings.top_k(query, 5, mask)
+    assert rows.tolist() == expected_rows.tolist()
+    assert scores.tolist() == expected_scores.tolist()
+
+
+def _generate_in_memory_service_vectors(rows=300):
+    rng = np.random.default_rng(4)
+    values = rng.random((rows, len(SERVICE_VECTOR_COLUMNS))) * (rng.random((rows, len(SERVICE_VECTOR_COLUMNS))) < 0.4)
+    return ServiceVectors([
+        {'service_id': f's{i:03}', **dict(zip(SERVICE_VECTOR_COLUMNS, row))} for i, row in enumerate(values)
+    ])
+
+
+def _similarities_row_by_row(vectors, mask, life_situation_meters):
+    """Cosine similarities of the selected rows that are not all zeros in the columns of the meters."""
+    meters = {key: 1 - np.mean(values) / 10.1 for key, values in life_situation_meters.items() if values}
+    query = np.array(list(meters.values()))
+    positions = vectors.column_positions(list(meters))
+
+    similarities = {}
+    for service_id, selected, row in zip(vectors.service_ids, mask, vectors.values.astype(np.float64)):
+        if selected and row[positions].any():
+            similarities[service_id] = row[positions] @ query / (norm(row[positions]) * norm(query))
+    return similarities
+
+
+@pytest.mark.parametrize('limit', [1, 5, 50, 1000])
+def test_top_services_by_life_situation_matches_row_by_row_similarities(limit):
+    vectors = _generate_in_memory_service_vectors()
+    mask = np.random.default_rng(5).random(len(vectors)) < 0.7
+    meters = {'family': [3, 4], 'health': [8], 'housing': [0], 'finance': []}
+
+    service_ids, similarities = top_services_by_life_situation(vectors, mask, meters, limit)
+
+    expected = sorted(_similarities_row_by_row(vectors, mask, meters).items(),
+                      key=lambda item: (-item[1], item[0]))[:limit]
+    assert service_ids == [service_id for service_id, _ in expected]
+    np.testing.assert_allclose(similarities, [similarity for _, similarity in expected], rtol=1e-12)
+
+
+def test_top_services_by_life_situation_ranks_ties_in_row_order():
+    vectors = ServiceVectors([
+        {'service_id': service_id, **dict(zip(SERVICE_VECTOR_COLUMNS, [value] + [0] * 9))}
+        for service_id, value in [('s1', 0), ('s2', 1), ('s3', 2), ('s4', 1), ('s5', 1)]
+    ])
+
+    service_ids, _ = top_services_by_life_situation(vectors, np.ones(5, dtype=bool), {'health': [5]}, 2)
+
+    assert service_ids == ['s2', 's3']
+
+
+def test_top_services_by_life_situation_with_only_zero_vectors():
+    vectors = _generate_in_memory_service_vectors()
+
     with pytest.raises(ValueError):
-        calculate_similarities(
-            _generate_service_vectors(),
-            {'life_satisfaction': [1]}
-        )
+        top_services_by_life_situation(vectors, np.zeros(len(vectors), dtype=bool), {'health': [5]}, 5)
 
 
-column_names = [
-    'health',
-    'resilience',
-    'housing',
-    'working_studying',
-    'family',
-    'friends',
-    'finance',
-    'improvement_of_strenghs',
-    'self_esteem',
-    'life_satisfaction'
-]
+def test_reciprocal_rank_fusion_prefers_rows_in_both_rankings():
+    assert reciprocal_rank_fusion([[1, 2, 3], [3, 4]], 60) == [3, 1, 2, 4]
+    assert reciprocal_rank_fusion([[5, 6], []], 60) == [5, 6]
 
 
-def _generate_3x10d_values(value):
-    return {key: value for key in column_names}
+HYBRID_CONFIG = {'hybrid_lexical_depth': 10, 'hybrid_semantic_depth': 10, 'hybrid_rrf_k': 60}
 
 
-def _generate_service_vectors():
-    service_vectors = pd.DataFrame([
-        ['s1', 1.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0],
-        ['s2', 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0],
-        ['s3', 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 0.0],
-    ], columns=(['service_id'] + column_names))
-
-    service_vectors.set_index('service_id', inplace=True)
-    return service_vectors
+def _hybrid_fixture():
+    embeddings = PtvEmbeddings(
+        ['s1', 's2', 's3', 's4', 's5', 's6'],
+        [[1.0, 0.0], [0.9, 0.1], [0.0, 1.0], [0.5, 0.5], [0.2, 0.8], [0.8, 0.2]]
+    )
+    texts = {
+        's1': 'asumisneuvonta vuokralaisille',
+        's2': 'neuvonta ja ohjaus',
+        's3': 'kirjasto lainaa kirjoja',
+        's4': 'nuorisotalo lainaa pelejä',
+        's5': 'uimahalli ja kuntosali',
+        's6': 'terveysneuvonta',
+    }
+    bm25_index = Bm25Index(
+        {service_id: process(text) for service_id, text in texts.items()},
+        names={'s1': 'Asumisneuvonta', 's2': 'Neuvonta', 's3': 'Kirjasto', 's4': 'Nuorisotalo'}
+    )
+    return embeddings, bm25_index
+
+
+def _hybrid(embeddings, bm25_index, search_text, query, top_count, mask):
+    with mock.patch('recommender_api.service_recommender.BM25_INDEX.get', return_value=bm25_index), \
+            mock.patch.dict('recommender_api.service_recommender.config', HYBRID_CONFIG), \
+            mock.patch('recommender_api.service_recommender.NEIGHBOUR_CACHE', LruCache('test_neighbours', 0)):
+        return _hybrid_top_k(embeddings, search_text, search_text, np.array(query, dtype=np.float32),
+                             top_count, mask)
+
+
+def test_hybrid_top_k_fuses_lexical_and_semantic_candidates():
+    embeddings, bm25_index = _hybrid_fixture()
+
+    rows, similarities = _hybrid(embeddings, bm25_index, 'lainaa', [1.0, 0.0], 3, np.ones(6, dtype=bool))
+
+    # s3 and s4 are the only lexical matches, so appearing in both rankings lifts them above the nearest embedding
+    assert rows.tolist() == [3, 2, 0]
+    np.testing.assert_allclose(similarities, embeddings.similarities(np.array([1.0, 0.0]))[rows], rtol=1e-6)
+
+
+def test_hybrid_top_k_answers_exact_names_lexically():
+    embeddings, bm25_index = _hybrid_fixture()
+    embeddings.top_k = mock.Mock()
+
+    rows, _ = _hybrid(embeddings, bm25_index, ' kirjasto ', [1.0, 0.0], 2, np.ones(6, dtype=bool))
+    assert rows.tolist() == [2]
+    embeddings.top_k.assert_not_called()
+
+    embeddings.top_k.return_value = (np.array([0, 1]), np.array([1.0, 0.9]))
+    mask = np.array([True, True, False, True, True, True])
+    rows, _ = _hybrid(embeddings, bm25_index, 'Kirjasto', [1.0, 0.0], 2, mask)
+    assert 2 not in rows.tolist()
+    embeddings.top_k.assert_called_once()
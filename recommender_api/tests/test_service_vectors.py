@@ -0,0 +1,22 @@
+import numpy as np
+
+from recommender_api.service_vectors import SERVICE_VECTOR_COLUMNS, ServiceVectors
+
+
+def _row(service_id, values):
+    return {'service_id': service_id, 'municipality_code': '091', **dict(zip(SERVICE_VECTOR_COLUMNS, values))}
+
+
+def test_matrix_rows_follow_service_ids():
+    vectors = ServiceVectors([_row('s1', [1] * 10), _row('s2', [0.5] * 10), _row('s3', [0] * 10)])
+
+    assert vectors.service_ids == ['s1', 's2', 's3']
+    assert vectors.values.dtype == np.float32
+    assert vectors.values[1].tolist() == [0.5] * 10
+    assert vectors.column_positions(['health', 'life_satisfaction']) == [0, 9]
+
+
+def test_no_service_vectors():
+    vectors = ServiceVectors([])
+
+    assert vectors.values.shape == (0, len(SERVICE_VECTOR_COLUMNS))
@@ -0,0 +1,93 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Dict, Hashable, Optional
+
+_caches: Dict[str, 'LruCache'] = {}
+
+
+class LruCache:
+    """
+    Bounded least recently used cache with hit and miss counters. A cache of size 0 is disabled:
+    nothing is stored and every lookup is a miss. If ttl_seconds is given, entries expire that long
+    after they were stored. If size_of is given, the cache keeps the total of size_of(value) over its entries,
+    e.g. to report their approximate memory use.
+
+    Caches are registered by name, so that their statistics can be read with cache_stats().
+    """
+
+    def __init__(self, name: str, max_size: int, ttl_seconds: Optional[float] = None,
+                 size_of: Optional[Callable[[Any], int]] = None):
+        self.name = name
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.size_of = size_of
+        self.hits = 0
+        self.misses = 0
+        self.total_size = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = Lock()
+        _caches[name] = self
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is not None and entry[0] <= time.monotonic():
+                self._remove(key)
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value: Any):
+        if self.max_size <= 0:
+            return
+
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds is not None else None
+        size = self.size_of(value) if self.size_of is not None else 0
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires_at, value, size)
+            self.total_size += size
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def remove(self, key: Hashable):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def _remove(self, key: Hashable):
+        self.total_size -= self._entries.pop(key)[2]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_size = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        stats = {
+            'size': len(self),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+        }
+        if self.size_of is not None:
+            stats['total_size'] = self.total_size
+        return stats
+
+
+def cache_stats() -> Dict[str, Dict[str, float]]:
+    """Statistics of all caches of the worker process."""
+    return {name: cache.stats() for name, cache in _caches.items()}
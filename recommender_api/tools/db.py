@@ -1,14 +1,20 @@
-from typing import Tuple
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
 import os
+import random
+import threading
+import time
 import boto3
 from botocore.config import Config
-from psycopg2 import connect
-from psycopg2.extensions import connection
-from psycopg2.pool import SimpleConnectionPool
+from psycopg2 import connect, Error
+from psycopg2.extensions import connection, TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_UNKNOWN
+from psycopg2.pool import PoolError
 from .config import config
 
 
+@lru_cache(maxsize=None)
 def db_endpoint(db_name: str, region: str) -> str:
+    """Address of the primary instance of the database. Cached, as the address does not change on failover."""
     client = boto3.client('rds', config=Config(region_name=region))
     response = client.describe_db_instances()
     matched_instances = [instance for instance in response['DBInstances'] if is_valid_instance(instance, db_name)]
@@ -37,7 +43,7 @@ def db_connection(db_endpoint_address: str, db_auth_endpoint: str, db_name: str,
         auth_token_port = port
 
     environment = os.getenv('ENVIRONMENT')
-    if environment in ('local', 'localcluster', 'localunittest', 'ci'):
+    if environment in ('local', 'localcluster', 'localunittest', 'ci', 'benchmark'):
         pwd = config['db_password']
     else:
         pwd = auth_token(db_auth_endpoint, auth_token_port, user, region)
@@ -52,6 +58,207 @@ def db_connection(db_endpoint_address: str, db_auth_endpoint: str, db_name: str,
     return conn
 
 
+class AuthTokenProvider:
+    """
+    IAM auth token for opening new connections, regenerated once it is older than max_age seconds so that
+    connections are never opened with a token near its 15 minute expiry. Generating a token only signs the request
+    locally, so the token is refreshed when a connection needs it rather than by a background task.
+    """
+
+    def __init__(self, db_auth_endpoint: str, port: str, user: str, region: str, max_age: float = 600.0):
+        self._args = (db_auth_endpoint, port, user, region)
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._token: Optional[str] = None
+        self._created_at = 0.0
+
+    def __call__(self) -> str:
+        with self._lock:
+            if self._token is None or time.monotonic() - self._created_at >= self.max_age:
+                self._token = auth_token(*self._args)
+                self._created_at = time.monotonic()
+            return self._token
+
+    def invalidate(self):
+        """Generate a new token for the next connection, e.g. after the database rejected the current one."""
+        with self._lock:
+            self._token = None
+
+
+class BlockingConnectionPool:
+    """
+    Thread-safe connection pool that makes callers wait up to timeout seconds for a free connection
+    instead of failing at once when all max_conn connections are in use, and raises PoolError after that.
+
+    The wait uses threading primitives looked up when the pool is created, so a pool created in a
+    gevent worker after monkey patching waits on green primitives and does not block the other greenlets.
+    Connections idle longer than validate_after seconds are checked with a query before they are handed out,
+    and broken connections are replaced.
+
+    With a password provider, each new connection asks it for the password, e.g. a fresh IAM auth token.
+    Connections older than about max_connection_age seconds are closed when they are returned, so that
+    they are rotated one at a time instead of all at once.
+    """
+
+    def __init__(self, min_conn: int, max_conn: int, timeout: float = 10.0, validate_after: float = 30.0,
+                 max_connection_age: Optional[float] = None, password_provider: Optional[Callable[[], str]] = None,
+                 **connect_kwargs):
+        self.max_conn = max_conn
+        self.timeout = timeout
+        self.validate_after = validate_after
+        self.max_connection_age = max_connection_age
+        self.closed = False
+        self._password_provider = password_provider
+        self._connect_kwargs = connect_kwargs
+        self._retire_at: Dict[int, float] = {}
+        self._condition = threading.Condition()
+        self._idle: List[Tuple[connection, float]] = []
+        self._in_use = 0
+
+        self._waits = 0
+        self._wait_seconds = 0.0
+        self._max_wait_seconds = 0.0
+        self._timeouts = 0
+        self._replaced = 0
+        self._retired = 0
+
+        for _ in range(min_conn):
+            self._idle.append((self._connect(), time.monotonic()))
+
+    def _connect(self) -> connection:
+        connect_kwargs = self._connect_kwargs
+        if self._password_provider is not None:
+            connect_kwargs = {**connect_kwargs, 'password': self._password_provider()}
+        conn = connect(**connect_kwargs)
+        if self.max_connection_age is not None:
+            # Spread the retirement of connections opened at the same time
+            self._retire_at[id(conn)] = time.monotonic() + self.max_connection_age * random.uniform(0.9, 1.0)
+        return conn
+
+    def _close(self, conn: connection):
+        self._retire_at.pop(id(conn), None)
+        if not conn.closed:
+            conn.close()
+
+    def invalidate_credentials(self):
+        """Make the password provider issue new credentials for the next connection."""
+        invalidate = getattr(self._password_provider, 'invalidate', None)
+        if invalidate is not None:
+            invalidate()
+
+    def getconn(self) -> connection:
+        with self._condition:
+            conn, returned_at = self._reserve()
+
+        try:
+            if conn is None:
+                return self._connect()
+            if not self._is_valid(conn, returned_at):
+                with self._condition:
+                    self._replaced += 1
+                self._close(conn)
+                return self._connect()
+            return conn
+        except BaseException:
+            self._release_slot()
+            raise
+
+    def _reserve(self) -> Tuple[Any, float]:
+        """Take an idle connection, or reserve a slot for a new one (None), waiting for one to be returned."""
+        started = time.monotonic()
+        waited = False
+        while True:
+            if self.closed:
+                raise PoolError('connection pool is closed')
+            if self._idle:
+                conn, returned_at = self._idle.pop()
+                break
+            if self._in_use < self.max_conn:
+                conn, returned_at = None, started
+                break
+
+            remaining = self.timeout - (time.monotonic() - started)
+            if remaining <= 0:
+                self._timeouts += 1
+                raise PoolError(f'connection pool exhausted, no connection free within {self.timeout} s')
+            waited = True
+            self._condition.wait(remaining)
+
+        self._in_use += 1
+        if waited:
+            wait_seconds = time.monotonic() - started
+            self._waits += 1
+            self._wait_seconds += wait_seconds
+            self._max_wait_seconds = max(self._max_wait_seconds, wait_seconds)
+        return conn, returned_at
+
+    def _is_valid(self, conn: connection, returned_at: float) -> bool:
+        if conn.closed or conn.info.transaction_status == TRANSACTION_STATUS_UNKNOWN:
+            return False
+        if time.monotonic() - returned_at < self.validate_after:
+            return True
+        try:
+            test_connection(conn)
+            conn.rollback()
+            return True
+        except Error:
+            return False
+
+    def _release_slot(self):
+        with self._condition:
+            self._in_use -= 1
+            self._condition.notify()
+
+    def putconn(self, conn: connection, close: bool = False):
+        """Return a connection to the pool, rolling back an open transaction. Broken connections are dropped."""
+        keep = not close and not conn.closed
+        retire = keep and time.monotonic() >= self._retire_at.get(id(conn), float('inf'))
+        keep = keep and not retire
+        if keep:
+            status = conn.info.transaction_status
+            if status == TRANSACTION_STATUS_UNKNOWN:
+                keep = False
+            elif status != TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except Error:
+                    keep = False
+
+        with self._condition:
+            self._in_use -= 1
+            keep = keep and not self.closed
+            if keep:
+                self._idle.append((conn, time.monotonic()))
+            if retire:
+                self._retired += 1
+            self._condition.notify()
+        if not keep:
+            self._close(conn)
+
+    def closeall(self):
+        """Close the idle connections. Connections in use are closed when they are returned."""
+        with self._condition:
+            self.closed = True
+            idle, self._idle = self._idle, []
+            self._condition.notify_all()
+        for conn, _ in idle:
+            self._close(conn)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'max_size': self.max_conn,
+                'waits': self._waits,
+                'wait_seconds': self._wait_seconds,
+                'max_wait_seconds': self._max_wait_seconds,
+                'timeouts': self._timeouts,
+                'replaced': self._replaced,
+                'retired': self._retired
+            }
+
+
 def db_connection_pool_aws(
         db_name: str,
         port: str,
@@ -59,8 +266,12 @@ def db_connection_pool_aws(
         region: str,
         min_conn: int = 1,
         max_conn: int = 10,
-        auth_token_port: str = None
-) -> Tuple[SimpleConnectionPool, str]:
+        auth_token_port: str = None,
+        timeout: float = 10.0,
+        validate_after: float = 30.0,
+        max_connection_age: Optional[float] = None,
+        auth_token_max_age: float = 600.0
+) -> Tuple[BlockingConnectionPool, str]:
     """
     Create a connection pool to Postgres instance in AWS RDS using auth tokens
     """
@@ -68,14 +279,16 @@ def db_connection_pool_aws(
     endpoint = db_endpoint(db_name, region)
     auth_token_port = auth_token_port or port
 
-    token = auth_token(endpoint, auth_token_port, user, region)
-    conn_pool = SimpleConnectionPool(
+    conn_pool = BlockingConnectionPool(
         min_conn,
         max_conn,
+        timeout=timeout,
+        validate_after=validate_after,
+        max_connection_age=max_connection_age,
+        password_provider=AuthTokenProvider(endpoint, auth_token_port, user, region, auth_token_max_age),
         host=endpoint,
         database=db_name,
         user=user,
-        password=token,
         port=port
     )
 
@@ -89,15 +302,21 @@ def db_connection_pool_classic(
         user: str,
         password: str,
         min_conn: int = 1,
-        max_conn: int = 10
-) -> Tuple[SimpleConnectionPool, str]:
+        max_conn: int = 10,
+        timeout: float = 10.0,
+        validate_after: float = 30.0,
+        max_connection_age: Optional[float] = None
+) -> Tuple[BlockingConnectionPool, str]:
     """
     Create a connection pool to Postgres using classic credentials
     """
 
-    conn_pool = SimpleConnectionPool(
+    conn_pool = BlockingConnectionPool(
         min_conn,
         max_conn,
+        timeout=timeout,
+        validate_after=validate_after,
+        max_connection_age=max_connection_age,
         host=host,
         database=db_name,
         user=user,
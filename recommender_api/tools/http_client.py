@@ -0,0 +1,116 @@
+import random
+import time
+from collections import deque
+from threading import Lock
+from typing import Any, Deque, Dict, Optional, Tuple
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+from .logger import log
+
+_clients: Dict[str, 'HttpClient'] = {}
+
+IDEMPOTENT_METHODS = ['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE']
+RETRY_STATUS_CODES = [502, 503, 504]
+LATENCY_PERCENTILES = [50, 95, 99]
+
+
+class HttpClient:
+    """
+    HTTP client of one upstream service. Connections are kept alive in a pool of pool_size connections per worker.
+
+    Requests are made to named endpoints, each with its own (connect, read) timeout, the default timeout otherwise.
+    Idempotent requests are retried after connection errors, timeouts and 502, 503 and 504 responses, waiting a
+    random time of up to backoff_seconds * 2 ** retry in between. Each request is added to the technical log, and
+    latency percentiles of the latest latency_window requests per endpoint are logged every latency_log_interval
+    seconds and returned by http_client_stats().
+    """
+
+    def __init__(self, name: str, base_url: str, pool_size: int, default_timeout: Tuple[float, float],
+                 timeouts: Optional[Dict[str, Tuple[float, float]]] = None, retries: int = 0,
+                 backoff_seconds: float = 0.1, latency_window: int = 1000, latency_log_interval: float = 60.0):
+        self.name = name
+        self.base_url = base_url
+        self.default_timeout = default_timeout
+        self.timeouts = timeouts or {}
+        self.retries = retries
+        self.backoff_seconds = backoff_seconds
+        self.latency_window = latency_window
+        self.latency_log_interval = latency_log_interval
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._latencies_logged_at = time.monotonic()
+        self._lock = Lock()
+        self._session = requests.Session()
+        self._session.mount(base_url, HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        _clients[name] = self
+
+    def get(self, endpoint: str, path: str, **kwargs) -> requests.Response:
+        return self.request('GET', endpoint, path, **kwargs)
+
+    def post(self, endpoint: str, path: str, **kwargs) -> requests.Response:
+        return self.request('POST', endpoint, path, **kwargs)
+
+    def request(self, method: str, endpoint: str, path: str, idempotent: Optional[bool] = None,
+                **kwargs: Any) -> requests.Response:
+        """
+        Request the path of the base URL. A POST that does not change anything upstream can be retried by
+        passing idempotent=True. Errors of the last attempt are raised, and the response of the last attempt
+        is returned whatever its status.
+        """
+        retries = self.retries if (method in IDEMPOTENT_METHODS if idempotent is None else idempotent) else 0
+        kwargs.setdefault('timeout', self.timeouts.get(endpoint, self.default_timeout))
+
+        started = time.monotonic()
+        attempt = 0
+        status_code = None
+        try:
+            while True:
+                attempt += 1
+                try:
+                    response = self._session.request(method, f'{self.base_url}{path}', **kwargs)
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                    if attempt > retries:
+                        raise
+                else:
+                    status_code = response.status_code
+                    if status_code not in RETRY_STATUS_CODES or attempt > retries:
+                        return response
+                time.sleep(random.uniform(0, self.backoff_seconds * 2 ** (attempt - 1)))
+        finally:
+            self._record(endpoint, status_code, time.monotonic() - started, attempt)
+
+    def _record(self, endpoint: str, status_code: Optional[int], duration: float, attempts: int):
+        log.technical.outbound_request(f'{self.name}.{endpoint}', status_code, int(duration * 1000), attempts)
+
+        with self._lock:
+            self._latencies.setdefault(endpoint, deque(maxlen=self.latency_window)).append(duration)
+            now = time.monotonic()
+            log_latencies = now - self._latencies_logged_at >= self.latency_log_interval
+            if log_latencies:
+                self._latencies_logged_at = now
+
+        if log_latencies:
+            log.technical.outbound_latencies({self.name: self.latency_stats()})
+
+    def latency_stats(self) -> Dict[str, Dict[str, float]]:
+        """Request count and latency percentiles in milliseconds per endpoint over the latency window"""
+        with self._lock:
+            latencies = {endpoint: np.array(durations) * 1000 for endpoint, durations in self._latencies.items()}
+
+        return {
+            endpoint: {
+                'count': len(durations),
+                **{
+                    f'p{percentile}': round(float(value), 1)
+                    for percentile, value in zip(LATENCY_PERCENTILES, np.percentile(durations, LATENCY_PERCENTILES))
+                }
+            }
+            for endpoint, durations in latencies.items()
+        }
+
+
+def http_client_stats() -> Dict[str, Dict[str, Dict[str, float]]]:
+    """Latency statistics of all HTTP clients of the worker process."""
+    return {name: client.latency_stats() for name, client in _clients.items()}
@@ -127,10 +127,13 @@ class TechnicalLogEntry(LogEntry):
         self.auroraAIServiceId: str = ""
         self.bertPath: str = ""
         self.ptvEmbeddingsPath: str = ""
+        self.annIndexPath: str = ""
         self.branch: str = ""
         self.build: str = ""
         self.commitSha: str = ""
         self.messages: Optional[List[str]] = None
+        self.outboundRequests: Optional[List[Dict]] = None
+        self.outboundLatencyMs: Optional[Dict[str, Dict]] = None
 
 
 EntryType = TypeVar('EntryType')
@@ -192,6 +195,19 @@ class TechnicalLogContext(BaseLogContext):
             self.data.messages = []
         self.data.messages.append(message)
 
+    def outbound_request(self, endpoint: str, status_code: Optional[int], duration_ms: int, attempts: int):
+        if not self.data.outboundRequests:
+            self.data.outboundRequests = []
+        self.data.outboundRequests.append({
+            'endpoint': endpoint,
+            'httpStatusCode': status_code,
+            'durationMs': duration_ms,
+            'attempts': attempts
+        })
+
+    def outbound_latencies(self, latencies: Dict[str, Dict]):
+        self.data.outboundLatencyMs = latencies
+
 
 class AuditLogContext(BaseLogContext):
     """Audit logger that is stored in context variable."""
@@ -0,0 +1,52 @@
+from unittest import mock
+
+from recommender_api.tools.cache import LruCache, cache_stats
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = LruCache('test_lru', 2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+
+    cache.put('c', 3)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert cache_stats()['test_lru'] == {'size': 2, 'max_size': 2, 'hits': 3, 'misses': 1, 'hit_ratio': 0.75}
+
+
+def test_cache_of_size_zero_is_disabled():
+    cache = LruCache('test_disabled', 0)
+    cache.put('a', 1)
+
+    assert cache.get('a') is None
+    assert len(cache) == 0
+
+
+def test_entries_expire_after_ttl():
+    cache = LruCache('test_ttl', 2, ttl_seconds=10)
+
+    with mock.patch('recommender_api.tools.cache.time.monotonic', return_value=100.0):
+        cache.put('a', 1)
+    with mock.patch('recommender_api.tools.cache.time.monotonic', return_value=105.0):
+        assert cache.get('a') == 1
+    with mock.patch('recommender_api.tools.cache.time.monotonic', return_value=110.0):
+        assert cache.get('a') is None
+    assert len(cache) == 0
+
+
+def test_total_size_follows_stored_entries():
+    cache = LruCache('test_sized', 2, size_of=len)
+    cache.put('a', 'x')
+    cache.put('b', 'yy')
+    cache.put('a', 'zzz')
+    assert cache.total_size == 5
+
+    cache.put('c', 'wwww')
+
+    assert cache.get('b') is None
+    assert cache.stats()['total_size'] == 7
+    cache.clear()
+    assert cache.total_size == 0
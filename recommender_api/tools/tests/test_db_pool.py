@@ -0,0 +1,133 @@
+import threading
+import time
+from unittest import mock
+
+import pytest
+from psycopg2 import OperationalError
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_INTRANS, TRANSACTION_STATUS_UNKNOWN
+from psycopg2.pool import PoolError
+
+from recommender_api.tools.db import AuthTokenProvider, BlockingConnectionPool
+
+
+def _connection():
+    conn = mock.MagicMock(closed=0)
+    conn.info.transaction_status = TRANSACTION_STATUS_IDLE
+    return conn
+
+
+@pytest.fixture(name='connect')
+def fixture_connect():
+    with mock.patch('recommender_api.tools.db.connect', side_effect=lambda **_: _connection()) as connect:
+        yield connect
+
+
+def test_idle_connections_are_reused(connect):
+    pool = BlockingConnectionPool(1, 2, host='db')
+
+    conn = pool.getconn()
+    pool.putconn(conn)
+
+    assert pool.getconn() is conn
+    assert connect.call_count == 1
+    connect.assert_called_with(host='db')
+
+
+def test_waits_for_a_returned_connection(connect):
+    pool = BlockingConnectionPool(0, 1, timeout=5)
+    conn = pool.getconn()
+
+    timer = threading.Timer(0.05, pool.putconn, args=(conn,))
+    timer.start()
+
+    assert pool.getconn() is conn
+    timer.join()
+    stats = pool.stats()
+    assert stats['waits'] == 1
+    assert stats['wait_seconds'] > 0
+    assert stats['in_use'] == 1
+
+
+def test_raises_pool_error_after_timeout(connect):
+    pool = BlockingConnectionPool(0, 1, timeout=0.01)
+    pool.getconn()
+
+    with pytest.raises(PoolError):
+        pool.getconn()
+    assert pool.stats()['timeouts'] == 1
+
+
+def test_broken_connections_are_replaced(connect):
+    pool = BlockingConnectionPool(1, 1)
+    conn = pool.getconn()
+    pool.putconn(conn)
+    conn.info.transaction_status = TRANSACTION_STATUS_UNKNOWN
+
+    assert pool.getconn() is not conn
+    assert pool.stats()['replaced'] == 1
+
+
+def test_connections_idle_too_long_are_checked(connect):
+    pool = BlockingConnectionPool(1, 1, validate_after=0)
+    conn = pool.getconn()
+    pool.putconn(conn)
+    conn.cursor.return_value.__enter__.return_value.execute.side_effect = OperationalError
+
+    assert pool.getconn() is not conn
+    assert conn.close.called
+
+
+def test_open_transactions_are_rolled_back_on_return(connect):
+    pool = BlockingConnectionPool(0, 1)
+    conn = pool.getconn()
+    conn.info.transaction_status = TRANSACTION_STATUS_INTRANS
+
+    pool.putconn(conn)
+
+    conn.rollback.assert_called_once()
+    assert pool.stats()['idle'] == 1
+
+
+def test_failed_connect_frees_the_slot(connect):
+    pool = BlockingConnectionPool(0, 1, timeout=0.01)
+    connect.side_effect = OperationalError
+
+    with pytest.raises(OperationalError):
+        pool.getconn()
+    assert pool.stats()['in_use'] == 0
+
+
+def test_new_connections_use_the_current_password(connect):
+    passwords = iter(['token1', 'token2'])
+    pool = BlockingConnectionPool(0, 2, password_provider=lambda: next(passwords), host='db')
+
+    pool.getconn()
+    pool.getconn()
+
+    assert [call.kwargs['password'] for call in connect.call_args_list] == ['token1', 'token2']
+
+
+def test_old_connections_are_retired_on_return(connect):
+    pool = BlockingConnectionPool(0, 1, max_connection_age=10)
+    conn = pool.getconn()
+
+    with mock.patch('recommender_api.tools.db.time.monotonic', return_value=time.monotonic() + 11):
+        pool.putconn(conn)
+
+    assert conn.close.called
+    assert pool.stats()['idle'] == 0
+    assert pool.stats()['retired'] == 1
+
+
+def test_auth_token_is_regenerated_before_expiry():
+    provider = AuthTokenProvider('endpoint', '5432', 'user', 'region', max_age=600)
+
+    with mock.patch('recommender_api.tools.db.auth_token', side_effect=['token1', 'token2', 'token3']) as auth_token:
+        assert provider() == 'token1'
+        assert provider() == 'token1'
+        with mock.patch('recommender_api.tools.db.time.monotonic', return_value=time.monotonic() + 601):
+            assert provider() == 'token2'
+        provider.invalidate()
+        assert provider() == 'token3'
+
+    auth_token.assert_called_with('endpoint', '5432', 'user', 'region')
@@ -0,0 +1,63 @@
+from unittest import mock
+
+import pytest
+import requests
+
+from recommender_api.tools.http_client import HttpClient, http_client_stats
+
+BASE_URL = 'http://upstream'
+
+
+def _client(name, **kwargs):
+    return HttpClient(name, BASE_URL, pool_size=2, default_timeout=(1, 2), retries=2, backoff_seconds=0.01,
+                      **kwargs)
+
+
+def test_idempotent_requests_are_retried(requests_mock):
+    requests_mock.get(f'{BASE_URL}/items', [{'status_code': 503}, {'exc': requests.exceptions.ConnectTimeout},
+                                            {'json': {'id': 1}}])
+    client = _client('test_retry')
+
+    with mock.patch('recommender_api.tools.http_client.time.sleep') as sleep:
+        response = client.get('items', '/items')
+
+    assert response.json() == {'id': 1}
+    assert requests_mock.call_count == 3
+    assert sleep.call_count == 2
+
+
+def test_other_requests_are_not_retried_unless_idempotent(requests_mock):
+    requests_mock.post(f'{BASE_URL}/items', status_code=503)
+    client = _client('test_no_retry')
+
+    assert client.post('items', '/items').status_code == 503
+    assert requests_mock.call_count == 1
+
+    with mock.patch('recommender_api.tools.http_client.time.sleep'):
+        client.post('items', '/items', idempotent=True)
+    assert requests_mock.call_count == 4
+
+
+def test_last_error_is_raised(requests_mock):
+    requests_mock.get(f'{BASE_URL}/items', exc=requests.exceptions.ConnectionError)
+    client = _client('test_error')
+
+    with mock.patch('recommender_api.tools.http_client.time.sleep'), \
+            pytest.raises(requests.exceptions.ConnectionError):
+        client.get('items', '/items')
+    assert requests_mock.call_count == 3
+
+
+def test_endpoint_timeouts_and_latency_stats(requests_mock):
+    requests_mock.get(f'{BASE_URL}/fast', json={})
+    requests_mock.get(f'{BASE_URL}/slow', json={})
+    client = _client('test_timeouts', timeouts={'fast': (1, 0.5)})
+
+    client.get('fast', '/fast')
+    client.get('slow', '/slow')
+
+    assert requests_mock.request_history[0].timeout == (1, 0.5)
+    assert requests_mock.request_history[1].timeout == (1, 2)
+    stats = http_client_stats()['test_timeouts']
+    assert stats['fast']['count'] == 1
+    assert set(stats['slow']) == {'count', 'p50', 'p95', 'p99'}